@@ -363,13 +363,16 @@ GarageYrBlt: 0.0555% missing value """
 
 ## Replacing the numerical Missing Values
 
-for feature in numerical_with_nan:
-    ## We will replace by using median since there are outliers
-    median_value=dataset[feature].median()
-    
-    ## create a new feature to capture nan values
-    dataset[feature+'nan']=np.where(dataset[feature].isnull(),1,0)
-    dataset[feature].fillna(median_value,inplace=True)
+## We will replace by using median since there are outliers: the medians of all the columns are learnt in one pass,
+## the missing values are replaced in place, and the nan values are captured as packed bits (1 per row and column)
+from eda_utils.imputation import StreamingImputer
+
+imputer=StreamingImputer(dict.fromkeys(numerical_with_nan, 'median'))
+missing_indicators=imputer.fit(dataset).transform(dataset)
+
+## create a new feature to capture nan values: the <feature>nan columns of 0/1
+nan_features=missing_indicators.to_frame(suffix='nan', index=dataset.index).astype('int64')
+dataset[nan_features.columns]=nan_features
     
 dataset[numerical_with_nan].isnull().sum()
 """ 
@@ -1382,10 +1385,12 @@ categorical_features
  'SaleType',
  'SaleCondition'] """
 
-for feature in categorical_features:
-    temp=dataset.groupby(feature)['SalePrice'].count()/len(dataset)
-    temp_df=temp[temp>0.01].index
-    dataset[feature]=np.where(dataset[feature].isin(temp_df),dataset[feature],'Rare_var')
+## all the categorical features are factorized once and their labels counted with a single bincount on the codes,
+## the rare labels are remapped with a lookup array instead of comparing strings with isin
+from eda_utils.rare_labels import RareLabelEncoder
+
+rare_encoder=RareLabelEncoder(threshold=0.01, rare_label='Rare_var')
+dataset[categorical_features]=rare_encoder.fit_transform(dataset[categorical_features], output='object')
     
 dataset.head(100)
 """ 
@@ -1574,10 +1579,16 @@ dataset.head(100)
 [100 rows x 84 columns]
  """
 
-for feature in categorical_features:
-    labels_ordered=dataset.groupby([feature])['SalePrice'].mean().sort_values().index
-    labels_ordered={k:i for i,k in enumerate(labels_ordered,0)}
-    dataset[feature]=dataset[feature].map(labels_ordered)
+## labels mapped to integers ordered by the mean of SalePrice, for all the categorical features at once: the target
+## sums and counts of every label come from a bincount on the label codes
+from eda_utils.target_encoding import TargetEncoder
+
+target_encoder=TargetEncoder(kind='ordered')
+dataset[categorical_features]=target_encoder.fit_transform(dataset[categorical_features], dataset['SalePrice'])
+
+## the encoding above is fitted on all the rows, so every row has seen its own SalePrice (leakage). To train a model,
+## use an out of fold encoding instead: each fold is encoded with the statistics of the other folds, e.g.
+## TargetEncoder(kind='smoothed', n_folds=5, n_jobs=5).fit_transform(X_train[categorical_features], y_train)
     
 dataset.head(10)
 """ 
@@ -1996,4 +2007,28 @@ data.head()
 3             0.0            0.0             0.0
 4             0.0            0.0             0.0 """
 
-data.to_csv('case_study1_advanced_house_price_prediction/X_train.csv',index=False)
\ No newline at end of file
+# typed binary columns (one .npy file per column + schema.json) instead of csv text: 3_feature_selection.py memory
+# maps them without parsing or copying
+from eda_utils.artifacts import save_frame
+
+save_frame(data, 'case_study1_advanced_house_price_prediction/X_train')
+""" 5. Fitted pipeline
+All the steps above learn their statistics (medians, frequent labels, label order, min and max) on the training data,
+but they are lost once the script ends, so test.csv was never transformed the same way.
+HousePricePreprocessor learns them once, saves them, and applies every step to new data in a single pass over the
+columns (or chunk by chunk for files which do not fit in memory) """
+from eda_utils.house_price_pipeline import HousePricePreprocessor
+
+preprocessor = HousePricePreprocessor().fit(pd.read_csv('case_study1_advanced_house_price_prediction/train.csv'))
+preprocessor.save('case_study1_advanced_house_price_prediction/preprocessor.json')
+
+# same values as the X_train artifact above
+preprocessor.transform(pd.read_csv('case_study1_advanced_house_price_prediction/train.csv')).head()
+
+# test.csv transformed with the statistics of the training data
+test_data = preprocessor.transform(pd.read_csv('case_study1_advanced_house_price_prediction/test.csv'))
+test_data.head()
+
+# large batches to score: one scan of the file, bounded memory
+preprocessor.transform_csv('case_study1_advanced_house_price_prediction/test.csv',
+                           'case_study1_advanced_house_price_prediction/X_test.csv', chunksize=100_000)
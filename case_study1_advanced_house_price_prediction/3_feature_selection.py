@@ -3,11 +3,14 @@ import numpy as np
 import matplotlib.pyplot as plt
 from sklearn.linear_model import Lasso ## for feature slection
 from sklearn.feature_selection import SelectFromModel ## for feature slection
+from eda_utils.artifacts import load_frame ## binary handoff from 2_feature_engineering.py
+from eda_utils.pipeline import stage_params ## parameters given by pipeline.py
 
 # to visualise al the columns in the dataframe
 pd.pandas.set_option('display.max_columns', None)
 
-dataset=pd.read_csv('case_study1_advanced_house_price_prediction/X_train.csv')
+# output of 2_feature_engineering.py, memory mapped (read only, no parsing)
+dataset=load_frame('case_study1_advanced_house_price_prediction/X_train')
 dataset.head()
 """ 
    Id  SalePrice  MSSubClass  MSZoning  LotFrontage   LotArea  Street  Alley  \
@@ -121,8 +124,10 @@ X_train=dataset.drop(['Id','SalePrice'],axis=1)
 
 # Then I use the selectFromModel object from sklearn, which
 # will select the features which coefficients are non-zero
+# (alpha can be changed from pipeline.py without re-running the EDA and the feature engineering)
 
-feature_sel_model = SelectFromModel(Lasso(alpha=0.005, random_state=0)) # remember to set the seed, the random state in this function
+params = stage_params({'alpha': 0.005})
+feature_sel_model = SelectFromModel(Lasso(alpha=params['alpha'], random_state=0)) # remember to set the seed, the random state in this function
 feature_sel_model.fit(X_train, y_train)
 """ SelectFromModel(estimator=Lasso(alpha=0.005, copy_X=True, fit_intercept=True, max_iter=1000,
    normalize=False, positive=False, precompute=False, random_state=0,
@@ -191,4 +196,46 @@ X_train.head()
 1      0.666667        0.50         1.0           0.75
 2      0.666667        0.50         1.0           0.75
 3      0.333333        0.75         1.0           0.00
-4      0.666667        0.75         1.0           0.75 """
\ No newline at end of file
+4      0.666667        0.75         1.0           0.75 """
+
+### Regularization path
+# alpha=0.005 above is picked by hand. LassoPathSelector computes the Lasso for 100 alphas at once (each fit starting
+# from the previous one, features which cannot enter set aside by the strong rules), cross validates the whole path
+# and gives the features selected at any alpha. n_jobs=1: the folds run in this process, the script has no
+# if __name__ == '__main__': guard for worker processes (and pipeline.py runs it as a subprocess).
+from eda_utils.lasso_path import LassoPathSelector
+
+X_all = dataset.drop(['Id','SalePrice'],axis=1)
+path_selector = LassoPathSelector(cv=5, n_jobs=1).fit(X_all, y_train)
+path_selector.path_summary()
+
+# alpha with the lowest cross validated error and its features
+print('best alpha: {}'.format(path_selector.alpha_))
+print('selected features at the best alpha: {}'.format(len(path_selector.selected_features())))
+
+# same features as SelectFromModel(Lasso(alpha=0.005)) above: 0.005 is not on the grid, it is solved exactly from the
+# closest alpha of the path, and SelectFromModel keeps the coefficients with |coef| >= 1e-5
+path_selector.selected_features(alpha=params['alpha'], threshold=1e-5)
+
+### Stability selection
+# a single Lasso fit depends on the rows it sees. StabilitySelector fits 200 randomized Lassos on random halves of
+# the rows and keeps the features selected in at least 60% of them (n_jobs=1: no worker processes, the script has no
+# if __name__ == '__main__': guard).
+from eda_utils.stability_selection import StabilitySelector
+
+stability_selector = StabilitySelector(n_resamples=200, n_jobs=1).fit(X_all, y_train)
+stability_selector.stability_scores_.head(20)
+stability_selector.selected_features()
+
+### Filter pre-screening
+# constant, duplicated, unrelated (F test and mutual information with SalePrice) and highly correlated columns are
+# dropped first, with statistics computed for all the columns at once, so the Lasso (or RFE) sees fewer columns
+from eda_utils.filter_selection import FilterSelector
+
+screener = FilterSelector(max_correlation=0.9).fit(X_all, y_train)
+screener.report_['dropped_by'].value_counts()
+X_screened = screener.transform(X_all)
+print('features after the pre-screening: {}'.format(X_screened.shape[1]))
+
+screened_path_selector = LassoPathSelector(cv=5, n_jobs=1).fit(X_screened, y_train)
+screened_path_selector.selected_features()
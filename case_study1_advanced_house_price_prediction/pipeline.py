@@ -0,0 +1,42 @@
+# Goal: run the house price case study (1_EDA.py -> 2_feature_engineering.py -> 3_feature_selection.py)
+
+"""
+Only the scripts whose code, inputs or parameters changed since the last run are run again:
+- 1_EDA.py and 2_feature_engineering.py only read train.csv / test.csv, so they run at the same time
+- 3_feature_selection.py reads the X_train artifact written by 2_feature_engineering.py, so it runs after it, and
+  only if X_train actually changed (or its own code / alpha did)
+Changing alpha below only re-runs 3_feature_selection.py. The eda_utils modules a script imports are part of its
+fingerprint, editing one of them re-runs the scripts which use it.
+
+Run from the root of the repository:
+    python case_study1_advanced_house_price_prediction/pipeline.py
+    python case_study1_advanced_house_price_prediction/pipeline.py --force features """
+
+import argparse
+import os
+import sys
+
+# python puts the directory of this script on sys.path, not the root of the repository where eda_utils is
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from eda_utils.pipeline import Stage, run_pipeline
+
+CASE_STUDY = 'case_study1_advanced_house_price_prediction/'
+TRAIN = CASE_STUDY + 'train.csv'
+TEST = CASE_STUDY + 'test.csv'
+X_TRAIN = CASE_STUDY + 'X_train'
+
+stages = [
+    Stage('eda', CASE_STUDY + '1_EDA.py', inputs=[TRAIN]),
+    Stage('features', CASE_STUDY + '2_feature_engineering.py',
+          inputs=[TRAIN, TEST],
+          outputs=[X_TRAIN, CASE_STUDY + 'preprocessor.json', CASE_STUDY + 'X_test.csv']),
+    Stage('selection', CASE_STUDY + '3_feature_selection.py', inputs=[X_TRAIN],
+          params={'alpha': 0.005}),
+]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='run the stages of the house price case study which changed')
+    parser.add_argument('--force', nargs='*', default=[], help='names of stages to run anyway')
+    parser.add_argument('--jobs', type=int, default=2, help='number of stages run at the same time')
+    args = parser.parse_args()
+    run_pipeline(stages, state_path=CASE_STUDY + 'pipeline_state.json', n_jobs=args.jobs, force=args.force)
@@ -160,35 +160,45 @@ max       4.000000     1.000000     1.000000     4.000000    40.180000    50.000
 import pandas_profiling
 train.profile_report()
 
+# incremental version of the column statistics: re-running it after new hours are appended to the csv only profiles
+# the appended rows
+from eda_utils.profiling import profile_csv
+profile = profile_csv('case_study2_bikes/train_bikes.csv', state_path='case_study2_bikes/train_bikes.profile.json')
+profile.summary()
+
 print("count samples & features: ", train.shape) # printing the number of rows and columns
 print("Are there missing values: ", train.isnull().values.any()) # printing if dataset has any NaN value
 """ 
 count samples & features:  (10886, 12)
 Are there missing values:  False """
 
+# hour, day, weekday, week, month and year of every row, extracted once (compact read only arrays) and shared by all the
+# plots below instead of calling .dt.hour / .dt.year on a copy of train in every function
+from eda_utils.calendar_features import CalendarFeatures
+calendar = CalendarFeatures(train['datetime'])
+
+# sums / counts of rentals aggregated once per (hour, workingday, holiday, season, weather, month, year): the views
+# below are roll-ups and slices of this small cube instead of a groupby over all the rows
+from eda_utils.olap_cube import OlapCube
+cube = OlapCube({'hour': range(24), 'workingday': [0, 1], 'holiday': [0, 1], 'season': [1, 2, 3, 4],
+                 'weather': [1, 2, 3, 4], 'month': range(1, 13), 'year': [2011, 2012]},
+                measures=['count', 'casual', 'registered'])
+cube.update({**train, 'hour': calendar.hour, 'month': calendar.month, 'year': calendar.year})
+
 # method for creating the count plot based on hour for a given year 
-def plot_by_hour(data, year=None, agg='sum'):
-    dd = data
-    if year: dd = dd[ dd.datetime.dt.year == year ]
-    dd.loc[:, ('hour')] = dd.datetime.dt.hour # extracting the hour data if the year in the data is equal to the year passed as argument
-    
-    by_hour = dd.groupby(['hour', 'workingday'])['count'].agg(agg).unstack() # groupby hour and working day
+def plot_by_hour(cube, year=None, agg='sum'):
+    where = {'year': year} if year else None # cells of the year passed as argument
+    by_hour = cube.rollup(['hour', 'workingday'], where=where, agg=agg).unstack() # roll-up by hour and working day
     by_hour.plot(kind='bar', ylim=(0, 80000), figsize=(15,5), width=0.9, title="Year = {0}".format(year))  # returning the figure grouped by hour
     plt.show()
 
-plot_by_hour(train, year=2011)  # plotting the count plot based on hour for 2011 
+plot_by_hour(cube, year=2011)  # plotting the count plot based on hour for 2011 
 
-plot_by_hour(train, year=2012) # plotting the count plot based on hour for 2012
+plot_by_hour(cube, year=2012) # plotting the count plot based on hour for 2012
 
 # method for creating the count plot based on year 
 def plot_by_year(agg_attr, title):
-    # extracting the required fields
-    dd = train.copy()
-    dd['year'] = train.datetime.dt.year # extratcing the year
-    dd['month'] = train.datetime.dt.month # extratcing the month
-    dd['hour'] = train.datetime.dt.hour # extratcing the hour
-    
-    by_year = dd.groupby([agg_attr, 'year'])['count'].agg('sum').unstack() # groupby year
+    by_year = cube.rollup([agg_attr, 'year']).unstack() # roll-up by year
     by_year.plot(kind='bar', figsize=(15,5), width=0.9, title=title) # returning the figure grouped by year
     plt.show()
 
@@ -198,12 +208,12 @@ plot_by_year('hour', "Rent bikes per hour in 2011 and 2012") # plotting hourls b
 
 # method to plot a graph for count per hour
 def plot_hours(data, message = ''):
-    dd = data.copy()
-    dd['hour'] = data.datetime.dt.hour # extratcing the hour
+    hour_of_row = calendar.column('hour', index=data.index).to_numpy() # hours of the rows of data, from the calendar
+    counts = data['count'].to_numpy()
     
     hours = {}
     for hour in range(24):
-        hours[hour] = dd[ dd.hour == hour ]['count'].values
+        hours[hour] = counts[hour_of_row == hour]
 
     plt.figure(figsize=(20,10))
     plt.ylabel("Count rent")
@@ -216,12 +226,10 @@ def plot_hours(data, message = ''):
 
     plt.show()
  
-plot_hours( train[train.datetime.dt.year == 2011], 'year 2011') # box plot for hourly count for the mentioned year
-plot_hours( train[train.datetime.dt.year == 2012], 'year 2012') # box plot for hourly count for the mentioned year
+plot_hours( train[calendar.year == 2011], 'year 2011') # box plot for hourly count for the mentioned year
+plot_hours( train[calendar.year == 2012], 'year 2012') # box plot for hourly count for the mentioned year
 
-dt = pd.to_datetime(train["datetime"]) # converting the column to datetime for train dataset
-
-train["hour"] = dt.map(lambda x: x.hour) # adding the hour column for train dataset
+train["hour"] = calendar.hour # adding the hour column for train dataset
 
 train.head()
 """ datetime  season  holiday  workingday  weather  temp   atemp  humidity  windspeed  casual  registered  count  hour
@@ -231,8 +239,8 @@ train.head()
 3 2011-01-01 03:00:00       1        0           0        1  9.84  14.395        75        0.0       3          10     13     3
 4 2011-01-01 04:00:00       1        0           0        1  9.84  14.395        75        0.0       0           1      1     4 """
 
-dt_test = pd.to_datetime(test["datetime"]) # converting the column to datetime for test dataset
-test["hour"] = dt_test.map(lambda x: x.hour) # adding the hour column for test dataset
+test_calendar = CalendarFeatures(test["datetime"]) # the test datetimes are strings, parsed once here
+test["hour"] = test_calendar.hour # adding the hour column for test dataset
 test.head()
 """ 
               datetime  season  holiday  workingday  weather   temp   atemp  humidity  windspeed  hour
@@ -255,7 +263,12 @@ def categorical_to_numeric(x):
         return 2
     elif 19 <= x < 24:
         return 3
-train['hour'] = train['hour'].apply(categorical_to_numeric)# applying the above conversion logic to training data
+
+# the if / elif chain above compiled once into breakpoints [0, 6, 13, 19, 24]: every hour is binned with one
+# np.searchsorted over the column instead of one python call per row
+from eda_utils.binning import Binner
+hour_bins = Binner.from_function(categorical_to_numeric)
+train['hour'] = hour_bins.labels_of(train['hour']) # applying the above conversion logic to training data
 
 train.head()
 """ 
@@ -266,7 +279,7 @@ train.head()
 3 2011-01-01 03:00:00       1        0           0        1  9.84  14.395        75        0.0       3          10     13     0
 4 2011-01-01 04:00:00       1        0           0        1  9.84  14.395        75        0.0       0           1      1     0"""
 
-test['hour'] = test['hour'].apply(categorical_to_numeric) # applying the above conversion logic to test data
+test['hour'] = hour_bins.labels_of(test['hour']) # applying the above conversion logic to test data
 
 test.head()
 """ 
@@ -278,6 +291,7 @@ test.head()
 4  2011-01-20 04:00:00       1        0           1        1  10.66  12.880        56    11.0014     0 """
 
 # drop unnecessary columns
+train_datetimes = train['datetime'] # kept for the time ordered cross validation at the end
 train = train.drop(['datetime'], axis=1)
 test = test.drop(['datetime'], axis=1)
 train.head()
@@ -426,7 +440,7 @@ a.plot()
 plt.show()
 
 # count based on holiday
-a = train.groupby('holiday')[['count']].mean()
+a = cube.rollup('holiday', agg='mean').to_frame()
 a.plot()
 plt.show()
 
@@ -437,39 +451,75 @@ def select_features(data):
 
 from sklearn.dummy import DummyRegressor
 
-# a method to show results of various model and their predictions
-def _simple_modeling(X_train, X_test, y_train, y_test):
+# method to return the candidate models compared below
+def candidate_models():
     # sepcifying the model names
-    models = [
+    return [
         ('dummy-mean', DummyRegressor(strategy='mean')),
         ('dummy-median', DummyRegressor(strategy='median')),
         ('random-forest', RandomForestRegressor(random_state=0)),
     ]
-    
-    results = []
-
-    for name, model in models:
-        model.fit(X_train, y_train)# fitting the training data to model
-        y_pred = model.predict(X_test) # doing predictions using the model
-        
-        results.append((name, y_test, y_pred)) # creating the list of predictions from various models
-        
-    return results
 
 from sklearn.metrics import mean_squared_log_error as rmsle
 
-# a method to return the performance metric of the model used in the above method
-def simple_modeling(X_train, X_test, y_train, y_test):
-    results = _simple_modeling(X_train, X_test, y_train, y_test) # using the function defined above to caluclate the predictions
+# the candidates are compared with the fit time, predict time and peak memory of every model, the table is printed as
+# each model finishes, its rows in the order of candidate_models. With n_jobs > 1 (only from code under a
+# if __name__ == '__main__': guard, this script has none) they are fitted in parallel worker processes, train / test
+# arrays in shared memory: comparing the models then takes about the time of the slowest one instead of the sum of
+# all of them
+from eda_utils.benchmark import ModelBenchmark
+
+# a method to return the performance metric of the models of candidate_models
+def simple_modeling(X_train, X_test, y_train, y_test, n_jobs=1):
+    benchmark = ModelBenchmark(candidate_models(), metrics={'rmsle': rmsle}, n_jobs=n_jobs)
+    for results in benchmark.iter_run(X_train, X_test, y_train, y_test):
+        print(results) # the models finished so far
     
-    return [ (r[0], rmsle(r[1], r[2]) ) for r in results] # returning the performance metrics
+    return list(benchmark.results_['rmsle'].items()) # returning the performance metrics
 
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import cross_val_score
 
 forest_reg = RandomForestRegressor(n_estimators=100) # instantiating the random Forest Regressor
 
-score = cross_val_score(forest_reg, train, train, cv=4) # calcuating the cross validation score
+# time ordered cross validation: every fold trains on the hours before its test block (1 day left out in between)
+# instead of shuffled blocks where future hours leak into the training rows. The rows sorted by datetime are written
+# once and memory mapped by the folds. n_jobs=1: the folds are fitted in this process, as the script runs at module
+# level without a if __name__ == '__main__': guard (worker processes started with spawn would import it again)
+from eda_utils.time_cv import TimeSeriesCV
+
+cv = TimeSeriesCV(n_splits=4, scheme='expanding', gap='1D')
+print(cv.folds(train_datetimes)) # training and test datetimes of every fold
+with cv.prepare(train[select_features(train)], train['count'], train_datetimes):
+    score = cv.cross_validate(forest_reg, metrics={'rmsle': rmsle}, n_jobs=1) # calcuating the cross validation score
 
 print (score)
-""" [0.99516611 0.99725277 0.99769427 0.9973147 ] """
+"""
+               test_from  n_train  fit_time     rmsle
+fold
+0    2011-05-17 16:00:00     2154  0.686504  0.659312
+1    2011-10-13 12:00:00     4331  1.192894  0.678154
+2    2012-03-09 10:00:00     6508  1.740537  0.564715
+3    2012-08-05 06:00:00     8685  2.252833  0.530225 """
+
+# online mode: new hourly counts arrive continuously, retraining the forest on all the rows for every new batch is
+# expensive. The online model keeps only X'X and X'y of a ridge regression on calendar and weather features, every
+# micro-batch (one day of hours here) updates it in milliseconds, and its state is checkpointed as json
+from eda_utils.online_model import OnlineDemandModel
+import time
+
+stream = pd.read_csv('case_study2_bikes/train_bikes.csv', parse_dates=['datetime']) # the hours in the order they arrived
+online_model = OnlineDemandModel(alpha=1.0, half_life=24 * 90) # a row weighs half as much 90 days later
+
+y_true, y_pred, start = [], [], time.perf_counter()
+for day, batch in stream.groupby(stream['datetime'].dt.date, sort=True):
+    if online_model.n_rows > 0:
+        y_true.append(batch['count'].to_numpy()) # forecast of the day before its counts are known
+        y_pred.append(online_model.predict(batch))
+    online_model.partial_fit(batch)
+elapsed = time.perf_counter() - start
+
+print('batches: {}, ms per batch: {:.2f}, rmsle of the forecasts: {:.4f}'.format(
+    stream['datetime'].dt.date.nunique(), 1000 * elapsed / stream['datetime'].dt.date.nunique(),
+    rmsle(np.concatenate(y_true), np.concatenate(y_pred))))
+""" batches: 456, ms per batch: 2.18, rmsle of the forecasts: 0.1417 """
+online_model.checkpoint('case_study2_bikes/online_model.json') # restored with OnlineDemandModel.restore
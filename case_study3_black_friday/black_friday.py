@@ -62,7 +62,11 @@ print(df2.shape) # checking the number of rows and columns in the test dataset
 # (233599, 11)
 
 # Merging both train and test dataset.
-df = df1.append(df2, sort=False)
+# the schema of the result is resolved before copying: Purchase (absent from test) stays an integer column with <NA>
+# for the test rows instead of becoming float, Product_ID and City_Category share one dictionary of categories, every
+# column is allocated once and the file of every row is kept in the compact 'source' column (train / test)
+from eda_utils.frame_concat import concat_frames
+df = concat_frames({'train': df1, 'test': df2}, categorize=['Product_ID', 'City_Category'])
 
 df.shape
 # (783667, 12)
@@ -90,6 +94,18 @@ min    1.000001e+06       0.000000        0.000000            1.000000
 75%    1.004478e+06      14.000000        1.000000            8.000000           15.000000           16.000000   12054.000000
 max    1.006040e+06      20.000000        1.000000           20.000000           18.000000           18.000000   23961.000000 """
 
+# User_ID and Product_ID are what personalised offers need: before dropping them, the purchases of the train rows are
+# kept as a sparse users x products matrix (ids mapped once to rows / columns), queried without any dense table
+from eda_utils.interactions import InteractionMatrix
+
+purchases = df[df['source'] == 'train']
+interactions = InteractionMatrix.from_frame(purchases, user='User_ID', item='Product_ID', value='Purchase')
+print(interactions.shape, interactions.density) # users x products, fraction of the cells with a purchase
+
+interactions.top_items(k=3, users=purchases['User_ID'].iloc[:2]) # the products each user spent the most on
+interactions.similar_items(purchases['Product_ID'].iloc[:1], k=5) # bought by the same users (cosine similarity)
+interactions.top_items_by_segment(purchases.groupby('User_ID')['Age'].first(), k=3) # best products per age band
+
 # Dropping unnecessary fields from the dataset.
 df.drop(['User_ID'],axis=1,inplace=True)
 
@@ -140,7 +156,11 @@ df.City_Category.unique() # checking the uniquce values in the City_Category col
 # array(['A', 'C', 'B'], dtype=object)
 
 # creating dummies for the categorical data.
-city = pd.get_dummies(df['City_Category'],drop_first=True)
+# the dummies come from a vocabulary learnt once, the same encoder gives the same columns for new data. With 3 cities
+# the 2 columns stay dense, the high cardinality Product_ID is encoded into a sparse matrix at the end
+from eda_utils.sparse_onehot import SparseOneHotEncoder
+city_encoder = SparseOneHotEncoder(drop_first=True).fit(df[['City_Category']])
+city = city_encoder.transform_frame(df[['City_Category']], prefix=False, sparse=False)
 
 city
 """ 
@@ -282,7 +302,7 @@ C                                  0
 dtype: int64 """
 
 # Filling the nan values with the mean of the column.
-df['Purchase'] = df['Purchase'].fillna(df['Purchase'].mean())
+df['Purchase'] = df['Purchase'].astype('float64').fillna(df['Purchase'].mean())
 
 df.head() # looking at the datset after filling the null value
 """ 
@@ -402,7 +422,7 @@ memory usage: 68.8+ MB """
 df_i = df.copy()
 
 # Dropping the unnecessary field.
-df_i.drop('Product_ID',axis=1,inplace=True)
+df_i.drop(['Product_ID', 'source'],axis=1,inplace=True)
 df_i.head(10)
 """ 
    Gender  Age  Occupation  Stay_In_Current_City_Years  Marital_Status  cat1  cat2  cat3  Purchase  B  C
@@ -417,30 +437,35 @@ df_i.head(10)
 8       1    5           7                           2               1     1  16.0  16.0   15686.0  1  0
 9       1    3          20                           1               1     8   8.0  16.0    7871.0  0  0 """
 
+# the bars below cover all the ~780k rows: the means and 95% confidence intervals of all the bars of a plot are
+# computed at once (analytic interval for the large groups, one vectorized bootstrap for the others) and the bars are
+# drawn from that table, instead of sns.barplot bootstrapping every bar on its own
+from eda_utils.grouped_ci import grouped_ci, barplot_ci
+
 # Visualizing Age Vs Purchased.
-sns.barplot('Age','Purchase',hue='Gender',data=df_i)
+barplot_ci(grouped_ci(df_i, 'Age', 'Purchase', hue='Gender'))
 plt.show()
 
 # Purchasing of goods of each range of age are almost equal. We can conclude that the percentage of purchasing goods 
 # of men over women is higher.
 
 # Visualizing Occupation Vs Purchased.
-sns.barplot('Occupation','Purchase',hue='Stay_In_Current_City_Years',data=df_i)
+barplot_ci(grouped_ci(df_i, 'Occupation', 'Purchase', hue='Stay_In_Current_City_Years'))
 plt.show()
 
 # All the occupation contributes almost same in purchasing rates and it won't affect alot that how many years you 
 # live in a city.
 
 # Visualizing Product_category1 Vs Purchased.
-sns.barplot('cat1','Purchase',hue='Marital_Status',data=df_i)
+barplot_ci(grouped_ci(df_i, 'cat1', 'Purchase', hue='Marital_Status'))
 plt.show()
 
 # Visualizing Product_category2 Vs Purchased.
-sns.barplot('cat2','Purchase',hue='Marital_Status',data=df_i)
+barplot_ci(grouped_ci(df_i, 'cat2', 'Purchase', hue='Marital_Status'))
 plt.show()
 
 # Visualizing Product_category3 Vs Purchased.
-sns.barplot('cat3','Purchase',hue='Marital_Status',data=df_i)
+barplot_ci(grouped_ci(df_i, 'cat3', 'Purchase', hue='Marital_Status'))
 plt.show()
 
 # One thing we can clearly conclude is that there is no such variation in the percentage of the purchasing whether 
@@ -508,3 +533,17 @@ X_test
 # Now we have features for both training and testing. The data can now be converted to a dataframe, if necessary, 
 # and can be fed to a machine learning model.
 
+# Product_ID (thousands of products) is left out of X above, its dense dummies would be almost all zeros. Kept sparse,
+# the one-hot columns of the products go with the other features into one CSR matrix, scaled without centering
+# (centering would make it dense), which the linear models of sklearn take as it is
+rows_train, rows_test = train_test_split(np.arange(len(X)), test_size = 0.25, random_state = 5) # same split as above
+product_encoder = SparseOneHotEncoder(handle_unknown='ignore').fit(df[['Product_ID']].iloc[rows_train])
+X_train_sparse = product_encoder.transform(df[['Product_ID']].iloc[rows_train], passthrough=X.iloc[rows_train])
+X_test_sparse = product_encoder.transform(df[['Product_ID']].iloc[rows_test], passthrough=X.iloc[rows_test]) # products unseen in training get no column
+
+sc_sparse = StandardScaler(with_mean=False)
+X_train_sparse = sc_sparse.fit_transform(X_train_sparse)
+X_test_sparse = sc_sparse.transform(X_test_sparse)
+print(X_train_sparse.shape, X_train_sparse.nnz) # features + one column per product, non zero values
+
+product_encoder.save('case_study3_black_friday/product_vocabulary.json') # the same product columns for new transactions
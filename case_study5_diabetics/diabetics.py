@@ -27,6 +27,8 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from eda_utils.correlation import corr # correlation matrix computed with a single matrix product
+from eda_utils.imputation import StreamingImputer # mean / median of many columns in one pass
 
 #Loading the dataset
 diabetes_data = pd.read_csv('case_study5_diabetics/diabetes.csv')
@@ -154,10 +156,9 @@ Age                           0
 Outcome                       0
 dtype: int64 """
 
-diabetes_data_copy['BloodPressure'].fillna(diabetes_data_copy['BloodPressure'].mean(), inplace = True)
-diabetes_data_copy['SkinThickness'].fillna(diabetes_data_copy['SkinThickness'].median(), inplace = True)
-diabetes_data_copy['Insulin'].fillna(diabetes_data_copy['Insulin'].median(), inplace = True)
-diabetes_data_copy['BMI'].fillna(diabetes_data_copy['BMI'].median(), inplace = True)
+# mean / median of the remaining columns learnt in one pass, then the missing values are replaced in place
+imputer = StreamingImputer({'BloodPressure': 'mean', 'SkinThickness': 'median', 'Insulin': 'median', 'BMI': 'median'})
+missing_indicators = imputer.fit(diabetes_data_copy).transform(diabetes_data_copy) # packed bits, 1 per row and column
 diabetes_data_copy.isna().sum()
 """ 
 Pregnancies                 0
@@ -278,12 +279,12 @@ Pearson's Correlation Coefficient:
 
 Heatmap for unclean data """
 plt.figure(figsize=(12,10))  # on this line I just set the size of figure to 12 by 10.
-p=sns.heatmap(diabetes_data.corr(), annot=True,cmap ='RdYlGn')  # seaborn has very simple solution for heatmap
+p=sns.heatmap(corr(diabetes_data), annot=True,cmap ='RdYlGn')  # seaborn has very simple solution for heatmap
 plt.show()
 
 # Heatmap for clean data
 plt.figure(figsize=(12,10))  # on this line I just set the size of figure to 12 by 10.
-p=sns.heatmap(diabetes_data_copy.corr(), annot=True,cmap ='RdYlGn')  # seaborn has very simple solution for heatmap
+p=sns.heatmap(corr(diabetes_data_copy), annot=True,cmap ='RdYlGn')  # seaborn has very simple solution for heatmap
 plt.show()
 
 """ 
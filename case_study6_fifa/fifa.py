@@ -9,6 +9,9 @@ sns.set(style="ticks")
 flatui = ["#9b59b6", "#3498db", "#95a5a6", "#e74c3c", "#34495e", "#2ecc71"] # defining the colour palette
 flatui = sns.color_palette(flatui)
 from wordcloud import WordCloud  
+from eda_utils.correlation import corr # correlation matrix computed with a single matrix product
+from eda_utils.heatmap import clustered_heatmap # clustered heatmap, annotated only when the cells can be read
+from eda_utils.imputation import StreamingImputer # mean, median and mode of many columns in one pass
 ## Display all the columns of the dataframe
 pd.pandas.set_option('display.max_columns',None)
 
@@ -379,7 +382,13 @@ df.columns # listing the columns
 
 # Plotting the Heatmap of the columns using correlation matrix
 f,ax = plt.subplots(figsize=(25, 15))
-sns.heatmap(df.corr(), annot=True, linewidths=0.5,linecolor="red", fmt= '.1f',ax=ax)
+sns.heatmap(corr(df), annot=True, linewidths=0.5,linecolor="red", fmt= '.1f',ax=ax)
+plt.show()
+
+# Same heatmap with the correlated columns grouped together by hierarchical clustering. With many more columns the
+# cells are averaged by blocks to fit the figure and the annotations are dropped automatically
+f,ax = plt.subplots(figsize=(25, 15))
+clustered_heatmap(corr(df), ax=ax, linewidths=0.5, linecolor="red", fmt='.1f')
 plt.show()
 
 #Nationality Text Size = Nationality Player Count
@@ -407,29 +416,27 @@ df['Club'].fillna('No Club', inplace = True)
 df['Position'].fillna('ST', inplace = True)
 
 # selecting columns to impute the missing values by mean
-to_impute_by_mean = df.loc[:, ['Crossing', 'Finishing', 'HeadingAccuracy',
-                                 'ShortPassing', 'Volleys', 'Dribbling', 'Curve', 'FKAccuracy',
-                                 'LongPassing', 'BallControl', 'Acceleration', 'SprintSpeed',
-                                 'Agility', 'Reactions', 'Balance', 'ShotPower', 'Jumping',
-                                 'Stamina', 'Strength', 'LongShots', 'Aggression', 'Interceptions',
-                                 'Positioning', 'Vision', 'Penalties', 'Composure', 'Marking',
-                                 'StandingTackle', 'SlidingTackle', 'GKDiving', 'GKHandling',
-                                 'GKKicking', 'GKPositioning', 'GKReflexes']]
-
-# replacing the missing values with mean
-for i in to_impute_by_mean.columns:
-    df[i].fillna(df[i].mean(), inplace = True)
+to_impute_by_mean = ['Crossing', 'Finishing', 'HeadingAccuracy',
+                     'ShortPassing', 'Volleys', 'Dribbling', 'Curve', 'FKAccuracy',
+                     'LongPassing', 'BallControl', 'Acceleration', 'SprintSpeed',
+                     'Agility', 'Reactions', 'Balance', 'ShotPower', 'Jumping',
+                     'Stamina', 'Strength', 'LongShots', 'Aggression', 'Interceptions',
+                     'Positioning', 'Vision', 'Penalties', 'Composure', 'Marking',
+                     'StandingTackle', 'SlidingTackle', 'GKDiving', 'GKHandling',
+                     'GKKicking', 'GKPositioning', 'GKReflexes']
 
 '''These are categorical variables and will be imputed by mode.'''
-to_impute_by_mode = df.loc[:, ['Body Type','International Reputation', 'Height', 'Weight', 'Preferred Foot','Jersey Number']]
-for i in to_impute_by_mode.columns:
-    df[i].fillna(df[i].mode()[0], inplace = True)
+to_impute_by_mode = ['Body Type','International Reputation', 'Height', 'Weight', 'Preferred Foot','Jersey Number']
 
 '''The following variables are either discrete numerical or continuous numerical variables.
 So the will be imputed by median.'''
-to_impute_by_median = df.loc[:, ['Weak Foot', 'Skill Moves', ]]
-for i in to_impute_by_median.columns:
-    df[i].fillna(df[i].median(), inplace = True)
+to_impute_by_median = ['Weak Foot', 'Skill Moves', ]
+
+# mean, mode and median of all these columns learnt in one pass, then the missing values are replaced in place
+strategies = {**dict.fromkeys(to_impute_by_mean, 'mean'), **dict.fromkeys(to_impute_by_mode, 'mode'),
+              **dict.fromkeys(to_impute_by_median, 'median')}
+imputer = StreamingImputer(strategies, indicators=False).fit(df)
+imputer.transform(df)
 
 '''Columns remaining to be imputed'''
 df.columns[df.isna().any()]
@@ -27,10 +27,18 @@ pd.pandas.set_option('display.max_columns',None)
 
 activity = pd.read_csv('case_study7_fitbit/FitBit data.csv') # importing the dataset
 
+# report about the dataset built from column statistics persisted next to it, so that when rows are appended to the
+# csv only the new rows are profiled (and only the new or modified columns are profiled again)
+from eda_utils.profiling import profile_csv
+profile = profile_csv('case_study7_fitbit/FitBit data.csv', state_path='case_study7_fitbit/profile_report.state.json')
+profile.summary()
+profile.to_html('case_study7_fitbit/profile_report.html')
+
+# the full pandas_profiling report (correlations, interactions, samples) profiles every row again on every run, build
+# it only when those sections are needed
 # https://stackoverflow.com/questions/52553062/pandas-profiling-doesnt-display-the-output
-import pandas_profiling
-report = activity.profile_report() # seeing the full report about the dataset
-report.to_file('case_study7_fitbit/profile_report.html')
+# import pandas_profiling
+# activity.profile_report().to_file('case_study7_fitbit/profile_report.html')
 
 activity.shape 
 # (457, 15)
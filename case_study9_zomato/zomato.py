@@ -38,6 +38,7 @@ import pandas as pd
 import seaborn as sb
 import matplotlib.pyplot as plt
 import seaborn as sns
+from eda_utils.rank_correlation import kendall_corr # columns ranked once, pairs computed in parallel
 from sklearn.linear_model import LogisticRegression
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
@@ -372,7 +373,9 @@ zomato_en.head() # looking at the dataset after transformation
 4         4  600.0             4          0     0     0 """
 
 #Get Correlation between different variables
-corr = zomato_en.corr(method='kendall')
+# same result as zomato_en.corr(method='kendall'). n_jobs=1: this script runs at module level without a
+# if __name__ == '__main__': guard, worker processes started with spawn / forkserver would import it again
+corr = kendall_corr(zomato_en, n_jobs=1)
 plt.figure(figsize=(15,8))
 sns.heatmap(corr, annot=True)
 plt.show()
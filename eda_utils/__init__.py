@@ -0,0 +1,35 @@
+""" 
+Shared helpers used by the case study scripts.
+
+The case studies are run from the root of the repository (all the dataset paths are relative to it), so the
+helpers are imported as e.g. `from eda_utils.profiling import profile_csv`.
+
+Modules:
+- chunked_reader: read csv files in chunks, optionally resuming from a byte offset
+- sketches: mergeable statistic states (moments, quantile sketch, distinct count sketch)
+- profiling: incremental column profiling whose states are persisted next to the report
+- correlation: correlation matrices computed with matrix products (BLAS), NaN aware
+- rank_correlation: Spearman and Kendall tau-b (Knight's algorithm) for all the pairs of columns, in parallel
+- comoments: mergeable co-moment accumulators, covariance and correlation of tables larger than memory
+- heatmap: clustered, block aggregated (and optionally tiled) heatmaps of very wide correlation matrices
+- house_price_pipeline: fitted, serializable feature engineering of the house price case study, applied in one pass
+- rare_labels: rare label grouping of many categorical columns at once, on integer codes
+- target_encoding: ordered / mean / smoothed target encoding with an out of fold mode
+- imputation: mean / median / mode imputation learnt in one pass over chunks, packed missing indicators
+- artifacts: binary columnar (.npy + schema) handoff of frames between scripts, memory mapped on read
+- pipeline: stages with declared inputs / outputs / parameters, re-run only when their fingerprint changed, in parallel
+- lasso_path: Lasso / ElasticNet path with warm starts and strong rules, cross validated in parallel
+- shared_arrays: numpy arrays shared with the worker processes of a pool
+- stability_selection: randomized Lasso fits on subsamples in parallel, selection frequencies added up as they come
+- filter_selection: variance, duplicate, F test / mutual information and correlation pre-screening of the features
+- incremental_rfe: recursive feature elimination for linear regression with rank-one downdates, full elimination order in one run
+- calendar_features: hour / day / weekday / week / month / year / holiday arrays of a datetime column, computed once and shared
+- olap_cube: dense cube of sums / counts (and optional quantile sketches) over low cardinality dimensions, roll-ups and slices
+- binning: scalar if / elif binning functions compiled into breakpoints, columns binned with np.searchsorted into categorical codes
+- benchmark: candidate models fitted in parallel on shared memory arrays, fit / predict time, peak memory and metrics streamed to a table
+- time_cv: expanding window / rolling origin cross validation keyed on a datetime column, memory mapped sorted data, folds fitted in parallel
+- online_model: ridge demand model updated with micro-batches from X'X / X'y (optional forgetting), json checkpoints
+- frame_concat: row concatenation with the schema resolved first (nullable ints, shared category dictionaries), one allocation per column, source flag
+- interactions: sparse users x products matrix (CSR / CSC) with id dictionaries, top-k, co-purchase similarity and segment totals
+- sparse_onehot: one-hot encoding straight into CSR matrices, json vocabulary, unknown categories ignored or refused
+- grouped_ci: means and bootstrap / analytic confidence intervals of all the bars of a bar plot at once, and the bar plot drawn from them """
@@ -0,0 +1,141 @@
+"""
+Binary, memory mapped handoff of data frames between the scripts of a case study.
+
+2_feature_engineering.py wrote X_train.csv (float64 as text) and 3_feature_selection.py parsed it back right away:
+the values were formatted and parsed once more, and the reader held the text and the frame in memory at the same
+time. An artifact is instead a directory with:
+- one .npy file per column, in its own dtype (the labels of object / category columns are stored as integer codes)
+- schema.json: the columns, their dtype, the labels of the coded columns and the file of every column. It is
+  written last, so an artifact without schema.json is incomplete and is not read
+
+load_frame memory maps the .npy files (np.load(mmap_mode='r')) and builds the frame on top of them without copying,
+so only the pages actually used are read from the disk. float32=True stores (or loads) the float columns as float32,
+half the size, when that precision is enough.
+
+Usage:
+    save_frame(data, 'case_study1_advanced_house_price_prediction/X_train')
+    dataset = load_frame('case_study1_advanced_house_price_prediction/X_train') # read only, memory mapped
+    dataset = load_frame('case_study1_advanced_house_price_prediction/X_train', columns=['Id', 'SalePrice'])
+
+    store = ArtifactStore('case_study1_advanced_house_price_prediction/artifacts')
+    store.save('X_train', data, float32=True)
+    store.load('X_train') """
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+
+SCHEMA_FILE = 'schema.json'
+SCHEMA_VERSION = 1
+
+
+# method to return (array to store, schema entry) of one column
+def _encode_column(column, float32):
+    if isinstance(column.dtype, pd.CategoricalDtype) or not (is_numeric_dtype(column) or is_bool_dtype(column)
+                                                              or is_datetime64_any_dtype(column)):
+        codes, labels = pd.factorize(column)
+        codes = codes.astype('int32' if len(labels) < 2 ** 31 else 'int64')
+        return codes, {'kind': 'labels', 'dtype': str(codes.dtype), 'labels': [_to_json(v) for v in labels],
+                       'categorical': isinstance(column.dtype, pd.CategoricalDtype),
+                       'labels_dtype': str(column.dtype.categories.dtype if isinstance(column.dtype, pd.CategoricalDtype)
+                                           else column.dtype)}
+    if is_datetime64_any_dtype(column):
+        values = column.to_numpy()
+        return values.view('int64'), {'kind': 'datetime', 'dtype': 'int64', 'datetime_dtype': str(values.dtype)}
+    values = column.to_numpy()
+    if values.dtype == object: # nullable extension dtypes
+        values = column.to_numpy(dtype='float64', na_value=np.nan)
+    if float32 and values.dtype.kind == 'f':
+        values = values.astype('float32')
+    return values, {'kind': 'values', 'dtype': str(values.dtype)}
+
+
+def _to_json(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# method to build a column from its stored array, without copying for the plain values
+def _decode_column(values, entry):
+    if entry['kind'] == 'labels':
+        labels = pd.Index(entry['labels'], dtype=entry['labels_dtype'])
+        categorical = pd.Categorical.from_codes(values, categories=labels)
+        return categorical if entry['categorical'] else pd.array(np.asarray(categorical, dtype='object'), dtype=labels.dtype)
+    if entry['kind'] == 'datetime':
+        return values.view(entry['datetime_dtype'])
+    return values
+
+
+# method to write a frame as an artifact directory, float32: store the float columns as float32
+def save_frame(frame, path, float32=False):
+    os.makedirs(path, exist_ok=True)
+    schema_path = os.path.join(path, SCHEMA_FILE)
+    if os.path.exists(schema_path):
+        os.remove(schema_path) # the artifact is incomplete until the new schema is written
+    columns = []
+    for i, name in enumerate(frame.columns):
+        values, entry = _encode_column(frame[name], float32)
+        entry.update({'name': _to_json(name), 'file': '{}.npy'.format(i)})
+        np.save(os.path.join(path, entry['file']), np.ascontiguousarray(values))
+        columns.append(entry)
+    # column files of an earlier, wider frame are removed, the directory only holds the files of the schema
+    files = {entry['file'] for entry in columns}
+    for name in os.listdir(path):
+        if name.endswith('.npy') and name not in files:
+            os.remove(os.path.join(path, name))
+    schema = {'version': SCHEMA_VERSION, 'n_rows': len(frame), 'columns': columns}
+    with open(schema_path + '.tmp', 'w') as f:
+        json.dump(schema, f, indent=1)
+    os.replace(schema_path + '.tmp', schema_path)
+    return schema
+
+
+def read_schema(path):
+    schema_path = os.path.join(path, SCHEMA_FILE)
+    if not os.path.exists(schema_path):
+        raise FileNotFoundError('{} is not a complete artifact (no {})'.format(path, SCHEMA_FILE))
+    with open(schema_path) as f:
+        schema = json.load(f)
+    if schema.get('version') != SCHEMA_VERSION:
+        raise ValueError('artifact {} has version {}, expected {}'.format(path, schema.get('version'), SCHEMA_VERSION))
+    return schema
+
+
+# method to read an artifact directory as a frame
+# - columns: only read these columns
+# - mmap: memory map the files (read only, no copy), else read them in memory
+# - float32: convert the float64 columns to float32 (a copy)
+def load_frame(path, columns=None, mmap=True, float32=False):
+    schema = read_schema(path)
+    entries = {entry['name']: entry for entry in schema['columns']}
+    names = list(entries) if columns is None else list(columns)
+    data = {}
+    for name in names:
+        entry = entries[name]
+        values = np.load(os.path.join(path, entry['file']), mmap_mode='r' if mmap else None)
+        values = values.view(np.ndarray) # plain array on the same (mapped) memory
+        if float32 and values.dtype == np.float64:
+            values = values.astype('float32')
+        data[name] = _decode_column(values, entry)
+    return pd.DataFrame(data, columns=names, copy=False)
+
+
+class ArtifactStore:
+
+    # root: directory holding one artifact directory per name
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.path(name), SCHEMA_FILE))
+
+    def save(self, name, frame, float32=False):
+        return save_frame(frame, self.path(name), float32=float32)
+
+    def load(self, name, columns=None, mmap=True, float32=False):
+        return load_frame(self.path(name), columns=columns, mmap=mmap, float32=float32)
@@ -0,0 +1,155 @@
+"""
+Comparison of candidate models run in parallel, with the time and memory of every model.
+
+The model comparison of bikes.py fitted the dummy regressors and the random forest one after the other, so comparing
+n models took the sum of their times. ModelBenchmark runs every (name, estimator) candidate as its own task of a
+process pool:
+- X_train, X_test, y_train and y_test are copied once into shared memory (see shared_arrays.py), the workers read
+  them without any copy
+- every task records the fit time, the predict time, the peak resident memory of the worker during the fit and the
+  predict (the peak is reset before each task through /proc/self/clear_refs on Linux, elsewhere it is the peak of the
+  worker so far) and the value of every metric on the test rows
+- the results are added to the table as the models finish (iter_run yields the table each time), so the comparison
+  takes about the time of the slowest model with enough workers. The rows stay in the order of the candidates,
+  whichever model finishes first. A candidate which fails gets its error in the table instead of stopping the others
+
+Usage:
+    benchmark = ModelBenchmark([('dummy-mean', DummyRegressor()), ('random-forest', RandomForestRegressor())],
+                               metrics={'rmsle': mean_squared_log_error}, n_jobs=None)
+    for table in benchmark.iter_run(X_train, X_test, y_train, y_test):
+        print(table) # the models finished so far
+    benchmark.results_ # one row per candidate: fit_time, predict_time, peak_rss_mb, one column per metric, error """
+
+import os
+import resource
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+from eda_utils.shared_arrays import attach, share, shared
+
+TIMINGS = ('fit_time', 'predict_time', 'peak_rss_mb')
+
+
+# method to reset the peak resident memory of the process, False when it cannot be reset
+def _reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+# method to return the peak resident memory of the process in MB
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024 # bytes on macOS, kB elsewhere
+
+
+# method to fit and score one candidate, returns its row of the results and its predictions
+def _run_candidate(name, estimator, metrics, X_train, X_test, y_train, y_test):
+    row = {'model': name}
+    y_pred = None
+    _reset_peak_rss()
+    try:
+        start = time.perf_counter()
+        estimator.fit(X_train, y_train)
+        row['fit_time'] = time.perf_counter() - start
+        start = time.perf_counter()
+        y_pred = estimator.predict(X_test)
+        row['predict_time'] = time.perf_counter() - start
+        row['peak_rss_mb'] = _peak_rss_mb()
+        for metric, score in metrics.items():
+            row[metric] = score(y_test, y_pred)
+    except Exception as error:
+        row['error'] = '{}: {}'.format(type(error).__name__, error)
+    return row, y_pred
+
+
+def _run_candidate_shared(name, estimator, metrics):
+    return _run_candidate(name, estimator, metrics, shared('X_train'), shared('X_test'), shared('y_train'),
+                          shared('y_test'))
+
+
+class ModelBenchmark:
+
+    # candidates: list of (name, estimator), the estimators are fitted in the workers (the ones given stay unfitted)
+    # metrics: metric name -> function(y_true, y_pred)
+    # n_jobs: number of worker processes, 1 to stay in the current process, None for all the cpus
+    # keep_predictions: keep the predictions of every candidate on the test rows in predictions_
+    def __init__(self, candidates, metrics, n_jobs=None, keep_predictions=False):
+        self.candidates = list(candidates)
+        names = [name for name, _ in self.candidates]
+        if len(set(names)) != len(names):
+            raise ValueError('the candidate names must be unique, got {}'.format(names))
+        self.metrics = dict(metrics)
+        self.n_jobs = n_jobs
+        self.keep_predictions = keep_predictions
+        self.results_ = None
+        self.predictions_ = {}
+        self._rows = []
+
+    def run(self, X_train, X_test, y_train, y_test):
+        for _ in self.iter_run(X_train, X_test, y_train, y_test):
+            pass
+        return self.results_
+
+    # generator running the candidates, yields the results table each time a candidate has finished
+    def iter_run(self, X_train, X_test, y_train, y_test):
+        arrays = {'X_train': np.asarray(X_train), 'X_test': np.asarray(X_test),
+                  'y_train': np.asarray(y_train).ravel(), 'y_test': np.asarray(y_test).ravel()}
+        self._rows = []
+        self.results_ = self._table()
+        self.predictions_ = {}
+        n_jobs = min(self.n_jobs or os.cpu_count() or 1, max(1, len(self.candidates)))
+        if n_jobs == 1:
+            for name, estimator in self.candidates:
+                self._add(*_run_candidate(name, clone(estimator), self.metrics, *arrays.values()))
+                yield self.results_
+            return
+        with share(arrays) as spec:
+            pool = ProcessPoolExecutor(n_jobs, initializer=attach, initargs=(spec,))
+            try:
+                running = [pool.submit(_run_candidate_shared, name, estimator, self.metrics)
+                           for name, estimator in self.candidates]
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        running.remove(future)
+                        self._add(*future.result())
+                        yield self.results_
+            finally:
+                # the consumer may stop iterating early: the candidates not started yet are cancelled
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def _add(self, row, y_pred):
+        self._rows.append(row)
+        self.results_ = self._table()
+        if self.keep_predictions and y_pred is not None:
+            self.predictions_[row['model']] = y_pred
+
+    # method to return the rows of the finished candidates as a table, in the order of the candidates
+    def _table(self):
+        columns = ['model', *TIMINGS, *self.metrics, 'error']
+        position = {name: i for i, (name, _) in enumerate(self.candidates)}
+        rows = sorted(self._rows, key=lambda row: position[row['model']])
+        return pd.DataFrame(rows, columns=columns).set_index('model')
+
+    # method to return the results sorted by a metric (the first one by default), best first
+    def ranking(self, metric=None, ascending=True):
+        if self.results_ is None:
+            raise ValueError('ModelBenchmark is not run yet, call run first')
+        metric = metric or next(iter(self.metrics))
+        return self.results_.sort_values(metric, ascending=ascending)
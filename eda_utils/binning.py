@@ -0,0 +1,193 @@
+"""
+Binning of whole columns from breakpoints, or from a scalar if / elif binning function.
+
+bikes.py buckets the hours with train['hour'].apply(categorical_to_numeric) and the loan notebook bins loan_amnt,
+funded_amnt_inv, int_rate... with df[col].apply(lambda x: loan_amount(x)): one python call per row. A Binner holds
+sorted breakpoints and one label per bin, finds the bin of every value of a column with np.searchsorted and returns
+categorical codes (int8) with the labels as categories, so no label string is created per row.
+
+Binner.from_function compiles a binning function of the form
+    def loan_amount(n):
+        if n < 5000:
+            return 'low'
+        elif n >= 5000 and n < 15000:
+            return 'medium'
+        else:
+            return 'very high'
+(comparisons of the argument with constants, chained like 0 <= x < 6 or joined with `and`, each branch returning a
+constant) into the equivalent Binner. Values falling in no branch (below the lower bound of the first branch, or
+above the last branch when there is no else) are missing, like the None the function returns. NaN values are missing
+too by default, where the function sends them to its else branch (every comparison with NaN is False): with
+nan='function' they get the label the function returns for NaN instead. The compiled bins are checked against the
+function around every breakpoint, and functions of any other form are refused.
+
+Usage:
+    Binner([5000, 15000, 25000], ['low', 'medium', 'high', 'very high'])(df['loan_amnt']) # pd.Categorical
+    binner = Binner.from_function(loan_amount)
+    df['loan_amnt'] = binner(df['loan_amnt'])
+    train['hour'] = Binner.from_function(categorical_to_numeric).labels_of(train['hour']) # same as the apply, but NaN
+    Binner.from_function(loan_amount, nan='function').labels_of(df['loan_amnt']) # same as the apply, NaN too """
+
+import ast
+import inspect
+import textwrap
+
+import numpy as np
+import pandas as pd
+
+NAN_MODES = ('missing', 'function')
+
+
+class Binner:
+
+    # breakpoints: sorted bin edges, labels: one label per bin (len(breakpoints) + 1), None for a missing bin
+    # right: False for bins [b_i, b_i+1) (value < breakpoint goes left), True for (b_i, b_i+1] (value <= breakpoint),
+    #   or one boolean per breakpoint
+    # nan_label: label of the NaN values, None for missing
+    def __init__(self, breakpoints, labels, right=False, nan_label=None):
+        self.breakpoints = np.asarray(breakpoints, dtype='float64')
+        if len(labels) != len(self.breakpoints) + 1:
+            raise ValueError('{} breakpoints need {} labels, got {}'.format(len(self.breakpoints),
+                                                                          len(self.breakpoints) + 1, len(labels)))
+        if np.any(np.diff(self.breakpoints) < 0):
+            raise ValueError('breakpoints must be sorted, got {}'.format(list(self.breakpoints)))
+        self.labels = list(labels)
+        self.right = np.broadcast_to(np.asarray(right, dtype=bool), self.breakpoints.shape).copy()
+        self.nan_label = nan_label
+        # categories: the distinct labels in order of first appearance, bin -> code of its label (-1 for missing)
+        self.categories = list(dict.fromkeys(label for label in self.labels + [nan_label] if label is not None))
+        self._bin_codes = np.array([self.categories.index(label) if label is not None else -1
+                                    for label in self.labels + [nan_label]], dtype='int8') # the last entry is for NaN
+
+    # method to return the bin (0 .. len(breakpoints)) of every value, len(breakpoints) + 1 for NaN
+    def bins(self, values):
+        values = np.asarray(values, dtype='float64')
+        if self.right.all():
+            bins = np.searchsorted(self.breakpoints, values, side='left')
+        elif not self.right.any():
+            bins = np.searchsorted(self.breakpoints, values, side='right')
+        else: # mixed sides: count the breakpoints each value is past
+            past = np.where(self.right, values[..., None] > self.breakpoints, values[..., None] >= self.breakpoints)
+            bins = past.sum(axis=-1)
+        return np.where(np.isnan(values), len(self.breakpoints) + 1, bins)
+
+    # method to return the categorical codes (int8, -1 for missing) of the values
+    def codes(self, values):
+        return self._bin_codes[self.bins(values)]
+
+    # method to return the values binned as a pd.Categorical (codes and labels)
+    def __call__(self, values):
+        categorical = pd.Categorical.from_codes(self.codes(values), categories=self.categories, ordered=True)
+        return pd.Series(categorical, index=values.index, name=values.name) if isinstance(values, pd.Series) \
+            else categorical
+
+    # method to return the label of every value (None / NaN for missing), same values as the function compiled except
+    # for NaN with nan='missing'
+    def labels_of(self, values):
+        lookup = np.array(self.categories + [None], dtype=object)
+        codes = self.codes(values)
+        labels = lookup[codes] # code -1 takes the last entry
+        if all(isinstance(c, (int, np.integer)) for c in self.categories) and (codes >= 0).all():
+            labels = labels.astype('int64')
+        return pd.Series(labels, index=values.index, name=values.name) if isinstance(values, pd.Series) else labels
+
+    # nan: 'missing' to leave the NaN values missing, 'function' to give them the label the function returns for NaN
+    @classmethod
+    def from_function(cls, function, check=True, nan='missing'):
+        if nan not in NAN_MODES:
+            raise ValueError('nan must be one of {}, got {!r}'.format(NAN_MODES, nan))
+        source = textwrap.dedent(inspect.getsource(function))
+        definition = ast.parse(source).body[0]
+        if not isinstance(definition, ast.FunctionDef) or len(definition.args.args) != 1:
+            raise ValueError('{} is not a function of one argument'.format(function.__name__))
+        binner = _compile_chain(definition.body, definition.args.args[0].arg, function.__name__, nan == 'function')
+        if check:
+            binner._check(function)
+        return binner
+
+    # method to compare the bins with the function around every breakpoint
+    def _check(self, function):
+        points = [b + d for b in self.breakpoints for d in (-1.0, -1e-9, 0.0, 1e-9, 1.0)]
+        points += [self.breakpoints.min() - 1e6, self.breakpoints.max() + 1e6] if len(self.breakpoints) else [0.0]
+        if self.nan_label is not None:
+            points.append(np.nan)
+        for point, label in zip(points, self.labels_of(np.array(points))):
+            expected = function(point)
+            if not (expected == label or (expected is None and label is None)):
+                raise ValueError('the compiled bins give {!r} for {}, the function {!r}'.format(label, point, expected))
+
+
+# method to turn an if / elif / else chain returning constants into a Binner, keep_nan: NaN takes the label of the
+# else branch, where every comparison with NaN being False sends it
+def _compile_chain(body, argument, name, keep_nan=False):
+    branches = [] # (lower, lower_inclusive, upper, upper_inclusive, label)
+    default, has_default = None, False
+    statements = list(body)
+    # skip a docstring
+    if statements and isinstance(statements[0], ast.Expr) and isinstance(statements[0].value, ast.Constant):
+        statements = statements[1:]
+    while statements:
+        statement = statements.pop(0)
+        if isinstance(statement, ast.If):
+            branches.append(_bounds(statement.test, argument, name) + (_returned(statement.body, name),))
+            statements = list(statement.orelse) + statements
+        elif isinstance(statement, ast.Return):
+            default, has_default = _returned([statement], name), True
+            break
+        else:
+            raise ValueError('{}: only if / elif / else branches returning constants can be compiled'.format(name))
+
+    breakpoints, labels, right = [], [], []
+    previous_upper = None
+    for lower, lower_inclusive, upper, upper_inclusive, label in branches:
+        if lower is not None:
+            if previous_upper is None:
+                # values below the first lower bound fall in no branch
+                breakpoints.append(lower)
+                labels.append(None)
+                right.append(not lower_inclusive)
+            elif lower != previous_upper[0] or lower_inclusive == previous_upper[1]:
+                raise ValueError('{}: the branches must follow each other without gap or overlap'.format(name))
+        if upper is None:
+            labels.append(label) # no upper bound: this branch takes all the remaining values
+            break
+        breakpoints.append(upper)
+        labels.append(label)
+        right.append(upper_inclusive)
+        previous_upper = (upper, upper_inclusive)
+    else:
+        labels.append(default if has_default else None)
+    nan_label = default if keep_nan and has_default else None
+    return Binner(breakpoints, labels, right=right, nan_label=nan_label)
+
+
+# method to return (lower, lower_inclusive, upper, upper_inclusive) of a condition on the argument
+def _bounds(test, argument, name):
+    comparisons = test.values if isinstance(test, ast.BoolOp) and isinstance(test.op, ast.And) else [test]
+    lower = upper = None
+    lower_inclusive = upper_inclusive = False
+    for comparison in comparisons:
+        if not isinstance(comparison, ast.Compare):
+            raise ValueError('{}: only comparisons with constants can be compiled'.format(name))
+        operands = [comparison.left] + list(comparison.comparators)
+        for left, op, right in zip(operands, comparison.ops, operands[1:]):
+            if isinstance(left, ast.Name) and left.id == argument and isinstance(right, ast.Constant):
+                value, op = right.value, op
+            elif isinstance(right, ast.Name) and right.id == argument and isinstance(left, ast.Constant):
+                value, op = left.value, {ast.Lt: ast.Gt(), ast.LtE: ast.GtE(), ast.Gt: ast.Lt(),
+                                         ast.GtE: ast.LtE()}.get(type(op), op) # constant < x is x > constant
+            else:
+                raise ValueError('{}: only comparisons of {} with constants can be compiled'.format(name, argument))
+            if isinstance(op, (ast.Lt, ast.LtE)):
+                upper, upper_inclusive = value, isinstance(op, ast.LtE)
+            elif isinstance(op, (ast.Gt, ast.GtE)):
+                lower, lower_inclusive = value, isinstance(op, ast.GtE)
+            else:
+                raise ValueError('{}: only <, <=, > and >= can be compiled'.format(name))
+    return lower, lower_inclusive, upper, upper_inclusive
+
+
+def _returned(body, name):
+    if len(body) != 1 or not isinstance(body[0], ast.Return) or not isinstance(body[0].value, ast.Constant):
+        raise ValueError('{}: every branch must only return a constant'.format(name))
+    return body[0].value.value
@@ -0,0 +1,74 @@
+"""
+Calendar features of a datetime column, computed once and shared.
+
+bikes.py extracts datetime.dt.hour / .dt.year / .dt.month again in every plotting function (on a copy of the frame
+or by writing a column into a slice), and builds the hour column once more with dt.map(lambda x: x.hour).
+CalendarFeatures decomposes the datetime64 values once, with numpy datetime arithmetic (no python object per row),
+into compact arrays:
+- hour, day, month (int8), year (int16)
+- weekday (int8, Monday=0) and ISO week number (int8)
+- weekend (bool), and holiday (bool) when a list of holidays or holidays='us' (US federal calendar) is given
+The arrays are read only, so every caller can use them (or the frame of them, built without copying) safely.
+
+Usage:
+    calendar = CalendarFeatures(train['datetime'])
+    train['hour'] = calendar.hour
+    train['count'].groupby([calendar.hour, train['workingday']]).sum() # no hour column written into train
+    calendar.column('hour', index=subset.index) # hours of a subset of the rows
+    CalendarFeatures(train['datetime'], holidays='us').frame() """
+
+import numpy as np
+import pandas as pd
+
+FEATURES = ('hour', 'day', 'weekday', 'week', 'month', 'year', 'weekend', 'holiday')
+
+
+class CalendarFeatures:
+
+    # datetimes: Series / DatetimeIndex / array of datetime64 (or strings parsed by pd.to_datetime)
+    # holidays: list of dates or 'us' for the US federal holidays, None for no holiday flag
+    def __init__(self, datetimes, holidays=None):
+        self.index = datetimes.index if isinstance(datetimes, pd.Series) else pd.RangeIndex(len(datetimes))
+        values = pd.to_datetime(pd.Series(datetimes)).dt.tz_localize(None).to_numpy(dtype='datetime64[s]')
+        days = values.astype('datetime64[D]')
+        months = values.astype('datetime64[M]')
+        years = values.astype('datetime64[Y]')
+
+        self.hour = self._freeze(((values - days) // np.timedelta64(1, 'h')).astype('int8'))
+        self.day = self._freeze(((days - months) // np.timedelta64(1, 'D') + 1).astype('int8'))
+        self.month = self._freeze(((months - years) // np.timedelta64(1, 'M') + 1).astype('int8'))
+        self.year = self._freeze((years.view('int64') + 1970).astype('int16'))
+        day_number = days.view('int64')
+        self.weekday = self._freeze(((day_number + 3) % 7).astype('int8')) # 1970-01-01 was a Thursday
+        # ISO week: the week of a day is the week of its Thursday, counted from the first Thursday of that year
+        thursday = days + (3 - self.weekday).astype('timedelta64[D]')
+        self.week = self._freeze(((thursday - thursday.astype('datetime64[Y]')) // np.timedelta64(7, 'D') + 1)
+                                 .astype('int8'))
+        self.weekend = self._freeze(self.weekday >= 5)
+        self.holiday = None
+        if holidays is not None:
+            if isinstance(holidays, str) and holidays == 'us':
+                from pandas.tseries.holiday import USFederalHolidayCalendar
+                holidays = USFederalHolidayCalendar().holidays(start=days.min(), end=days.max())
+            holiday_days = np.asarray(pd.to_datetime(holidays)).astype('datetime64[D]')
+            self.holiday = self._freeze(np.isin(days, holiday_days))
+
+    @staticmethod
+    def _freeze(values):
+        values.flags.writeable = False
+        return values
+
+    # method to return the names of the features computed
+    @property
+    def features(self):
+        return [f for f in FEATURES if getattr(self, f) is not None]
+
+    # method to return one feature as a Series on the index of the datetimes, or on a subset of it
+    def column(self, name, index=None):
+        values = pd.Series(getattr(self, name), index=self.index, name=name, copy=False)
+        return values if index is None else values.loc[index]
+
+    # method to return the features as a frame on the index of the datetimes, the columns being views on the arrays
+    def frame(self, features=None):
+        features = self.features if features is None else list(features)
+        return pd.DataFrame({f: getattr(self, f) for f in features}, index=self.index, copy=False)
@@ -0,0 +1,69 @@
+""" 
+Reading csv files chunk by chunk.
+
+- read_csv_chunks yields DataFrame chunks so that a file never has to fit in memory
+- a read can be resumed from a byte offset, which is how appended rows are picked up without re-reading the file
+- a read stops at the size the file had when it started: rows appended while it runs are left for the next read,
+  which resumes from the offset reported back through the `position` dict """
+
+import io
+import os
+
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+# raw stream over a file which stops after a given number of bytes, as if the file ended there
+class _BoundedReader(io.RawIOBase):
+
+    def __init__(self, f, limit):
+        self._f = f
+        self._left = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._left <= 0:
+            return 0
+        n = self._f.readinto(memoryview(buffer)[:self._left]) or 0
+        self._left -= n
+        return n
+
+
+# method to read the header (column names) of a csv file without parsing any row
+def read_csv_header(path, **kwargs):
+    return list(pd.read_csv(path, nrows=0, **kwargs).columns)
+
+
+# method to yield a csv file chunk by chunk
+# - offset: byte offset of the first row to read, 0 means read from the start of the file (header included)
+# - position: optional dict, filled with the byte offset where the read stopped ('offset') and the file size ('size')
+def read_csv_chunks(path, chunksize=DEFAULT_CHUNKSIZE, offset=0, usecols=None, position=None, **kwargs):
+    size = os.path.getsize(path) # only the rows present when the read starts are consumed
+    if position is not None:
+        position['offset'] = size
+        position['size'] = size
+
+    if offset >= size:
+        return
+
+    if offset > 0:
+        # resuming in the middle of the file: the header is not there anymore, so pass the names explicitly
+        kwargs = dict(kwargs, header=None, names=read_csv_header(path, **kwargs))
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        bounded = io.BufferedReader(_BoundedReader(f, size - offset))
+        reader = pd.read_csv(bounded, chunksize=chunksize, usecols=usecols, **kwargs)
+        with reader:
+            for chunk in reader:
+                yield chunk
+
+
+# method to read the raw bytes just before a byte offset, used to check that a file was only appended to
+def read_tail_bytes(path, offset, nbytes=4096):
+    start = max(0, offset - nbytes)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(offset - start)
@@ -0,0 +1,149 @@
+"""
+Streaming (out of core) covariance and correlation matrices.
+
+A CoMomentAccumulator consumes a table chunk by chunk (e.g. from read_csv_chunks) and keeps, for every pair of
+columns (i, j), over the rows where both are present:
+- the number of rows n_ij
+- the mean of column i
+- the sum of squared deviations of column i (M2)
+- the co-moment of columns i and j (sum of the products of the deviations)
+
+Two accumulators built on different chunks (different workers, different files) are merged with the pairwise update
+formulas, so the whole table is read once and never held in memory. cov() and corr() give the same matrices as
+DataFrame.cov() / DataFrame.corr() (pairwise complete rows), computed from these k x k states only.
+
+Usage:
+    acc = comoments_csv('big_table.csv', chunksize=500_000)
+    acc.corr() # Pearson correlation DataFrame, ready for sns.heatmap
+    acc.cov()
+
+    comoments_csv(['part-1.csv', 'part-2.csv'], n_jobs=2) # one worker per file, the accumulators are merged """
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from eda_utils.chunked_reader import DEFAULT_CHUNKSIZE, read_csv_chunks
+
+
+class CoMomentAccumulator:
+
+    # columns: names of the columns to accumulate, the numeric columns of the first chunk when None
+    def __init__(self, columns=None):
+        self.columns = None if columns is None else pd.Index(columns)
+        self.count = None # [i, j]: rows where both i and j are present
+        self.mean = None # [i, j]: mean of column i over these rows
+        self.m2 = None # [i, j]: sum of squared deviations of column i over these rows
+        self.comoment = None # [i, j]: sum of (x_i - mean_i) * (x_j - mean_j) over these rows
+
+    def _init_states(self):
+        k = len(self.columns)
+        self.count = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.comoment = np.zeros((k, k))
+
+    # method to return the values of a chunk as a float matrix with the accumulated columns, in order
+    def _values(self, chunk):
+        if self.columns is None:
+            self.columns = chunk.select_dtypes(include=['number', 'bool']).columns
+        numeric = chunk.reindex(columns=self.columns)
+        numeric = numeric.apply(pd.to_numeric, errors='coerce') # a stray string in a later chunk becomes missing
+        return numeric.to_numpy(dtype='float64', na_value=np.nan)
+
+    # method to fold a chunk of rows (DataFrame) into the accumulator
+    def update(self, chunk):
+        values = self._values(chunk)
+        if self.count is None:
+            self._init_states()
+        if values.shape[0] == 0:
+            return self
+
+        # statistics of the chunk alone, with masked matrix products (see correlation.py)
+        valid = ~np.isnan(values)
+        n_valid = valid.sum(axis=0)
+        shift = np.where(n_valid > 0, np.nansum(values, axis=0) / np.maximum(n_valid, 1), 0.0)
+        block = values - shift
+        block = np.where(valid, block, 0.0)
+        mask = valid.astype('float64')
+        batch = CoMomentAccumulator(self.columns)
+        batch.count = mask.T @ mask
+        sum_x = block.T @ mask
+        with np.errstate(divide='ignore', invalid='ignore'):
+            local_mean = np.where(batch.count > 0, sum_x / batch.count, 0.0)
+        batch.mean = local_mean + shift[:, None]
+        batch.m2 = (block * block).T @ mask - sum_x * local_mean
+        batch.comoment = block.T @ block - sum_x * local_mean.T
+        return self.merge(batch)
+
+    # method to merge another accumulator (same columns) into this one
+    def merge(self, other):
+        if other.count is None:
+            return self
+        if self.count is None:
+            self.columns = other.columns
+            self.count, self.mean = other.count.copy(), other.mean.copy()
+            self.m2, self.comoment = other.m2.copy(), other.comoment.copy()
+            return self
+        if not self.columns.equals(other.columns):
+            raise ValueError('cannot merge accumulators built on different columns')
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(n > 0, self.count * other.count / n, 0.0)
+            self.mean = np.where(n > 0, self.mean + delta * other.count / np.maximum(n, 1), 0.0)
+        self.m2 = self.m2 + other.m2 + delta * delta * weight
+        self.comoment = self.comoment + other.comoment + delta * delta.T * weight
+        self.count = n
+        return self
+
+    # method to return the covariance matrix (pairwise complete rows, ddof=1 like DataFrame.cov)
+    def cov(self, min_periods=1):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = self.comoment / (self.count - 1)
+        result[self.count < max(min_periods, 2)] = np.nan
+        return pd.DataFrame(result, index=self.columns, columns=self.columns)
+
+    # method to return the Pearson correlation matrix (pairwise complete rows like DataFrame.corr)
+    def corr(self, min_periods=1):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        result[self.count < max(min_periods, 2)] = np.nan
+        result = np.clip(result, -1.0, 1.0)
+        diagonal = np.diag(result).copy()
+        np.fill_diagonal(result, np.where(np.isnan(diagonal), np.nan, 1.0))
+        return pd.DataFrame(result, index=self.columns, columns=self.columns)
+
+
+# method to accumulate the co-moments of one csv file
+def _accumulate_csv(path, columns, chunksize, read_kwargs):
+    accumulator = CoMomentAccumulator(columns)
+    for chunk in read_csv_chunks(path, chunksize=chunksize, usecols=columns, **read_kwargs):
+        accumulator.update(chunk)
+    return accumulator
+
+
+# method to accumulate the co-moments of one or several csv files in a single pass over the rows
+# - columns: columns to accumulate, the numeric columns of the first chunk when None
+# - n_jobs: number of worker processes when several files are given (one file per task), 1 to stay in this process
+def comoments_csv(paths, columns=None, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1, **read_kwargs):
+    paths = [paths] if isinstance(paths, (str, os.PathLike)) else list(paths)
+    if columns is None:
+        # decide the columns from the first file, so that the accumulators of all the files can be merged
+        first = next(read_csv_chunks(paths[0], chunksize=chunksize, **read_kwargs), pd.DataFrame())
+        columns = list(first.select_dtypes(include=['number', 'bool']).columns)
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(paths))
+    if n_jobs == 1:
+        parts = [_accumulate_csv(path, columns, chunksize, read_kwargs) for path in paths]
+    else:
+        with ProcessPoolExecutor(n_jobs) as pool:
+            parts = list(pool.map(_accumulate_csv, paths, [columns] * len(paths), [chunksize] * len(paths),
+                                  [read_kwargs] * len(paths)))
+
+    accumulator = CoMomentAccumulator(columns)
+    for part in parts:
+        accumulator.merge(part)
+    return accumulator
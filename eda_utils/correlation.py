@@ -0,0 +1,108 @@
+"""
+Correlation matrices computed with matrix products.
+
+DataFrame.corr() loops over every pair of columns. Here the columns are centered and scaled once and the whole
+Pearson matrix comes out of a single matrix product (X.T @ X), which numpy hands to BLAS.
+
+- without missing values: corr = Z.T @ Z / (n - 1) with Z the standardised columns
+- with missing values: pairwise complete statistics (same result as DataFrame.corr()) are obtained from masked
+  products, with M the 0/1 validity mask and X the values with NaN replaced by 0:
+      n_xy = M.T @ M, sum_x = X.T @ M, sum_x2 = (X * X).T @ M, sum_xy = X.T @ X
+- dtype='float32' halves the memory and roughly doubles the speed, at the cost of ~1e-6 precision
+- chunksize computes the products block of rows by block of rows, so that no temporary copy of the whole table is made
+
+Usage:
+    corr(df) # same as df.corr() on the numeric columns
+    corr(df, dtype='float32', chunksize=100_000)
+    corr(df, method='kendall') # rank correlations, see rank_correlation.py """
+
+import numpy as np
+import pandas as pd
+
+
+# method to keep the numeric columns of a DataFrame and return them with their names
+def numeric_matrix(data):
+    if isinstance(data, pd.DataFrame):
+        numeric = data.select_dtypes(include=['number', 'bool'])
+        return numeric.to_numpy(dtype='float64', na_value=np.nan), numeric.columns
+    values = np.asarray(data, dtype='float64')
+    return values, pd.RangeIndex(values.shape[1])
+
+
+def _row_blocks(n_rows, chunksize):
+    chunksize = chunksize or n_rows or 1
+    for start in range(0, n_rows, chunksize):
+        yield slice(start, min(start + chunksize, n_rows))
+
+
+# method to compute the Pearson correlation matrix of complete data (no missing value)
+def _pearson_complete(values, dtype, chunksize):
+    n_rows, n_cols = values.shape
+    mean = values.mean(axis=0)
+    cov = np.zeros((n_cols, n_cols), dtype=dtype)
+    for rows in _row_blocks(n_rows, chunksize):
+        block = (values[rows] - mean).astype(dtype, copy=False)
+        cov += block.T @ block
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = cov / std[:, None] / std[None, :]
+    if n_rows < 2:
+        result[:] = np.nan
+    return result
+
+
+# method to compute the Pearson correlation matrix over pairwise complete rows
+def _pearson_pairwise(values, dtype, chunksize, min_periods):
+    n_rows, n_cols = values.shape
+    # centering each column by its own mean first keeps the sums below small, which avoids cancellation errors
+    mean = np.nanmean(values, axis=0)
+    mean[np.isnan(mean)] = 0.0
+    count = np.zeros((n_cols, n_cols), dtype='float64')
+    sum_x = np.zeros((n_cols, n_cols), dtype=dtype)
+    sum_x2 = np.zeros((n_cols, n_cols), dtype=dtype)
+    sum_xy = np.zeros((n_cols, n_cols), dtype=dtype)
+    for rows in _row_blocks(n_rows, chunksize):
+        block = values[rows] - mean
+        valid = ~np.isnan(block)
+        block = np.where(valid, block, 0.0).astype(dtype, copy=False)
+        mask = valid.astype(dtype)
+        count += mask.T @ mask
+        sum_x += block.T @ mask # [i, j] = sum of column i over the rows where j is valid too
+        sum_x2 += (block * block).T @ mask
+        sum_xy += block.T @ block
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sum_xy - sum_x * sum_x.T / count
+        var_x = sum_x2 - sum_x * sum_x / count
+        result = cov / np.sqrt(var_x * var_x.T)
+    result[count < max(min_periods, 2)] = np.nan
+    return result
+
+
+# method to compute the Pearson correlation matrix of the numeric columns of a DataFrame (or of a 2D array)
+# - dtype: 'float64' (default, same precision as DataFrame.corr) or 'float32'
+# - chunksize: number of rows per block for the matrix products, None for a single block
+# - min_periods: minimum number of pairwise complete rows to have a result, like DataFrame.corr
+def pearson_corr(data, dtype='float64', chunksize=None, min_periods=1):
+    values, columns = numeric_matrix(data)
+    if np.isnan(values).any():
+        result = _pearson_pairwise(values, dtype, chunksize, min_periods)
+    else:
+        result = _pearson_complete(values, dtype, chunksize)
+        if values.shape[0] < min_periods:
+            result[:] = np.nan
+    result = np.clip(result, -1.0, 1.0).astype('float64')
+    diagonal = np.diag(result).copy()
+    np.fill_diagonal(result, np.where(np.isnan(diagonal), np.nan, 1.0))
+    return pd.DataFrame(result, index=columns, columns=columns)
+
+
+# method mirroring DataFrame.corr(method=...)
+def corr(data, method='pearson', **kwargs):
+    if method == 'pearson':
+        return pearson_corr(data, **kwargs)
+    from eda_utils.rank_correlation import kendall_corr, spearman_corr # imported here, it depends on this module
+    if method == 'spearman':
+        return spearman_corr(data, **kwargs)
+    if method == 'kendall':
+        return kendall_corr(data, **kwargs)
+    raise ValueError("method must be 'pearson', 'spearman' or 'kendall', got {!r}".format(method))
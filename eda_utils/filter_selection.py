@@ -0,0 +1,150 @@
+"""
+Filter based pre-screening of the features before a model based selection (Lasso, RFE).
+
+The Lasso of 3_feature_selection.py and the RFE of the car price notebook see every column, including the constant,
+duplicated or unrelated ones, and RFE refits the model once per column eliminated. FilterSelector drops those
+columns first, with statistics computed for all the columns at once:
+- variance of every column: columns with a variance of at most min_variance are dropped
+- duplicates: every column gets a 64 bit fingerprint (hash of every value, weighted by its row, added up), columns
+  with the same fingerprint are compared and the later copies are dropped
+- association with the target: the univariate F statistic (same as sklearn's f_regression) comes from the
+  correlation with the target, and the mutual information is estimated from a joint histogram of quantile bins (one
+  np.bincount for all the columns, with the Miller-Madow bias correction). Columns with an F test p-value above
+  max_pvalue and a mutual information below min_mutual_info are dropped
+- correlation pruning: going from the most to the least associated column, a column is dropped when its absolute
+  correlation with a column already kept is above max_correlation
+The correlations between the features and with the target come from one correlation matrix (see correlation.py).
+
+Usage:
+    screener = FilterSelector(max_correlation=0.9).fit(X_train, y_train)
+    screener.report_ # statistics of every column and the reason it was dropped
+    X_screened = screener.transform(X_train) # then Lasso / RFE on X_screened """
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from eda_utils.correlation import pearson_corr
+
+DROP_REASONS = ('variance', 'duplicate', 'association', 'correlation')
+
+
+# method to return a 64 bit fingerprint of every column, equal columns having equal fingerprints
+def column_fingerprints(values):
+    hashes = pd.util.hash_array(np.ascontiguousarray(values).ravel()).reshape(values.shape)
+    weights = np.random.default_rng(0).integers(1, 2 ** 63, size=values.shape[0], dtype='uint64') | np.uint64(1)
+    with np.errstate(over='ignore'):
+        return (hashes * weights[:, None]).sum(axis=0, dtype='uint64') # modulo 2^64
+
+
+# method to return the index (0 .. n_bins - 1) of the quantile bin of every value of every column, -1 for NaN
+def quantile_bins(values, n_bins):
+    ranks = pd.DataFrame(values).rank(method='dense', pct=False).to_numpy()
+    n_distinct = np.nanmax(np.where(np.isnan(ranks), 0, ranks), axis=0)
+    # dense ranks spread over the bins, so a column with few distinct values keeps one bin per value
+    bins = np.floor((ranks - 1) * np.minimum(n_bins, n_distinct) / np.maximum(n_distinct, 1))
+    return np.where(np.isnan(bins), -1, bins).astype('int64')
+
+
+# method to estimate the mutual information (in nats) of every column with the target from quantile bins
+def binned_mutual_info(values, y, n_bins=10):
+    n_rows, n_cols = values.shape
+    x_bins = quantile_bins(values, n_bins)
+    y_bins = quantile_bins(np.asarray(y, dtype='float64').reshape(-1, 1), n_bins)[:, 0]
+    valid = (x_bins >= 0) & (y_bins >= 0)[:, None]
+    # joint histogram of every column with the target: cell (column, x bin, y bin)
+    cells = (np.arange(n_cols) * n_bins * n_bins + x_bins * n_bins + y_bins[:, None])[valid]
+    joint = np.bincount(cells, minlength=n_cols * n_bins * n_bins).reshape(n_cols, n_bins, n_bins).astype('float64')
+    total = joint.sum(axis=(1, 2), keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_xy = joint / total
+        p_x = p_xy.sum(axis=2, keepdims=True)
+        p_y = p_xy.sum(axis=1, keepdims=True)
+        mi = np.nansum(np.where(p_xy > 0, p_xy * np.log(p_xy / (p_x * p_y)), 0.0), axis=(1, 2))
+        # Miller-Madow correction of the bias of the plug-in estimate
+        bias = ((p_x[:, :, 0] > 0).sum(axis=1) - 1) * ((p_y[:, 0, :] > 0).sum(axis=1) - 1) / (2 * total[:, 0, 0])
+    return np.maximum(mi - np.nan_to_num(bias), 0.0)
+
+
+class FilterSelector:
+
+    # min_variance: columns with a variance of at most this value are dropped
+    # drop_duplicates: drop the columns equal to an earlier column
+    # max_pvalue / min_mutual_info: columns with an F test p-value above max_pvalue and a mutual information below
+    #   min_mutual_info are dropped (None to skip the test)
+    # max_correlation: maximum absolute correlation with an already kept column (None to skip the pruning)
+    def __init__(self, min_variance=0.0, drop_duplicates=True, max_pvalue=0.05, min_mutual_info=0.02,
+                 max_correlation=0.9, n_bins=10):
+        self.min_variance = min_variance
+        self.drop_duplicates = drop_duplicates
+        self.max_pvalue = max_pvalue
+        self.min_mutual_info = min_mutual_info
+        self.max_correlation = max_correlation
+        self.n_bins = n_bins
+        self.report_ = None
+
+    def fit(self, X, y):
+        if not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(X)
+        values = X.to_numpy(dtype='float64', na_value=np.nan)
+        y = np.asarray(y, dtype='float64').ravel()
+        n_rows, n_cols = values.shape
+        reason = np.full(n_cols, '', dtype=object)
+
+        variance = np.nanvar(values, axis=0, ddof=1) if n_rows > 1 else np.zeros(n_cols)
+        reason[np.nan_to_num(variance) <= self.min_variance] = 'variance'
+
+        duplicate_of = np.full(n_cols, None, dtype=object)
+        if self.drop_duplicates:
+            first_of = {}
+            for j, fingerprint in enumerate(column_fingerprints(values)):
+                for i in first_of.get(fingerprint, []):
+                    if np.array_equal(values[:, i], values[:, j], equal_nan=True):
+                        duplicate_of[j] = X.columns[i]
+                        break
+                else:
+                    first_of.setdefault(fingerprint, []).append(j)
+            reason[pd.notna(duplicate_of) & (reason == '')] = 'duplicate'
+
+        # correlations between all the columns and with the target, from one matrix
+        correlation = pearson_corr(np.column_stack([values, y])).to_numpy()
+        r = np.nan_to_num(correlation[:n_cols, n_cols])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f_score = r ** 2 / (1 - r ** 2) * (n_rows - 2)
+        f_pvalue = stats.f.sf(f_score, 1, n_rows - 2)
+        mutual_info = binned_mutual_info(values, y, self.n_bins)
+        if self.max_pvalue is not None:
+            weak = (f_pvalue > self.max_pvalue) & (mutual_info < (self.min_mutual_info or 0.0))
+            reason[weak & (reason == '')] = 'association'
+
+        correlated_with = np.full(n_cols, None, dtype=object)
+        if self.max_correlation is not None:
+            kept = []
+            for j in np.argsort(-np.abs(r), kind='stable'):
+                if reason[j]:
+                    continue
+                if kept:
+                    others = np.abs(np.nan_to_num(correlation[j, kept]))
+                    if others.max() > self.max_correlation:
+                        reason[j] = 'correlation'
+                        correlated_with[j] = X.columns[kept[int(others.argmax())]]
+                        continue
+                kept.append(j)
+
+        self.report_ = pd.DataFrame({'variance': variance, 'duplicate_of': duplicate_of, 'f_score': f_score,
+                                     'f_pvalue': f_pvalue, 'mutual_info': mutual_info,
+                                     'correlated_with': correlated_with, 'dropped_by': reason,
+                                     'selected': reason == ''}, index=X.columns)
+        return self
+
+    # method to return the features which passed all the filters
+    def selected_features(self):
+        if self.report_ is None:
+            raise ValueError('FilterSelector is not fitted yet, call fit first')
+        return self.report_.index[self.report_['selected'].to_numpy(dtype=bool)]
+
+    def transform(self, X):
+        return X[self.selected_features()]
+
+    def fit_transform(self, X, y):
+        return self.fit(X, y).transform(X)
@@ -0,0 +1,112 @@
+"""
+Row concatenation of frames with different columns (train and test), into one preallocated frame.
+
+black_friday.py combines its train and test files with df1.append(df2, sort=False): the call is deprecated, copies
+both frames (and every block again when dtypes differ), keeps the two overlapping indexes, and the integer Purchase
+column, absent from test, silently becomes float with NaN. concat_frames decides the schema of the result before
+copying anything:
+- the columns are the union of the columns, in order of first appearance
+- the dtype of every column is resolved once from the frames which have it: numeric dtypes are promoted together,
+  an integer or boolean column missing from some frames becomes a nullable Int / boolean column (its values stay
+  integers, the missing rows are <NA>) instead of float
+- categorical columns, and the columns listed in `categorize`, get one shared dictionary: the categories of every
+  frame are merged once (sorted, like pd.Categorical, when no frame had a categorical column) and the codes of every
+  frame are remapped into it, so the result is categorical too
+- every column is allocated once for all the rows and each frame is copied into its slice, the index is a new
+  RangeIndex
+- the frame every row came from is recorded in a categorical `source` column (int8 codes)
+
+Usage:
+    df = concat_frames({'train': df1, 'test': df2}, categorize=['Product_ID', 'City_Category'])
+    df['source'].value_counts() # train 550068, test 233599
+    df.loc[df['source'] == 'test'] # the rows of the test file """
+
+import numpy as np
+import pandas as pd
+
+
+# method to return the dictionary of a column in a frame: (categories, codes), codes -1 for missing
+def _dictionary(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.categories, column.cat.codes.to_numpy()
+    codes, categories = pd.factorize(column, use_na_sentinel=True)
+    return categories, codes
+
+
+# method to concatenate one column of every frame into a categorical with a shared dictionary
+def _concat_categorical(pieces, lengths, ordered):
+    dictionaries = [_dictionary(piece) if piece is not None else None for piece in pieces]
+    categories = pd.Index([])
+    for dictionary in dictionaries:
+        if dictionary is not None:
+            categories = categories.append(dictionary[0].difference(categories, sort=False))
+    if not any(isinstance(piece.dtype, pd.CategoricalDtype) for piece in pieces if piece is not None):
+        categories = categories.sort_values() # same order as pd.Categorical(values), get_dummies etc.
+    codes = np.empty(sum(lengths), dtype=pd.Categorical.from_codes([], categories=categories).codes.dtype)
+    start = 0
+    for dictionary, length in zip(dictionaries, lengths):
+        if dictionary is None:
+            codes[start:start + length] = -1
+        else:
+            # code in the frame -> code in the shared dictionary, the last entry maps -1 (missing) to -1
+            mapping = np.append(categories.get_indexer(dictionary[0]), -1).astype(codes.dtype)
+            codes[start:start + length] = mapping[dictionary[1]]
+        start += length
+    return pd.Categorical.from_codes(codes, categories=categories, ordered=ordered)
+
+
+# method to concatenate one numeric / datetime column of every frame into one preallocated array
+def _concat_numpy(pieces, lengths, dtype):
+    values = np.empty(sum(lengths), dtype=dtype)
+    missing = np.zeros(len(values), dtype=bool)
+    start = 0
+    for piece, length in zip(pieces, lengths):
+        if piece is None:
+            missing[start:start + length] = True
+        else:
+            values[start:start + length] = piece.to_numpy()
+        start += length
+    if not missing.any():
+        return values
+    if values.dtype.kind in 'iu':
+        return pd.arrays.IntegerArray(values, missing) # nullable integers instead of floats
+    if values.dtype.kind == 'b':
+        return pd.arrays.BooleanArray(values, missing)
+    values[missing] = np.datetime64('NaT') if values.dtype.kind in 'mM' else np.nan
+    return values
+
+
+# method to concatenate the rows of frames, frames: list of frames or dict name -> frame
+# - categorize: columns turned into categoricals with one dictionary shared by all the rows
+# - source: name of the column recording the frame of every row, None for no such column
+def concat_frames(frames, categorize=(), source='source'):
+    if isinstance(frames, dict):
+        names, frames = list(frames), list(frames.values())
+    else:
+        frames = list(frames)
+        names = list(range(len(frames)))
+    lengths = [len(frame) for frame in frames]
+    columns = list(dict.fromkeys(column for frame in frames for column in frame.columns))
+    if source is not None and source in columns:
+        raise ValueError('the frames already have a {!r} column, choose another source name'.format(source))
+
+    data = {}
+    for column in columns:
+        pieces = [frame[column] if column in frame.columns else None for frame in frames]
+        present = [piece for piece in pieces if piece is not None]
+        dtypes = [piece.dtype for piece in present]
+        if column in categorize or any(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            ordered = all(getattr(dtype, 'ordered', False) for dtype in dtypes)
+            data[column] = _concat_categorical(pieces, lengths, ordered)
+        elif all(isinstance(dtype, np.dtype) and dtype.kind in 'biufmM' for dtype in dtypes) \
+                and len({dtype.kind in 'mM' for dtype in dtypes}) == 1:
+            data[column] = _concat_numpy(pieces, lengths, np.result_type(*dtypes))
+        else:
+            # strings, objects and extension dtypes: pandas concatenates the column, once
+            filler = lambda length: pd.Series(index=pd.RangeIndex(length), dtype=dtypes[0]) # missing values
+            data[column] = pd.concat([piece if piece is not None else filler(length)
+                                      for piece, length in zip(pieces, lengths)], ignore_index=True).array
+    if source is not None:
+        codes = np.repeat(np.arange(len(frames), dtype='int8'), lengths)
+        data[source] = pd.Categorical.from_codes(codes, categories=names)
+    return pd.DataFrame(data, index=pd.RangeIndex(sum(lengths)), copy=False)
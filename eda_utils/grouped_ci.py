@@ -0,0 +1,147 @@
+"""
+Means and confidence intervals of every x (and hue) group at once, and bar plots drawn from them.
+
+sns.barplot(x, y, hue=..., data=df) bootstraps the confidence interval of every bar on its own, resampling the rows
+of the bar 1000 times in python: black_friday.py draws 5 of them on ~780k rows and the plot_cat of the loan notebook
+one per categorical column. grouped_ci computes the table of all the bars first:
+- the count, mean and standard deviation of every x x hue cell come from np.bincount on the cell code of every row
+- large cells (clt_min_rows rows or more) get the analytic interval mean +- t * std / sqrt(n) (central limit
+  theorem), with that many rows the bootstrap interval is the same
+- the other cells are bootstrapped together, replicates in batches: 'multinomial' resamples the rows of every cell
+  (like seaborn) with one random matrix for all the cells and np.add.reduceat, 'poisson' gives every row a
+  Poisson(1) weight in every replicate (no index to draw) and the weighted means come from np.add.reduceat too
+- the interval is the percentile interval of the replicates, like seaborn's errorbar=('ci', 95)
+barplot_ci then draws the bars and error bars from the table, without touching the rows again.
+
+Usage:
+    table = grouped_ci(df_i, 'Age', 'Purchase', hue='Gender') # mean, lower, upper, n and method of every bar
+    barplot_ci(table)
+    plt.show() """
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from scipy import stats
+
+METHODS = ('auto', 'bootstrap', 'clt')
+RESAMPLING = ('multinomial', 'poisson')
+BATCH_VALUES = 8_000_000 # random values drawn per batch of replicates (64 MB of float64)
+
+
+# method to return the codes of a column and its levels, in the order of the bars of seaborn (categories of a
+# categorical, sorted numbers, else order of appearance)
+def _levels(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy().astype('int64'), column.cat.categories
+    codes, levels = pd.factorize(column, sort=pd.api.types.is_numeric_dtype(column))
+    return codes.astype('int64'), levels
+
+
+# method to return the bootstrap means (replicates x cells) of the cells, rows given sorted by cell
+def _bootstrap_means(values, starts, sizes, n_boot, resampling, rng):
+    n_rows, n_cells = len(values), len(sizes)
+    batch = max(1, BATCH_VALUES // max(n_rows, 1))
+    means = np.empty((n_boot, n_cells))
+    cell_of_row = np.repeat(np.arange(n_cells), sizes)
+    for start in range(0, n_boot, batch):
+        b = min(batch, n_boot - start)
+        if resampling == 'multinomial':
+            # row i is replaced by a random row of its own cell, the resampled rows stay sorted by cell
+            picks = starts[cell_of_row] + (rng.random((b, n_rows)) * sizes[cell_of_row]).astype('int64')
+            means[start:start + b] = np.add.reduceat(values[picks], starts, axis=1) / sizes
+        else:
+            weights = rng.poisson(1.0, (b, n_rows)).astype('float64')
+            with np.errstate(divide='ignore', invalid='ignore'):
+                means[start:start + b] = np.add.reduceat(weights * values, starts, axis=1) \
+                    / np.add.reduceat(weights, starts, axis=1)
+    return means
+
+
+# method to return the mean and the confidence interval of y for every x (and hue) group
+# - ci: confidence level in percent
+# - method: 'auto' (clt for the cells of clt_min_rows rows or more, bootstrap for the others), 'bootstrap' or 'clt'
+# - resampling: 'multinomial' (resample the rows of every cell, like seaborn) or 'poisson' (Poisson(1) row weights)
+def grouped_ci(data, x, y, hue=None, ci=95, n_boot=1000, method='auto', resampling='multinomial',
+               clt_min_rows=5000, random_state=0):
+    if method not in METHODS:
+        raise ValueError('method must be one of {}, got {!r}'.format(METHODS, method))
+    if resampling not in RESAMPLING:
+        raise ValueError('resampling must be one of {}, got {!r}'.format(RESAMPLING, resampling))
+    x_codes, x_levels = _levels(data[x])
+    hue_codes, hue_levels = _levels(data[hue]) if hue is not None else (np.zeros(len(data), 'int64'), [None])
+    values = pd.Series(data[y]).to_numpy(dtype='float64', na_value=np.nan)
+    valid = (x_codes >= 0) & (hue_codes >= 0) & ~np.isnan(values)
+    n_cells = len(x_levels) * len(hue_levels)
+    cells = x_codes[valid] * len(hue_levels) + hue_codes[valid]
+    values = values[valid]
+
+    counts = np.bincount(cells, minlength=n_cells)
+    sums = np.bincount(cells, weights=values, minlength=n_cells)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / counts
+        deviations = values - means[cells]
+        std = np.sqrt(np.bincount(cells, weights=deviations * deviations, minlength=n_cells) / (counts - 1))
+    present = np.flatnonzero(counts > 0)
+    if method == 'clt':
+        use_clt = np.ones(n_cells, dtype=bool)
+    elif method == 'bootstrap':
+        use_clt = np.zeros(n_cells, dtype=bool)
+    else:
+        use_clt = counts >= clt_min_rows
+
+    alpha = (100.0 - ci) / 100.0
+    lower, upper = np.full(n_cells, np.nan), np.full(n_cells, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        half = stats.t.ppf(1 - alpha / 2, np.maximum(counts - 1, 1)) * std / np.sqrt(counts)
+    lower[use_clt], upper[use_clt] = means[use_clt] - half[use_clt], means[use_clt] + half[use_clt]
+
+    boot_cells = present[~use_clt[present]]
+    if len(boot_cells):
+        # rows of the bootstrapped cells, sorted by cell
+        in_boot = np.isin(cells, boot_cells)
+        order = np.argsort(cells[in_boot], kind='stable')
+        sizes = counts[boot_cells]
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype('int64')
+        replicates = _bootstrap_means(values[in_boot][order], starts, sizes, n_boot, resampling,
+                                      np.random.default_rng(random_state))
+        lower[boot_cells], upper[boot_cells] = np.nanpercentile(replicates, [100 * alpha / 2, 100 * (1 - alpha / 2)],
+                                                                axis=0)
+
+    if hue is not None:
+        index = pd.MultiIndex.from_product([x_levels, hue_levels], names=[x, hue])
+    else:
+        index = pd.Index(x_levels, name=x)
+    table = pd.DataFrame({'mean': means, 'lower': lower, 'upper': upper, 'n': counts,
+                          'method': np.where(use_clt, 'clt', 'bootstrap')}, index=index).iloc[present]
+    table.attrs['y'] = y
+    return table
+
+
+# method to draw the bars and error bars of a table of grouped_ci (grouped by hue when it has one)
+def barplot_ci(table, ax=None, palette=None, width=0.8, capsize=0.0):
+    ax = ax if ax is not None else plt.gca()
+    if isinstance(table.index, pd.MultiIndex):
+        x_name, hue_name = table.index.names
+        x_levels = table.index.get_level_values(0).unique()
+        hue_levels = table.index.get_level_values(1).unique()
+    else:
+        x_name, hue_name = table.index.name, None
+        x_levels, hue_levels = table.index, [None]
+    colors = sns.color_palette(palette, len(hue_levels))
+    bar_width = width / len(hue_levels)
+    positions = np.arange(len(x_levels))
+    for j, level in enumerate(hue_levels):
+        part = table.xs(level, level=1) if hue_name is not None else table
+        part = part.reindex(x_levels)
+        offsets = positions - width / 2 + (j + 0.5) * bar_width
+        errors = np.vstack([part['mean'] - part['lower'], part['upper'] - part['mean']])
+        ax.bar(offsets, part['mean'], bar_width, color=colors[j], label=level if hue_name is not None else None)
+        ax.errorbar(offsets, part['mean'], yerr=errors, fmt='none', ecolor='.26', elinewidth=2, capsize=capsize)
+    ax.set_xticks(positions)
+    ax.set_xticklabels([str(level) for level in x_levels])
+    ax.set_xlabel(x_name)
+    ax.set_ylabel(table.attrs.get('y', 'mean'))
+    if hue_name is not None:
+        ax.legend(title=hue_name)
+    return ax
@@ -0,0 +1,143 @@
+"""
+Heatmaps of very wide correlation matrices.
+
+sns.heatmap(df.corr(), annot=True) draws one rectangle and one text per cell, which becomes unreadable and very slow
+once there are hundreds or thousands of columns. clustered_heatmap instead:
+- reorders the rows and columns by hierarchical clustering, so that correlated columns end up next to each other
+- averages blocks of cells so that the matrix drawn is not larger than the pixels available (pixel budget)
+- only annotates the cells when there are few enough of them to be read (annot='auto')
+- draws the large matrices as a single image (imshow) instead of one rectangle per cell
+- optionally writes zoomable tiles (png pyramid, like map tiles) of the full resolution matrix
+
+Usage:
+    f, ax = plt.subplots(figsize=(25, 15))
+    clustered_heatmap(corr(df), ax=ax, fmt='.1f')
+    clustered_heatmap(big_corr, tiles_dir='heatmap_tiles') # also writes heatmap_tiles/<zoom>/<row>_<col>.png """
+
+import json
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from scipy.cluster.hierarchy import leaves_list, linkage
+from scipy.spatial.distance import squareform
+
+ANNOT_MAX_CELLS = 40 # above this number of cells per side, annot='auto' does not annotate
+TILE_SIZE = 256
+
+
+# method to return the order of the rows/columns of a correlation matrix given by hierarchical clustering,
+# the distance between two columns being 1 - |correlation|
+def cluster_order(matrix, method='average'):
+    values = np.asarray(matrix, dtype='float64')
+    if values.shape[0] < 3:
+        return np.arange(values.shape[0])
+    distance = 1.0 - np.abs(np.nan_to_num(values, nan=0.0))
+    distance = (distance + distance.T) / 2
+    np.fill_diagonal(distance, 0.0)
+    return leaves_list(linkage(squareform(np.clip(distance, 0.0, None), checks=False), method=method))
+
+
+# method to average square blocks of block x block cells of a matrix (the last blocks may be smaller)
+def block_mean(values, block):
+    n_rows, n_cols = values.shape
+    rows, cols = -(-n_rows // block), -(-n_cols // block)
+    padded = np.full((rows * block, cols * block), np.nan)
+    padded[:n_rows, :n_cols] = values
+    padded = padded.reshape(rows, block, cols, block)
+    counts = (~np.isnan(padded)).sum(axis=(1, 3))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, np.nansum(padded, axis=(1, 3)) / counts, np.nan)
+
+
+# method to name the blocks of labels merged by block_mean
+def block_labels(labels, block):
+    labels = [str(label) for label in labels]
+    if block == 1:
+        return labels
+    return ['{} (+{})'.format(labels[start], len(labels[start:start + block]) - 1)
+            for start in range(0, len(labels), block)]
+
+
+# method to return the number of pixels available along the shortest side of an axis
+def pixel_budget_of(ax):
+    bbox = ax.get_window_extent()
+    return max(1, int(min(bbox.width, bbox.height)))
+
+
+# method to write a png pyramid of the matrix: zoom level 0 fits in a single tile, every next level doubles the
+# resolution, the last level has one pixel per cell
+def write_tiles(matrix, tiles_dir, tile_size=TILE_SIZE, cmap='RdBu_r', vmin=-1.0, vmax=1.0, labels=None):
+    values = np.asarray(matrix, dtype='float64')
+    n = max(values.shape)
+    levels = max(0, int(np.ceil(np.log2(n / tile_size)))) if n > tile_size else 0
+    colormap = plt.get_cmap(cmap).copy()
+    colormap.set_bad('lightgrey')
+    for zoom in range(levels + 1):
+        level = block_mean(values, 2 ** (levels - zoom))
+        level_dir = os.path.join(tiles_dir, str(zoom))
+        os.makedirs(level_dir, exist_ok=True)
+        for row in range(0, level.shape[0], tile_size):
+            for col in range(0, level.shape[1], tile_size):
+                tile = np.ma.masked_invalid(level[row:row + tile_size, col:col + tile_size])
+                plt.imsave(os.path.join(level_dir, '{}_{}.png'.format(row // tile_size, col // tile_size)), tile,
+                           cmap=colormap, vmin=vmin, vmax=vmax)
+    with open(os.path.join(tiles_dir, 'index.json'), 'w') as f:
+        json.dump({'size': n, 'tile_size': tile_size, 'levels': levels + 1, 'vmin': vmin, 'vmax': vmax,
+                   'labels': None if labels is None else [str(label) for label in labels]}, f)
+    return levels + 1
+
+
+# method to draw a (correlation) matrix as a heatmap which stays fast and readable for thousands of columns
+# - cluster: reorder the rows and columns by hierarchical clustering
+# - pixel_budget: maximum number of cells per side actually drawn, the pixels of the axis by default
+# - annot: True / False, or 'auto' to annotate only when there are at most annot_max_cells cells per side
+# - tiles_dir: when given, also write zoomable tiles of the full (clustered) matrix there
+# - kwargs: passed to sns.heatmap for the small (annotated) matrices, only linewidths and linecolor (cell grid) are
+#   also used for the large ones
+def clustered_heatmap(matrix, ax=None, cluster=True, pixel_budget=None, annot='auto', annot_max_cells=ANNOT_MAX_CELLS,
+                      fmt='.2f', cmap='RdBu_r', vmin=-1.0, vmax=1.0, tiles_dir=None, tile_size=TILE_SIZE, **kwargs):
+    if not isinstance(matrix, pd.DataFrame):
+        matrix = pd.DataFrame(matrix)
+    if ax is None:
+        ax = plt.gca()
+
+    if cluster and matrix.shape[0] == matrix.shape[1]:
+        order = cluster_order(matrix.to_numpy())
+        matrix = matrix.iloc[order, order]
+    if tiles_dir is not None:
+        write_tiles(matrix.to_numpy(), tiles_dir, tile_size=tile_size, cmap=cmap, vmin=vmin, vmax=vmax,
+                    labels=matrix.index)
+
+    budget = pixel_budget or pixel_budget_of(ax)
+    block = max(1, -(-max(matrix.shape) // budget))
+    if block > 1:
+        values = block_mean(matrix.to_numpy(dtype='float64'), block)
+        matrix = pd.DataFrame(values, index=block_labels(matrix.index, block), columns=block_labels(matrix.columns, block))
+
+    if annot == 'auto':
+        annot = max(matrix.shape) <= annot_max_cells
+
+    if annot or max(matrix.shape) <= annot_max_cells:
+        return sns.heatmap(matrix, annot=annot, fmt=fmt, cmap=cmap, vmin=vmin, vmax=vmax, ax=ax, **kwargs)
+
+    # one image instead of one rectangle per cell
+    image = ax.imshow(np.ma.masked_invalid(matrix.to_numpy(dtype='float64')), cmap=cmap, vmin=vmin, vmax=vmax,
+                      aspect='auto', interpolation='nearest')
+    ax.figure.colorbar(image, ax=ax)
+    linewidths = kwargs.get('linewidths', 0)
+    if linewidths:
+        n_rows, n_cols = matrix.shape
+        line_style = dict(colors=kwargs.get('linecolor', 'white'), linewidths=linewidths)
+        ax.hlines(np.arange(n_rows + 1) - 0.5, -0.5, n_cols - 0.5, **line_style)
+        ax.vlines(np.arange(n_cols + 1) - 0.5, -0.5, n_rows - 0.5, **line_style)
+    n_ticks = 50 # at most this many labels per side, evenly spread
+    for set_ticks, set_labels, labels in ((ax.set_yticks, ax.set_yticklabels, matrix.index),
+                                          (ax.set_xticks, ax.set_xticklabels, matrix.columns)):
+        positions = np.unique(np.linspace(0, len(labels) - 1, min(n_ticks, len(labels))).astype(int))
+        set_ticks(positions)
+        set_labels([labels[p] for p in positions], fontsize='small')
+    ax.tick_params(axis='x', labelrotation=90)
+    return ax
@@ -0,0 +1,175 @@
+"""
+Fitted, serializable version of the feature engineering of the house price case study
+(case_study1_advanced_house_price_prediction/2_feature_engineering.py).
+
+The script rewrites the whole frame once per step and never keeps what it learnt, so test.csv cannot be transformed
+the same way. HousePricePreprocessor learns every statistic once (fit), can be saved to / loaded from json, and
+applies all the steps to new data in a single pass over the columns (transform):
+1. categorical missing values replaced by the 'Missing' label
+2. numerical missing values replaced by the median, plus a <feature>nan indicator column
+3. temporal variables replaced by YrSold - year
+4. log of the skewed numerical variables
+5. labels present in less than 1% of the rows grouped into 'Rare_var'
+6. labels mapped to integers ordered by the mean of the target
+7. MinMax scaling of all the features (not Id and the target)
+
+For every output column the steps above are fused: a categorical column is turned into integer codes once and a
+small lookup array gives its final scaled value, a numerical column goes through a few numpy operations.
+Labels never seen during fit are treated as rare. Numerical missing values of new data are replaced by the median
+learnt during fit, also for the columns which had no missing value in the training data.
+
+Usage:
+    preprocessor = HousePricePreprocessor().fit(pd.read_csv('case_study1_advanced_house_price_prediction/train.csv'))
+    preprocessor.save('case_study1_advanced_house_price_prediction/preprocessor.json')
+    preprocessor.transform(pd.read_csv('case_study1_advanced_house_price_prediction/test.csv'))
+    preprocessor.transform_csv('big.csv', 'big_transformed.csv', chunksize=100_000) # one scan, bounded memory """
+
+import json
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from eda_utils.chunked_reader import DEFAULT_CHUNKSIZE, read_csv_chunks
+from eda_utils.rare_labels import RareLabelEncoder
+from eda_utils.target_encoding import TargetEncoder
+
+MISSING_LABEL = 'Missing'
+RARE_LABEL = 'Rare_var'
+TEMPORAL_FEATURES = ['YearBuilt', 'YearRemodAdd', 'GarageYrBlt']
+LOG_FEATURES = ['LotFrontage', 'LotArea', '1stFlrSF', 'GrLivArea', 'SalePrice']
+
+
+class HousePricePreprocessor:
+
+    def __init__(self, target='SalePrice', id_column='Id', rare_threshold=0.01, year_sold='YrSold',
+                 temporal_features=TEMPORAL_FEATURES, log_features=LOG_FEATURES):
+        self.target = target
+        self.id_column = id_column
+        self.rare_threshold = rare_threshold
+        self.year_sold = year_sold
+        self.temporal_features = list(temporal_features)
+        self.log_features = list(log_features)
+
+        # learnt by fit
+        self.columns = None # input columns, in order
+        self.categorical_features = None
+        self.categorical_with_nan = None # filled with MISSING_LABEL
+        self.numerical_with_nan = None # filled with the median, with an indicator column
+        self.medians = None # median of every numerical feature
+        self.label_values = None # categorical feature -> {label: ordinal}, rare labels excluded
+        self.rare_values = None # categorical feature -> ordinal of RARE_LABEL (also used for unseen labels)
+        self.feature_scale = None # output features, in order
+        self.scale_min = None
+        self.scale_range = None
+
+    # method to learn all the statistics from the training data, with the same steps as 2_feature_engineering.py
+    def fit(self, dataset):
+        data = dataset.copy()
+        self.columns = list(data.columns)
+        self.categorical_features = [f for f in data.columns if not is_numeric_dtype(data[f])]
+        numerical_features = [f for f in data.columns if is_numeric_dtype(data[f]) and f != self.target]
+        self.categorical_with_nan = [f for f in self.categorical_features if data[f].isnull().sum() > 1]
+        self.numerical_with_nan = [f for f in numerical_features if data[f].isnull().sum() > 1]
+        self.medians = {f: float(data[f].median()) for f in numerical_features}
+
+        # 1. and 2. missing values
+        data[self.categorical_with_nan] = data[self.categorical_with_nan].fillna(MISSING_LABEL)
+        for feature in self.numerical_with_nan:
+            data[feature + 'nan'] = np.where(data[feature].isnull(), 1, 0)
+            data[feature] = data[feature].fillna(self.medians[feature])
+
+        # 3. and 4. temporal and skewed variables
+        for feature in self.temporal_features:
+            data[feature] = data[self.year_sold] - data[feature]
+        for feature in self.log_features:
+            if feature in data:
+                data[feature] = np.log(data[feature])
+
+        # 5. and 6. rare labels and target ordered labels
+        rare_encoder = RareLabelEncoder(self.rare_threshold, RARE_LABEL)
+        data[self.categorical_features] = rare_encoder.fit_transform(data[self.categorical_features], output='object')
+        target_encoder = TargetEncoder(kind='ordered').fit(data[self.categorical_features], data[self.target])
+        self.label_values, self.rare_values = {}, {}
+        for feature in self.categorical_features:
+            ordinals = {label: int(i) for label, i in target_encoder.mapping[feature].items()}
+            self.rare_values[feature] = ordinals.pop(RARE_LABEL, 0)
+            self.label_values[feature] = ordinals
+            data[feature] = data[feature].map({**ordinals, RARE_LABEL: self.rare_values[feature]})
+
+        # 7. scaling
+        self.feature_scale = [f for f in data.columns if f not in [self.id_column, self.target]]
+        minimum = data[self.feature_scale].min()
+        value_range = data[self.feature_scale].max() - minimum
+        self.scale_min = {f: float(v) for f, v in minimum.items()}
+        self.scale_range = {f: float(v) if v != 0 else 1.0 for f, v in value_range.items()} # like MinMaxScaler
+        return self
+
+    # method to compute the final value of one categorical feature: codes, then a lookup array
+    def _categorical(self, feature, column):
+        labels = list(self.label_values[feature])
+        lookup = np.array([self.label_values[feature][label] for label in labels] + [self.rare_values[feature]],
+                          dtype='float64')
+        lookup = (lookup - self.scale_min[feature]) / self.scale_range[feature]
+        if feature in self.categorical_with_nan:
+            column = column.fillna(MISSING_LABEL)
+        codes = pd.Categorical(column, categories=labels).codes.astype('int64')
+        codes[codes < 0] = len(labels) # rare, unseen or missing label
+        return lookup[codes]
+
+    # method to compute the final value of one numerical feature
+    def _numerical(self, feature, column, year_sold):
+        values = column.to_numpy(dtype='float64', na_value=np.nan)
+        values = np.where(np.isnan(values), self.medians.get(feature, np.nan), values)
+        if feature in self.temporal_features:
+            values = year_sold - values
+        if feature in self.log_features:
+            values = np.log(values)
+        return values
+
+    # method to transform new data in one pass over the columns
+    def transform(self, dataset):
+        year_sold = self._numerical(self.year_sold, dataset[self.year_sold], None)
+        output = {}
+        if self.id_column in dataset:
+            output[self.id_column] = dataset[self.id_column].to_numpy()
+        if self.target in dataset:
+            output[self.target] = self._numerical(self.target, dataset[self.target], year_sold)
+        for feature in self.feature_scale:
+            if feature in self.label_values:
+                output[feature] = self._categorical(feature, dataset[feature])
+                continue
+            if feature.endswith('nan') and feature[:-3] in self.numerical_with_nan:
+                values = dataset[feature[:-3]].isnull().to_numpy().astype('float64')
+            else:
+                values = self._numerical(feature, dataset[feature], year_sold)
+            output[feature] = (values - self.scale_min[feature]) / self.scale_range[feature]
+        return pd.DataFrame(output, index=dataset.index)
+
+    def fit_transform(self, dataset):
+        return self.fit(dataset).transform(dataset)
+
+    # method to transform a csv chunk by chunk into another csv: one scan of the input, bounded memory
+    def transform_csv(self, path, out_path, chunksize=DEFAULT_CHUNKSIZE, **read_kwargs):
+        header = True
+        for chunk in read_csv_chunks(path, chunksize=chunksize, **read_kwargs):
+            self.transform(chunk).to_csv(out_path, mode='w' if header else 'a', header=header, index=False)
+            header = False
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, d):
+        preprocessor = cls()
+        preprocessor.__dict__.update(d)
+        return preprocessor
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,185 @@
+"""
+Streaming imputation of missing values.
+
+The scripts fill every column with its own df[col].fillna(df[col].median(), inplace=True) (one sort and two passes
+per column) and 2_feature_engineering.py added the <feature>nan indicators with one np.where per column.
+StreamingImputer learns the mean, median or mode of many columns in a single pass over chunks (partial_fit), from
+mergeable states (see sketches.py):
+- mean: MomentState
+- mode: count of every value
+- median: exact from the count of every value while the column has at most max_exact distinct values, otherwise from
+  a QuantileSketch (relative error bounded by relative_accuracy), so the memory stays bounded
+
+transform then fills a chunk in place and returns the missing indicators as packed bits (MissingIndicators, 1 bit
+per row and column instead of one int64 column per feature).
+
+Usage:
+    imputer = StreamingImputer({'Glucose': 'mean', 'Insulin': 'median'}, fill_values={'Club': 'No Club'})
+    imputer.fit(df) # or imputer.partial_fit(chunk) for every chunk, states of other workers with merge
+    indicators = imputer.transform(df) # df is filled in place
+    indicators.to_frame() # Glucosenan, Insulinnan... columns of 0/1
+
+    imputer = fit_csv('big.csv', {'LotFrontage': 'median'}) # one pass over the file, bounded memory """
+
+import numpy as np
+import pandas as pd
+
+from eda_utils.chunked_reader import DEFAULT_CHUNKSIZE, read_csv_chunks
+from eda_utils.sketches import MomentState, QuantileSketch
+
+STRATEGIES = ('mean', 'median', 'mode')
+MAX_EXACT = 10_000
+
+
+class MissingIndicators:
+
+    def __init__(self, columns, n_rows, bits):
+        self.columns = list(columns)
+        self.n_rows = n_rows
+        self.bits = bits # uint8 array (columns x ceil(n_rows / 8)), 1 bit per row
+
+    @classmethod
+    def from_frame(cls, frame, columns):
+        mask = frame[columns].isnull().to_numpy().T if columns else np.empty((0, len(frame)), dtype=bool)
+        return cls(columns, len(frame), np.packbits(mask, axis=1))
+
+    # method to return the indicator of one column as a boolean array
+    def column(self, name):
+        return np.unpackbits(self.bits[self.columns.index(name)], count=self.n_rows).astype(bool)
+
+    # method to return the indicators as <column><suffix> columns of 0/1 (like the nan columns of the scripts)
+    def to_frame(self, suffix='nan', index=None):
+        unpacked = np.unpackbits(self.bits, axis=1, count=self.n_rows).T if self.columns else None
+        return pd.DataFrame(unpacked, columns=[c + suffix for c in self.columns], index=index)
+
+
+class ImputeState:
+
+    def __init__(self, strategy, max_exact=MAX_EXACT, relative_accuracy=0.001):
+        self.strategy = strategy
+        self.max_exact = max_exact
+        self.n_missing = 0
+        self.moments = MomentState() if strategy == 'mean' else None
+        self.counts = {} if strategy in ('median', 'mode') else None # value -> count, None once too many values
+        self.quantiles = QuantileSketch(relative_accuracy) if strategy == 'median' else None
+
+    def update(self, series):
+        missing = series.isnull()
+        self.n_missing += int(missing.sum())
+        values = series[~missing]
+        if self.moments is not None:
+            self.moments.update(values.to_numpy(dtype='float64'))
+        if self.quantiles is not None:
+            self.quantiles.update(values.to_numpy(dtype='float64'))
+        if self.counts is not None:
+            for value, count in values.value_counts().items():
+                self.counts[value] = self.counts.get(value, 0) + int(count)
+            if self.strategy == 'median' and len(self.counts) > self.max_exact:
+                self.counts = None # too many distinct values: the quantile sketch takes over
+        return self
+
+    def merge(self, other):
+        self.n_missing += other.n_missing
+        if self.moments is not None:
+            self.moments.merge(other.moments)
+        if self.quantiles is not None:
+            self.quantiles.merge(other.quantiles)
+        if self.counts is not None and other.counts is not None:
+            for value, count in other.counts.items():
+                self.counts[value] = self.counts.get(value, 0) + count
+            if self.strategy == 'median' and len(self.counts) > self.max_exact:
+                self.counts = None
+        else:
+            self.counts = None
+        return self
+
+    # method to return the value used to fill the missing values
+    def value(self):
+        if self.strategy == 'mean':
+            return self.moments.mean if self.moments.n else np.nan
+        if self.strategy == 'median' and self.counts is None:
+            return self.quantiles.quantile(0.5)
+        if not self.counts:
+            return np.nan
+        values = pd.Series(self.counts)
+        if self.strategy == 'mode':
+            modes = values.index[values.to_numpy() == values.max()]
+            try:
+                return sorted(modes)[0] # same as Series.mode()[0]
+            except TypeError:
+                return modes[0]
+        # exact median from the counts: middle value, or mean of the two middle values
+        values = values.sort_index()
+        cumulative = np.cumsum(values.to_numpy())
+        n = cumulative[-1]
+        lower = values.index[np.searchsorted(cumulative, (n - 1) // 2, side='right')]
+        upper = values.index[np.searchsorted(cumulative, n // 2, side='right')]
+        return (lower + upper) / 2
+
+
+class StreamingImputer:
+
+    # strategies: column -> 'mean', 'median' or 'mode'
+    # fill_values: column -> constant used to fill the column
+    # indicators: columns which get a missing indicator, True for all the imputed columns
+    def __init__(self, strategies=None, fill_values=None, indicators=True, max_exact=MAX_EXACT,
+                 relative_accuracy=0.001):
+        self.strategies = dict(strategies or {})
+        for column, strategy in self.strategies.items():
+            if strategy not in STRATEGIES:
+                raise ValueError('strategy of {!r} must be one of {}, got {!r}'.format(column, STRATEGIES, strategy))
+        self.fill_values = dict(fill_values or {})
+        self.indicators = indicators
+        self.states = {column: ImputeState(strategy, max_exact, relative_accuracy)
+                       for column, strategy in self.strategies.items()}
+
+    @property
+    def columns(self):
+        return list(self.strategies) + [c for c in self.fill_values if c not in self.strategies]
+
+    def partial_fit(self, chunk):
+        for column, state in self.states.items():
+            state.update(chunk[column])
+        return self
+
+    def fit(self, frame):
+        return self.partial_fit(frame)
+
+    def merge(self, other):
+        for column, state in self.states.items():
+            state.merge(other.states[column])
+        return self
+
+    # method to return the fill value of every column
+    def statistics(self):
+        values = {column: state.value() for column, state in self.states.items()}
+        values.update({c: v for c, v in self.fill_values.items() if c not in values})
+        return values
+
+    # method to fill the missing values of a chunk in place, returns the missing indicators (MissingIndicators)
+    def transform(self, chunk, statistics=None):
+        statistics = self.statistics() if statistics is None else statistics
+        columns = [c for c in self.columns if c in chunk]
+        indicator_columns = columns if self.indicators is True else [c for c in (self.indicators or []) if c in chunk]
+        indicators = MissingIndicators.from_frame(chunk, indicator_columns)
+        chunk.fillna({c: statistics[c] for c in columns}, inplace=True)
+        return indicators
+
+
+# method to learn the imputation statistics of a csv in one pass over its chunks
+def fit_csv(path, strategies=None, fill_values=None, chunksize=DEFAULT_CHUNKSIZE, **read_kwargs):
+    imputer = StreamingImputer(strategies, fill_values)
+    for chunk in read_csv_chunks(path, chunksize=chunksize, **read_kwargs):
+        imputer.partial_fit(chunk)
+    return imputer
+
+
+# method to impute a csv chunk by chunk into another csv, with the <column>nan indicators appended
+def transform_csv(imputer, path, out_path, chunksize=DEFAULT_CHUNKSIZE, **read_kwargs):
+    statistics = imputer.statistics()
+    header = True
+    for chunk in read_csv_chunks(path, chunksize=chunksize, **read_kwargs):
+        indicators = imputer.transform(chunk, statistics)
+        chunk = pd.concat([chunk, indicators.to_frame(index=chunk.index)], axis=1)
+        chunk.to_csv(out_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
@@ -0,0 +1,109 @@
+"""
+Recursive feature elimination for linear regression, with one elimination run for every number of features.
+
+RFE(LinearRegression(), n) refits the regression on all the remaining columns after every column eliminated, and
+the car price notebook runs it again from scratch for 15, 6 and every n from 4 to 19. IncrementalRFE eliminates the
+columns one by one down to a single one, recording the full elimination order, so that the features kept for any n
+come from the same run (the same as RFE(LinearRegression(), n)).
+
+The least squares coefficients are w = A X'y with A the inverse of the (centered) Gram matrix X'X. Removing column
+j does not need a new fit: the inverse of the Gram matrix of the remaining columns and their coefficients are
+rank-one downdates of the current ones,
+    A' = A[-j, -j] - A[-j, j] A[j, -j] / A[j, j]
+    w' = w[-j] - A[-j, j] w[j] / A[j, j]
+so every step costs O(p^2) instead of a fit (O(n p^2)). While the Gram matrix is singular (more columns than rows,
+collinear dummies), the coefficients come from np.linalg.lstsq like LinearRegression, and the downdates start once
+the remaining columns are linearly independent. The inverse is recomputed every `refresh` steps to limit the
+accumulation of rounding errors.
+
+Usage:
+    rfe = IncrementalRFE().fit(X_train, y_train)
+    rfe.selected_features(15) # same columns as RFE(LinearRegression(), 15)
+    rfe.selected_features(6)
+    rfe.ranking(6) # same as RFE(LinearRegression(), 6).ranking_
+    rfe.elimination_order_ # first eliminated first """
+
+import numpy as np
+import pandas as pd
+
+
+class IncrementalRFE:
+
+    # fit_intercept: center the columns and the target first, like LinearRegression
+    # refresh: number of downdates after which the inverse of the Gram matrix is computed again
+    def __init__(self, fit_intercept=True, refresh=50):
+        self.fit_intercept = fit_intercept
+        self.refresh = refresh
+        self.columns_ = None
+        self.elimination_order_ = None # columns, first eliminated first, the last one is the best single column
+        self.coefs_ = None # number of features -> coefficients (Series) of the regression on the kept features
+
+    # method to return the inverse of a Gram matrix, None when it is singular
+    @staticmethod
+    def _inverse(gram):
+        try:
+            lower = np.linalg.cholesky(gram)
+        except np.linalg.LinAlgError:
+            return None
+        inverse_lower = np.linalg.solve(lower, np.eye(len(gram)))
+        inverse = inverse_lower.T @ inverse_lower
+        # a nearly singular matrix can pass the Cholesky factorization, check the conditioning too
+        return inverse if np.isfinite(inverse).all() and np.linalg.cond(gram) < 1e12 else None
+
+    def fit(self, X, y):
+        self.columns_ = X.columns if isinstance(X, pd.DataFrame) else pd.RangeIndex(np.shape(X)[1])
+        X = np.asarray(X, dtype='float64')
+        y = np.asarray(y, dtype='float64').ravel()
+        if self.fit_intercept:
+            X = X - X.mean(axis=0)
+            y = y - y.mean()
+        gram, xy = X.T @ X, X.T @ y
+
+        remaining = list(range(X.shape[1]))
+        order, coefs = [], {}
+        inverse, since_refresh = None, 0
+        while remaining:
+            if inverse is None or since_refresh >= self.refresh:
+                inverse = self._inverse(gram[np.ix_(remaining, remaining)])
+                since_refresh = 0
+            if inverse is None:
+                w = np.linalg.lstsq(X[:, remaining], y, rcond=None)[0]
+            else:
+                w = inverse @ xy[remaining] if since_refresh == 0 else w
+            coefs[len(remaining)] = pd.Series(w, index=self.columns_[remaining])
+
+            j = int(np.argmin(np.abs(w))) # same choice as RFE: smallest absolute coefficient, first one on ties
+            order.append(remaining.pop(j))
+            if inverse is not None and remaining:
+                column = np.delete(inverse[:, j], j)
+                w = np.delete(w, j) - column * w[j] / inverse[j, j]
+                inverse = np.delete(np.delete(inverse, j, axis=0), j, axis=1) - np.outer(column, column) / inverse[j, j]
+                since_refresh += 1
+        self.elimination_order_ = self.columns_[order]
+        self.coefs_ = coefs
+        return self
+
+    # method to return the features kept when n_features are selected
+    def selected_features(self, n_features):
+        if self.elimination_order_ is None:
+            raise ValueError('IncrementalRFE is not fitted yet, call fit first')
+        n_eliminated = len(self.elimination_order_) - n_features
+        kept = set(self.elimination_order_[max(n_eliminated, 0):])
+        return pd.Index([c for c in self.columns_ if c in kept])
+
+    # method to return a boolean mask of the kept features over the columns, like RFE.support_
+    def support(self, n_features):
+        return self.columns_.isin(self.selected_features(n_features))
+
+    # method to return the ranking of the columns like RFE.ranking_: 1 for the kept features, then 2 for the last one
+    # eliminated, etc.
+    def ranking(self, n_features):
+        n_columns = len(self.columns_)
+        ranks = pd.Series(1, index=self.columns_)
+        for position, column in enumerate(self.elimination_order_[:max(n_columns - n_features, 0)]):
+            ranks[column] = n_columns - n_features - position + 1
+        return ranks.to_numpy()
+
+    # method to return the coefficients of the regression on the features kept when n_features are selected
+    def coef(self, n_features):
+        return self.coefs_[n_features]
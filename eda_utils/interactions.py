@@ -0,0 +1,155 @@
+"""
+Sparse user x product interaction matrix, with top-k, co-purchase and segment queries.
+
+black_friday.py drops User_ID and Product_ID, although the offers are to be personalised per customer and product.
+A dense users x products table is out of reach (millions x hundreds of thousands of cells, almost all empty).
+InteractionMatrix keeps the (user, product, value) transactions as a scipy.sparse matrix:
+- the ids are mapped once to row / column positions (users_ and items_ are the pd.Index of the ids), the duplicate
+  transactions of a (user, product) pair are summed (or counted)
+- the matrix is kept in CSR (one row per user: products of a user) and CSC (one column per product: users of a
+  product), the CSC copy is built on first use
+- top_items / top_users: the k largest values of every row / column in one sort of the non zero values, no python
+  loop over the users
+- similar_items: co-purchase similarity of products from the sparse product B'B of the binary matrix (number of
+  users who bought both, or cosine), computed for batches of products so the similarity matrix is never dense
+- segment_totals / top_items_by_segment: sums over segments of users (age, city...) as one sparse product with a
+  segment indicator matrix
+
+Usage:
+    interactions = InteractionMatrix.from_frame(df1, user='User_ID', item='Product_ID', value='Purchase')
+    interactions.top_items(k=5, users=[1000001]) # the 5 products with the largest purchase of a user
+    interactions.similar_items(['P00069042'], k=5) # products most often bought by the same users
+    interactions.top_items_by_segment(df1.groupby('User_ID')['Age'].first(), k=3) """
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+AGGREGATIONS = ('sum', 'count')
+SIMILARITIES = ('count', 'cosine', 'jaccard')
+
+
+# method to return the k largest values of every row of a CSR matrix: (rows, columns, values, ranks) arrays
+def top_k_rows(matrix, k):
+    matrix = sparse.csr_matrix(matrix)
+    matrix.sort_indices()
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    order = np.lexsort((-matrix.data, rows)) # by row, then by decreasing value (first column first on ties)
+    ranks = np.arange(len(order)) - matrix.indptr[rows[order]]
+    keep = order[ranks < k]
+    return rows[keep], matrix.indices[keep], matrix.data[keep], ranks[ranks < k]
+
+
+class InteractionMatrix:
+
+    # matrix: users x items sparse matrix, users / items: ids of its rows / columns
+    def __init__(self, matrix, users, items):
+        self.csr = sparse.csr_matrix(matrix)
+        self.users_ = pd.Index(users)
+        self.items_ = pd.Index(items)
+        self._csc = None
+
+    # method to build the matrix from transactions, agg: 'sum' of the values or 'count' of the transactions
+    @classmethod
+    def from_frame(cls, data, user='User_ID', item='Product_ID', value=None, agg='sum'):
+        if agg not in AGGREGATIONS:
+            raise ValueError('agg must be one of {}, got {!r}'.format(AGGREGATIONS, agg))
+        user_codes, users = pd.factorize(data[user], sort=True)
+        item_codes, items = pd.factorize(data[item], sort=True)
+        if value is None or agg == 'count':
+            values = np.ones(len(data), dtype='float32')
+        else:
+            values = pd.Series(data[value]).to_numpy(dtype='float64', na_value=np.nan) # <NA> of nullable columns too
+        keep = (user_codes >= 0) & (item_codes >= 0) & ~np.isnan(values)
+        matrix = sparse.coo_matrix((values[keep], (user_codes[keep], item_codes[keep])),
+                                   shape=(len(users), len(items))).tocsr() # duplicates are summed
+        return cls(matrix, users, items)
+
+    @property
+    def csc(self):
+        if self._csc is None:
+            self._csc = self.csr.tocsc()
+        return self._csc
+
+    @property
+    def shape(self):
+        return self.csr.shape
+
+    @property
+    def density(self):
+        return self.csr.nnz / max(1, self.shape[0] * self.shape[1])
+
+    # method to return the row positions of user ids (KeyError for unknown ids)
+    def user_positions(self, users):
+        return self._positions(self.users_, users, 'users')
+
+    def item_positions(self, items):
+        return self._positions(self.items_, items, 'items')
+
+    @staticmethod
+    def _positions(index, ids, kind):
+        positions = index.get_indexer(pd.Index(ids))
+        if (positions < 0).any():
+            raise KeyError('unknown {}: {}'.format(kind, list(pd.Index(ids)[positions < 0][:5])))
+        return positions
+
+    # method to return the k products with the largest values of every user (or of some users)
+    def top_items(self, k=10, users=None):
+        matrix = self.csr if users is None else self.csr[self.user_positions(users)]
+        user_ids = self.users_ if users is None else pd.Index(users)
+        rows, columns, values, ranks = top_k_rows(matrix, k)
+        return pd.DataFrame({'user': user_ids[rows], 'rank': ranks + 1, 'item': self.items_[columns],
+                             'value': values})
+
+    # method to return the k users with the largest values of every product (or of some products)
+    def top_users(self, k=10, items=None):
+        matrix = self.csc.T if items is None else self.csc[:, self.item_positions(items)].T
+        item_ids = self.items_ if items is None else pd.Index(items)
+        rows, columns, values, ranks = top_k_rows(matrix, k)
+        return pd.DataFrame({'item': item_ids[rows], 'rank': ranks + 1, 'user': self.users_[columns],
+                             'value': values})
+
+    # method to return the k products most often bought by the same users as every product (or some products)
+    # - similarity: 'count' (users who bought both), 'cosine' (count / sqrt(buyers of each)) or 'jaccard'
+    #   (count / buyers of either)
+    # - batch_size: number of products whose similarities are computed at once
+    def similar_items(self, items=None, k=10, similarity='cosine', batch_size=1000):
+        if similarity not in SIMILARITIES:
+            raise ValueError('similarity must be one of {}, got {!r}'.format(SIMILARITIES, similarity))
+        bought = self.csc.copy()
+        bought.data = np.ones_like(bought.data, dtype='float64')
+        buyers = np.asarray(bought.sum(axis=0)).ravel()
+        positions = np.arange(self.shape[1]) if items is None else self.item_positions(items)
+        results = []
+        for start in range(0, len(positions), batch_size):
+            batch = positions[start:start + batch_size]
+            counts = (bought[:, batch].T @ bought).tocoo() # batch x items, users who bought both
+            other = counts.col != batch[counts.row] # leave out the product itself
+            rows, columns, values = counts.row[other], counts.col[other], counts.data[other]
+            if similarity == 'cosine':
+                values = values / np.sqrt(buyers[batch[rows]] * buyers[columns])
+            elif similarity == 'jaccard':
+                values = values / (buyers[batch[rows]] + buyers[columns] - values)
+            scores = sparse.csr_matrix((values, (rows, columns)), shape=(len(batch), self.shape[1]))
+            rows, columns, values, ranks = top_k_rows(scores, k)
+            results.append(pd.DataFrame({'item': self.items_[batch[rows]], 'rank': ranks + 1,
+                                         'similar_item': self.items_[columns], similarity: values}))
+        return pd.concat(results, ignore_index=True) if results else pd.DataFrame(
+            columns=['item', 'rank', 'similar_item', similarity])
+
+    # method to return the segments x items matrix of the values summed over the users of every segment
+    # segments: Series user id -> segment (users without a segment are left out)
+    def segment_totals(self, segments):
+        segments = pd.Series(segments).reindex(self.users_)
+        codes, labels = pd.factorize(segments, sort=True)
+        users = np.flatnonzero(codes >= 0)
+        indicator = sparse.csr_matrix((np.ones(len(users)), (codes[users], users)),
+                                      shape=(len(labels), self.shape[0]))
+        return pd.Index(labels, name=segments.name), (indicator @ self.csr).tocsr()
+
+    # method to return the k products with the largest total value in every segment of users
+    def top_items_by_segment(self, segments, k=10):
+        labels, totals = self.segment_totals(segments)
+        rows, columns, values, ranks = top_k_rows(totals, k)
+        return pd.DataFrame({'segment': labels[rows], 'rank': ranks + 1, 'item': self.items_[columns],
+                             'value': values})
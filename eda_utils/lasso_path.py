@@ -0,0 +1,189 @@
+"""
+Lasso / ElasticNet feature selection along the whole regularization path.
+
+3_feature_selection.py fits SelectFromModel(Lasso(alpha=0.005)) once, with an alpha picked by hand; trying other
+alphas means one cold fit each. LassoPathSelector computes the coefficients for a decreasing grid of alphas:
+- the centered Gram matrix X'X / n and X'y / n are computed once (and once per CV fold), the screening, the KKT
+  checks and coordinate descent all work on them
+- every alpha starts from the coefficients of the previous one (warm start), so coordinate descent (sklearn's, on
+  the Gram matrix) needs few sweeps
+- sequential strong rules: before solving for alpha_k, the features with |x_j'r| / n < l1_ratio * (2 alpha_k -
+  alpha_k-1) are set aside and coordinate descent only runs on the others. The KKT conditions of the features set
+  aside are checked afterwards and the violators are added back, so the solution is the same as without screening
+- the cross validation folds are computed in parallel (n_jobs) by worker processes reading X and y from shared
+  memory, and the alpha with the lowest mean squared error is kept (alpha_)
+
+The objective is the one of sklearn's ElasticNet (Lasso for l1_ratio=1):
+    1 / (2 n) ||y - Xw - b||^2 + alpha * l1_ratio * ||w||_1 + alpha * (1 - l1_ratio) / 2 * ||w||^2
+
+Usage:
+    selector = LassoPathSelector(cv=5, n_jobs=None).fit(X_train, y_train)
+    selector.alpha_ # alpha with the best cross validated error
+    selector.selected_features() # features with a non zero coefficient at alpha_
+    selector.selected_features(alpha=0.005, threshold=1e-5) # same features as SelectFromModel(Lasso(alpha=0.005))
+    selector.path_summary() # alpha, number of selected features and cross validated error along the path """
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import enet_path
+
+from eda_utils.shared_arrays import attach, share, shared
+
+
+# method to return the means, the centered data and the Gram statistics of the centered data (X'X / n, X'y / n)
+def gram_stats(X, y):
+    x_mean, y_mean = X.mean(axis=0), y.mean()
+    Xc, yc = X - x_mean, y - y_mean
+    return x_mean, y_mean, Xc, yc, Xc.T @ Xc / len(y), Xc.T @ yc / len(y)
+
+
+# method to return the decreasing grid of alphas, from the smallest alpha with all the coefficients at 0
+def alpha_grid(xy, l1_ratio=1.0, n_alphas=100, eps=1e-3):
+    alpha_max = np.abs(xy).max() / l1_ratio if len(xy) else 1.0
+    alpha_max = alpha_max if alpha_max > 0 else 1.0
+    return np.geomspace(alpha_max, alpha_max * eps, n_alphas)
+
+
+# method to run coordinate descent (sklearn's, on the Gram matrix) on the features `active` only, starting from w,
+# which is updated in place
+def _coordinate_descent(Xc, yc, gram, xy, w, active, alpha, l1_ratio, tol, max_iter):
+    if not len(active):
+        return
+    n = Xc.shape[0]
+    _, coefs, _ = enet_path(np.asfortranarray(Xc[:, active]), yc, l1_ratio=l1_ratio, alphas=[alpha],
+                            precompute=gram[np.ix_(active, active)] * n, Xy=xy[active] * n, coef_init=w[active],
+                            check_input=False, tol=tol, max_iter=max_iter)
+    w[active] = coefs[:, 0]
+
+
+# method to return the coefficients (n_alphas x n_features) of the path of the centered data, with warm starts and
+# sequential strong rules, and the number of features coordinate descent ran on for every alpha
+# - coef_init / alpha_init: solution the path starts from and its alpha (all zeros at alpha_max by default)
+def screened_path(Xc, yc, gram, xy, alphas, l1_ratio=1.0, tol=1e-4, max_iter=1000, coef_init=None, alpha_init=None):
+    n_features = len(xy)
+    w = np.zeros(n_features) if coef_init is None else np.array(coef_init, dtype='float64')
+    coefs = np.zeros((len(alphas), n_features))
+    n_screened = np.zeros(len(alphas), dtype='int64')
+    previous_alpha = alpha_init if alpha_init is not None else np.abs(xy).max() / l1_ratio if n_features else 0.0
+    for i, alpha in enumerate(alphas):
+        gradient = np.abs(xy - gram @ w)
+        keep = (gradient >= l1_ratio * (2 * alpha - previous_alpha)) | (w != 0)
+        while True:
+            _coordinate_descent(Xc, yc, gram, xy, w, np.flatnonzero(keep), alpha, l1_ratio, tol, max_iter)
+            gradient = np.abs(xy - gram @ w)
+            violations = ~keep & (gradient > l1_ratio * alpha * (1 + 1e-9))
+            if not violations.any():
+                break
+            keep |= violations # features wrongly set aside: solve again with them
+        coefs[i] = w
+        n_screened[i] = keep.sum()
+        previous_alpha = alpha
+    return coefs, n_screened
+
+
+# method to return the mean squared error along the path of the rows of fold k, the path being fitted on the others
+def _fold_mse(X, y, fold, k, alphas, l1_ratio, tol, max_iter):
+    train, test = fold != k, fold == k
+    x_mean, y_mean, Xc, yc, gram, xy = gram_stats(X[train], y[train])
+    coefs, _ = screened_path(Xc, yc, gram, xy, alphas, l1_ratio, tol, max_iter)
+    predictions = (X[test] - x_mean) @ coefs.T + y_mean
+    return ((predictions - y[test][:, None]) ** 2).mean(axis=0)
+
+
+def _fold_mse_shared(k, alphas, l1_ratio, tol, max_iter):
+    return _fold_mse(shared('X'), shared('y'), shared('fold'), k, alphas, l1_ratio, tol, max_iter)
+
+
+class LassoPathSelector:
+
+    # l1_ratio: 1 for the Lasso, between 0 and 1 for the ElasticNet
+    # alphas: grid of alphas (sorted in decreasing order), else n_alphas from alpha_max down to alpha_max * eps
+    # cv: number of cross validation folds, None or 0 for no cross validation (alpha_ is then not set)
+    # n_jobs: number of worker processes for the folds, 1 to stay in the current process, None for all the cpus
+    def __init__(self, l1_ratio=1.0, n_alphas=100, eps=1e-3, alphas=None, cv=5, n_jobs=1, tol=1e-4, max_iter=1000,
+                 random_state=0):
+        if not 0 < l1_ratio <= 1:
+            raise ValueError('l1_ratio must be in (0, 1], got {!r}'.format(l1_ratio))
+        self.l1_ratio = l1_ratio
+        self.n_alphas = n_alphas
+        self.eps = eps
+        self.alphas = alphas
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.tol = tol
+        self.max_iter = max_iter
+        self.random_state = random_state
+        self.alphas_ = None
+        self.coefs_ = None # DataFrame alphas x features
+        self.intercepts_ = None
+        self.n_screened_ = None # number of features coordinate descent ran on, for every alpha
+        self.cv_mse_ = None # DataFrame alphas x folds
+        self.alpha_ = None
+        self._stats = None # centered data and Gram statistics of the fit, to solve at alphas off the grid
+
+    def fit(self, X, y):
+        columns = X.columns if isinstance(X, pd.DataFrame) else pd.RangeIndex(np.shape(X)[1])
+        X = np.asarray(X, dtype='float64')
+        y = np.asarray(y, dtype='float64').ravel()
+        x_mean, y_mean, Xc, yc, gram, xy = gram_stats(X, y)
+        alphas = np.sort(np.asarray(self.alphas, dtype='float64'))[::-1] if self.alphas is not None else \
+            alpha_grid(xy, self.l1_ratio, self.n_alphas, self.eps)
+        coefs, self.n_screened_ = screened_path(Xc, yc, gram, xy, alphas, self.l1_ratio, self.tol, self.max_iter)
+        self.alphas_ = alphas
+        self.coefs_ = pd.DataFrame(coefs, index=pd.Index(alphas, name='alpha'), columns=columns)
+        self.intercepts_ = y_mean - coefs @ x_mean
+        self._stats = (Xc, yc, gram, xy)
+        if self.cv:
+            self.cv_mse_ = self._cross_validate(X, y, alphas)
+            self.alpha_ = float(self.cv_mse_.mean(axis=1).idxmin())
+        return self
+
+    def _cross_validate(self, X, y, alphas):
+        fold = np.random.default_rng(self.random_state).permutation(len(y)) % self.cv
+        args = (alphas, self.l1_ratio, self.tol, self.max_iter)
+        n_jobs = min(self.n_jobs or os.cpu_count() or 1, self.cv)
+        if n_jobs == 1:
+            mse = [_fold_mse(X, y, fold, k, *args) for k in range(self.cv)]
+        else:
+            with share({'X': X, 'y': y, 'fold': fold}) as spec:
+                with ProcessPoolExecutor(n_jobs, initializer=attach, initargs=(spec,)) as pool:
+                    futures = [pool.submit(_fold_mse_shared, k, *args) for k in range(self.cv)]
+                    mse = [future.result() for future in futures]
+        return pd.DataFrame(np.column_stack(mse), index=pd.Index(alphas, name='alpha'),
+                            columns=['fold_{}'.format(k) for k in range(self.cv)])
+
+    # method to return the coefficients at an alpha, alpha_ by default. An alpha which is not on the grid is solved
+    # exactly, warm started from the grid alpha just above it
+    def coef(self, alpha=None):
+        if self.coefs_ is None:
+            raise ValueError('LassoPathSelector is not fitted yet, call fit first')
+        alpha = self.alpha_ if alpha is None else alpha
+        if alpha is None:
+            raise ValueError('no cross validation was run, give an alpha')
+        on_grid = np.flatnonzero(np.isclose(self.alphas_, alpha, rtol=1e-12, atol=0))
+        if len(on_grid):
+            return self.coefs_.iloc[on_grid[0]]
+        above = np.flatnonzero(self.alphas_ > alpha) # alphas_ is decreasing: the last one is the closest
+        coef_init, alpha_init = (self.coefs_.iloc[above[-1]].to_numpy(), self.alphas_[above[-1]]) if len(above) \
+            else (None, None)
+        coefs, _ = screened_path(*self._stats, [alpha], self.l1_ratio, self.tol, self.max_iter, coef_init, alpha_init)
+        return pd.Series(coefs[0], index=self.coefs_.columns, name=alpha)
+
+    # method to return the selected features at an alpha, alpha_ by default: the non zero coefficients, or with a
+    # threshold the coefficients with |coef| >= threshold (SelectFromModel uses 1e-5 for the Lasso)
+    def selected_features(self, alpha=None, threshold=None):
+        coef = self.coef(alpha).to_numpy()
+        return self.coefs_.columns[coef != 0 if threshold is None else np.abs(coef) >= threshold]
+
+    # method to return one row per alpha: number of selected features, features set aside by the strong rules,
+    # cross validated error
+    def path_summary(self):
+        summary = pd.DataFrame({'n_selected': (self.coefs_.to_numpy() != 0).sum(axis=1),
+                                'n_screened': self.n_screened_}, index=self.coefs_.index)
+        if self.cv_mse_ is not None:
+            summary['cv_mse'] = self.cv_mse_.mean(axis=1)
+            summary['cv_mse_std'] = self.cv_mse_.std(axis=1)
+        return summary
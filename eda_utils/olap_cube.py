@@ -0,0 +1,158 @@
+"""
+Pre-aggregated cube of measures over a few low cardinality dimensions.
+
+The plots of bikes.py regroup the whole train frame for every view (groupby(['hour', 'workingday']),
+groupby([agg_attr, 'year']), groupby('holiday').mean()...). OlapCube aggregates the rows once into dense arrays
+with one cell per combination of the dimension values (hour x workingday x holiday x season x weather x month x
+year is 36864 cells for the bikes):
+- for every measure: sum and sum of squares, plus the number of rows of every cell (np.bincount on the flat cell
+  index of the rows)
+- optionally a QuantileSketch (see sketches.py) of one measure for every non empty cell
+Any roll-up (sum over the dimensions not asked for) or slice (where={'year': 2011}) is then computed from the cells,
+without reading the rows again. The cells are mergeable: update adds new rows, merge adds another cube.
+
+Usage:
+    cube = OlapCube({'hour': range(24), 'workingday': [0, 1], 'year': [2011, 2012]}, measures=['count'])
+    cube.update({'hour': hours, 'workingday': train['workingday'], 'year': years, 'count': train['count']})
+    cube.rollup(['hour', 'workingday'], where={'year': 2011}).unstack() # sum of count per hour and workingday
+    cube.rollup(['hour'], agg='mean')
+    cube.rollup(['hour'], agg='quantile', q=0.9) # needs sketch_measure='count' """
+
+import numpy as np
+import pandas as pd
+
+from eda_utils.sketches import QuantileSketch
+
+AGGREGATIONS = ('sum', 'mean', 'std', 'rows', 'quantile')
+
+
+class OlapCube:
+
+    # dimensions: dimension name -> list of its values (the values of the rows must be among them)
+    # measures: numeric columns aggregated in every cell
+    # sketch_measure: measure with a quantile sketch per cell (for agg='quantile'), None for no sketch
+    def __init__(self, dimensions, measures=('count',), sketch_measure=None, relative_accuracy=0.01):
+        self.dimensions = {name: list(values) for name, values in dimensions.items()}
+        self.measures = list(measures)
+        self.sketch_measure = sketch_measure
+        self.relative_accuracy = relative_accuracy
+        self.shape = tuple(len(values) for values in self.dimensions.values())
+        size = int(np.prod(self.shape))
+        self.rows = np.zeros(size, dtype='int64')
+        self.sums = {measure: np.zeros(size) for measure in self.measures}
+        self.squares = {measure: np.zeros(size) for measure in self.measures}
+        self.sketches = {} # flat cell index -> QuantileSketch of sketch_measure
+
+    # method to return the flat cell index of every row
+    def _cells(self, data):
+        codes = []
+        for name, values in self.dimensions.items():
+            column_codes = pd.Categorical(np.asarray(data[name]), categories=values).codes
+            if (column_codes < 0).any():
+                unknown = pd.unique(np.asarray(data[name])[column_codes < 0])[:5]
+                raise ValueError('values {} of dimension {!r} are not in the cube'.format(list(unknown), name))
+            codes.append(column_codes)
+        return np.ravel_multi_index(codes, self.shape) if codes else np.zeros(len(data[self.measures[0]]), 'int64')
+
+    # method to add rows to the cells, data: DataFrame or dict of arrays with the dimensions and the measures
+    def update(self, data):
+        cells = self._cells(data)
+        size = len(self.rows)
+        self.rows += np.bincount(cells, minlength=size)
+        for measure in self.measures:
+            values = np.asarray(data[measure], dtype='float64')
+            self.sums[measure] += np.bincount(cells, weights=values, minlength=size)
+            self.squares[measure] += np.bincount(cells, weights=values * values, minlength=size)
+        if self.sketch_measure is not None:
+            values = np.asarray(data[self.sketch_measure], dtype='float64')
+            order = np.argsort(cells, kind='stable')
+            bounds = np.flatnonzero(np.diff(cells[order])) + 1
+            for rows in np.split(order, bounds) if len(order) else []:
+                cell = int(cells[rows[0]])
+                sketch = self.sketches.setdefault(cell, QuantileSketch(self.relative_accuracy))
+                sketch.update(values[rows])
+        return self
+
+    def merge(self, other):
+        if other.dimensions != self.dimensions or other.measures != self.measures:
+            raise ValueError('only cubes with the same dimensions and measures can be merged')
+        self.rows += other.rows
+        for measure in self.measures:
+            self.sums[measure] += other.sums[measure]
+            self.squares[measure] += other.squares[measure]
+        for cell, sketch in other.sketches.items():
+            self.sketches.setdefault(cell, QuantileSketch(self.relative_accuracy)).merge(sketch)
+        return self
+
+    # method to return the index along every dimension of the cells kept by a slice
+    def _selection(self, where):
+        selection = []
+        for name, values in self.dimensions.items():
+            if name in (where or {}):
+                wanted = where[name] if isinstance(where[name], (list, tuple, set, np.ndarray, range)) else [where[name]]
+                selection.append(np.array([values.index(v) for v in wanted], dtype='int64'))
+            else:
+                selection.append(np.arange(len(values)))
+        return selection
+
+    # method to sum an array of cells over the dimensions not in `by`, on the cells kept by `where`
+    def _rollup_array(self, flat, by, where):
+        array = flat.reshape(self.shape)[np.ix_(*self._selection(where))]
+        names = list(self.dimensions)
+        axes = tuple(i for i, name in enumerate(names) if name not in by)
+        array = array.sum(axis=axes)
+        kept = [name for name in names if name in by]
+        return np.transpose(array, [kept.index(name) for name in by]) if by else array
+
+    # method to return a roll-up of the cube as a Series indexed by the values of the dimensions `by`
+    # - where: dimension -> value (or list of values) to keep, the other cells are left out
+    # - agg: 'sum', 'mean', 'std' (sample standard deviation), 'rows' (number of rows) or 'quantile' (of the
+    #   sketch_measure, q)
+    # - empty: keep the combinations without any row (with 0 or NaN)
+    def rollup(self, by, where=None, measure=None, agg='sum', q=0.5, empty=False):
+        if agg not in AGGREGATIONS:
+            raise ValueError('agg must be one of {}, got {!r}'.format(AGGREGATIONS, agg))
+        by = [by] if isinstance(by, str) else list(by)
+        measure = measure or (self.sketch_measure if agg == 'quantile' else self.measures[0])
+        rows = self._rollup_array(self.rows, by, where)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if agg == 'rows':
+                values = rows.astype('float64')
+            elif agg == 'quantile':
+                values = self._quantiles(by, where, q)
+            else:
+                sums = self._rollup_array(self.sums[measure], by, where)
+                values = sums
+                if agg == 'mean':
+                    values = np.where(rows > 0, sums / rows, np.nan)
+                elif agg == 'std':
+                    squares = self._rollup_array(self.squares[measure], by, where)
+                    variance = (squares - sums * sums / rows) / (rows - 1)
+                    values = np.where(rows > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+        selection = dict(zip(self.dimensions, self._selection(where)))
+        levels = [[self.dimensions[name][i] for i in selection[name]] for name in by]
+        if not by:
+            return values.item()
+        index = pd.MultiIndex.from_product(levels, names=by) if len(by) > 1 else pd.Index(levels[0], name=by[0])
+        result = pd.Series(np.ravel(values), index=index, name=measure if agg != 'rows' else 'rows')
+        return result if empty else result[np.ravel(rows) > 0]
+
+    # method to return the quantile q of the sketch_measure for every combination of the dimensions `by`
+    def _quantiles(self, by, where, q):
+        if self.sketch_measure is None:
+            raise ValueError('the cube has no sketch, build it with sketch_measure')
+        selection = self._selection(where)
+        names = list(self.dimensions)
+        positions = {name: {int(i): j for j, i in enumerate(s)} for name, s in zip(names, selection)}
+        out_shape = tuple(len(positions[name]) for name in by)
+        groups = {}
+        for cell, sketch in self.sketches.items():
+            coordinates = dict(zip(names, np.unravel_index(cell, self.shape)))
+            if any(int(coordinates[name]) not in positions[name] for name in names):
+                continue # cell left out by where
+            key = tuple(positions[name][int(coordinates[name])] for name in by)
+            groups.setdefault(key, QuantileSketch(self.relative_accuracy)).merge(sketch)
+        values = np.full(out_shape, np.nan)
+        for key, sketch in groups.items():
+            values[key] = sketch.quantile(q)
+        return values
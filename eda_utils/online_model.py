@@ -0,0 +1,158 @@
+"""
+Online demand model updated with micro-batches of new rental hours, with json checkpoints.
+
+bikes.py trains its random forest once on train_bikes.csv: taking new hours into account means training again on
+all the rows. OnlineDemandModel is a ridge regression of log(1 + count) on calendar and weather features which only
+keeps its sufficient statistics, X'X and X'y (p x p, about 70 features), so that:
+- partial_fit adds a micro-batch of rows to the statistics (O(rows p^2)) and the coefficients are solved again
+  (O(p^3)): milliseconds per batch, whatever the number of rows seen before, and the same coefficients as a ridge
+  fitted on all the rows at once
+- with half_life, the statistics of the past rows are discounted by 0.5 ** (new rows / half_life) before each batch,
+  so the model follows a drifting demand (recursive least squares with forgetting)
+- the features come from CalendarFeatures (hour for working and non working days, weekday, month, year) and the
+  weather columns (season / weather one-hot, temp, atemp, humidity, windspeed, holiday, workingday)
+- the state is a few arrays: checkpoint writes it as json (to a temporary file, then renamed, so a checkpoint is
+  never half written) and restore starts again from it
+
+Usage:
+    model = OnlineDemandModel(alpha=1.0, half_life=24 * 90)
+    for batch in new_hours: # DataFrames with datetime, the weather columns and count
+        predictions = model.predict(batch) # forecast before the counts are known
+        model.partial_fit(batch)
+    model.checkpoint('case_study2_bikes/online_model.json')
+    model = OnlineDemandModel.restore('case_study2_bikes/online_model.json') """
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from eda_utils.calendar_features import CalendarFeatures
+
+CATEGORIES = {'season': [1, 2, 3, 4], 'weather': [1, 2, 3, 4]}
+NUMERIC = ('temp', 'atemp', 'humidity', 'windspeed', 'holiday', 'workingday')
+
+
+class OnlineDemandModel:
+
+    # alpha: ridge penalty (the intercept is not penalized)
+    # half_life: number of rows after which the weight of a row is halved, None to weigh all the rows the same
+    # log_target: fit log(1 + target) and predict exp(prediction) - 1, the scale of the rmsle
+    # target / datetime: names of the target and of the datetime columns
+    def __init__(self, alpha=1.0, half_life=None, log_target=True, target='count', datetime='datetime',
+                 categories=None, numeric=NUMERIC, first_year=2011):
+        self.alpha = alpha
+        self.half_life = half_life
+        self.log_target = log_target
+        self.target = target
+        self.datetime = datetime
+        self.categories = dict(CATEGORIES if categories is None else categories)
+        self.numeric = list(numeric)
+        self.first_year = first_year
+        self.feature_names = self._feature_names()
+        p = len(self.feature_names)
+        self.gram = np.zeros((p, p)) # X'X of the (discounted) rows seen
+        self.xy = np.zeros(p) # X'y
+        self.n_rows = 0 # number of rows seen
+        self.weight = 0.0 # sum of the weights of the rows seen
+        self.coef = np.zeros(p)
+
+    def _feature_names(self):
+        names = ['intercept', 'year']
+        names += ['hour_{}_workingday'.format(h) for h in range(24)]
+        names += ['hour_{}_offday'.format(h) for h in range(24)]
+        names += ['weekday_{}'.format(d) for d in range(7)] + ['month_{}'.format(m) for m in range(1, 13)]
+        names += ['{}_{}'.format(column, value) for column, values in self.categories.items() for value in values]
+        return names + self.numeric
+
+    # method to return the feature matrix of a batch of rows
+    def features(self, batch):
+        calendar = CalendarFeatures(batch[self.datetime])
+        n = len(batch)
+        rows = np.arange(n)
+        workingday = np.asarray(batch['workingday']) == 1 if 'workingday' in batch else ~calendar.weekend
+        blocks = [np.ones((n, 1)), (calendar.year - self.first_year).astype('float64')[:, None]]
+        hours = np.zeros((n, 48))
+        hours[rows, calendar.hour + np.where(workingday, 0, 24)] = 1.0
+        weekdays = np.zeros((n, 7))
+        weekdays[rows, calendar.weekday] = 1.0
+        months = np.zeros((n, 12))
+        months[rows, calendar.month - 1] = 1.0
+        blocks += [hours, weekdays, months]
+        for column, values in self.categories.items():
+            # unknown values get no one-hot column
+            codes = pd.Categorical(np.asarray(batch[column]), categories=values).codes
+            one_hot = np.zeros((n, len(values)))
+            one_hot[rows[codes >= 0], codes[codes >= 0]] = 1.0
+            blocks.append(one_hot)
+        blocks.append(np.column_stack([np.asarray(batch[c], dtype='float64') for c in self.numeric])
+                      if self.numeric else np.zeros((n, 0)))
+        return np.hstack(blocks)
+
+    # method to add a micro-batch of rows (datetime, weather columns and target) to the model
+    def partial_fit(self, batch):
+        if len(batch) == 0:
+            return self
+        X = self.features(batch)
+        y = np.asarray(batch[self.target], dtype='float64')
+        if self.log_target:
+            y = np.log1p(y)
+        if self.half_life is not None:
+            discount = 0.5 ** (len(batch) / self.half_life)
+            self.gram *= discount
+            self.xy *= discount
+            self.weight *= discount
+        self.gram += X.T @ X
+        self.xy += X.T @ y
+        self.n_rows += len(batch)
+        self.weight += len(batch)
+        self._solve()
+        return self
+
+    def _solve(self):
+        penalty = np.full(len(self.xy), float(self.alpha))
+        penalty[0] = 0.0 # no penalty on the intercept
+        try:
+            self.coef = np.linalg.solve(self.gram + np.diag(penalty), self.xy)
+        except np.linalg.LinAlgError: # no penalty and collinear features
+            self.coef = np.linalg.lstsq(self.gram, self.xy, rcond=None)[0]
+
+    def predict(self, batch):
+        if self.n_rows == 0:
+            raise ValueError('OnlineDemandModel is not fitted yet, call partial_fit first')
+        prediction = self.features(batch) @ self.coef
+        return np.maximum(np.expm1(prediction), 0.0) if self.log_target else prediction
+
+    @property
+    def coef_(self):
+        return pd.Series(self.coef, index=self.feature_names)
+
+    def to_dict(self):
+        d = {key: value for key, value in self.__dict__.items() if key != 'feature_names'}
+        for key in ('gram', 'xy', 'coef'):
+            d[key] = d[key].tolist()
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        d = dict(d)
+        state = {key: np.asarray(d.pop(key), dtype='float64') for key in ('gram', 'xy', 'coef')}
+        n_rows, weight = d.pop('n_rows'), d.pop('weight')
+        model = cls(**d)
+        if state['gram'].shape != model.gram.shape:
+            raise ValueError('the checkpoint has {} features, the model {}'.format(len(state['xy']), len(model.xy)))
+        model.__dict__.update(state, n_rows=n_rows, weight=weight)
+        return model
+
+    # method to write the state of the model as json, the previous checkpoint stays valid until the new one is written
+    def checkpoint(self, path):
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(temporary, path)
+
+    @classmethod
+    def restore(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
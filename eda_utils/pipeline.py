@@ -0,0 +1,234 @@
+"""
+Dependency tracked, cached runner for the scripts of a case study.
+
+The scripts of a case study (e.g. 1_EDA.py -> 2_feature_engineering.py -> 3_feature_selection.py) are run by hand,
+in order, and each of them recomputes everything. A Stage declares what a script reads (inputs: files or artifact
+directories), what it writes (outputs) and its parameters. run_pipeline:
+- finds the dependencies between the stages from their inputs and outputs (a stage reading the output of another
+  one runs after it)
+- fingerprints every stage once its dependencies are done: sha1 of the script, of the local modules it imports
+  (eda_utils/*.py, directly or through other local modules, found by parsing the imports), of the content of its
+  inputs and of its parameters. A stage runs only when the fingerprint differs from the last successful run or an
+  output is missing, so a stage whose inputs did not change is skipped even when an upstream stage was re-run
+- runs the stages which do not depend on each other at the same time (n_jobs)
+- remembers the fingerprints in a json state file
+
+The scripts are run in their own python process from the root of the repository (like when they are run by hand),
+with a non interactive matplotlib backend. The parameters reach the script through stage_params.
+
+Usage (pipeline.py of the case study):
+    stages = [Stage('eda', 'case_study1_advanced_house_price_prediction/1_EDA.py', inputs=[train]),
+              Stage('features', '.../2_feature_engineering.py', inputs=[train, test], outputs=[x_train]),
+              Stage('selection', '.../3_feature_selection.py', inputs=[x_train], params={'alpha': 0.005})]
+    run_pipeline(stages, state_path='.../pipeline_state.json', n_jobs=2)
+
+    # in 3_feature_selection.py, the defaults being used when the script is run by hand
+    params = stage_params({'alpha': 0.005}) """
+
+import ast
+import hashlib
+import inspect
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+PARAMS_ENV = 'EDA_STAGE_PARAMS'
+BLOCK_SIZE = 1 << 20
+
+
+class Stage:
+
+    # script: path of the script (run with python) or a callable taking the parameters as keyword arguments
+    # inputs / outputs: files or directories read / written by the stage
+    # params: json serializable parameters of the stage
+    # after: names of stages to run before this one, in addition to the ones found from inputs and outputs
+    def __init__(self, name, script, inputs=(), outputs=(), params=None, after=()):
+        self.name = name
+        self.script = script
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = dict(params or {})
+        self.after = list(after)
+
+
+# method to return the parameters given by run_pipeline to the running script, defaults when run by hand
+def stage_params(defaults=None):
+    params = dict(defaults or {})
+    params.update(json.loads(os.environ.get(PARAMS_ENV, '{}')))
+    return params
+
+
+# method to update a sha1 with the content of a file, or of all the files of a directory (and their names)
+def _update_digest(digest, path):
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode())
+                _update_digest(digest, file_path)
+    elif os.path.exists(path):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+                digest.update(block)
+    else:
+        digest.update(b'<missing>')
+
+
+# method to return the files of a module and of its parent packages found under root, [] for other modules
+def _module_files(name, root):
+    files = []
+    parts = name.split('.')
+    for i in range(1, len(parts) + 1):
+        base = os.path.join(root, *parts[:i])
+        if os.path.isfile(os.path.join(base, '__init__.py')):
+            files.append(os.path.normpath(os.path.join(base, '__init__.py')))
+        elif os.path.isfile(base + '.py'):
+            files.append(os.path.normpath(base + '.py'))
+        else:
+            break
+    return files
+
+
+# method to return the python files under root which a python file imports, directly or through other local
+# modules (the installed packages are left out), sorted
+def local_imports(path, root='.'):
+    found, todo = set(), [path]
+    while todo:
+        current = todo.pop()
+        try:
+            with open(current, 'rb') as f:
+                tree = ast.parse(f.read(), current)
+        except (OSError, SyntaxError, ValueError):
+            continue
+        for node in ast.walk(tree): # the imports inside functions too
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module] + ['{}.{}'.format(node.module, alias.name) for alias in node.names]
+            else:
+                continue
+            for name in names:
+                for module_path in _module_files(name, root):
+                    if module_path not in found:
+                        found.add(module_path)
+                        todo.append(module_path)
+    found.discard(os.path.normpath(path))
+    return sorted(found)
+
+
+# method to return the fingerprint of a stage: its script and the local modules it imports, the content of its inputs
+# and its parameters
+def fingerprint(stage):
+    digest = hashlib.sha1()
+    if callable(stage.script):
+        digest.update('{}.{}'.format(stage.script.__module__, stage.script.__qualname__).encode())
+        script_path = inspect.getsourcefile(stage.script)
+    else:
+        script_path = stage.script
+    if script_path:
+        _update_digest(digest, script_path)
+        for path in local_imports(script_path):
+            digest.update(path.encode())
+            _update_digest(digest, path)
+    for path in stage.inputs:
+        digest.update(path.encode())
+        _update_digest(digest, path)
+    digest.update(json.dumps(stage.params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+# method to return stage name -> names of the stages it depends on
+def dependencies(stages):
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError('stage names must be unique, got {}'.format(names))
+    producer = {}
+    for stage in stages:
+        for path in stage.outputs:
+            producer[os.path.normpath(path)] = stage.name
+    depends = {}
+    for stage in stages:
+        found = {producer[os.path.normpath(p)] for p in stage.inputs if os.path.normpath(p) in producer}
+        depends[stage.name] = (found | set(stage.after)) - {stage.name}
+    # check that there is no cycle (Kahn's algorithm)
+    remaining = {name: set(deps) for name, deps in depends.items()}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError('the stages {} depend on each other'.format(sorted(remaining)))
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return depends
+
+
+def _run_stage(stage):
+    if callable(stage.script):
+        stage.script(**stage.params)
+        return
+    env = dict(os.environ, MPLBACKEND='Agg', **{PARAMS_ENV: json.dumps(stage.params)})
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.getcwd(), env.get('PYTHONPATH')]))
+    completed = subprocess.run([sys.executable, stage.script], env=env)
+    if completed.returncode != 0:
+        raise RuntimeError('stage {!r} ({}) failed with exit code {}'.format(stage.name, stage.script,
+                                                                            completed.returncode))
+
+
+def _load_state(state_path):
+    if state_path and os.path.exists(state_path):
+        with open(state_path) as f:
+            return json.load(f)
+    return {}
+
+
+def _save_state(state, state_path):
+    if state_path:
+        with open(state_path + '.tmp', 'w') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(state_path + '.tmp', state_path)
+
+
+# method to run the stages whose fingerprint changed, in dependency order, n_jobs stages at the same time
+# - force: names of stages to run anyway
+# returns stage name -> 'ran' or 'cached'
+def run_pipeline(stages, state_path=None, n_jobs=1, force=(), verbose=True):
+    depends = dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    state = _load_state(state_path)
+    status, fingerprints = {}, {}
+    pending = set(by_name)
+    running = {}
+
+    def start_ready(pool):
+        for name in sorted(pending):
+            if depends[name] - set(status):
+                continue
+            pending.discard(name)
+            stage = by_name[name]
+            fingerprints[name] = fingerprint(stage)
+            outputs_exist = all(os.path.exists(path) for path in stage.outputs)
+            if name not in force and outputs_exist and state.get(name) == fingerprints[name]:
+                status[name] = 'cached'
+                if verbose:
+                    print('[{}] up to date'.format(name))
+                return start_ready(pool) # a skipped stage can make other stages ready
+            if verbose:
+                print('[{}] running {}'.format(name, stage.script if not callable(stage.script) else name))
+            running[pool.submit(_run_stage, stage)] = name
+
+    with ThreadPoolExecutor(max(1, n_jobs or 1)) as pool:
+        start_ready(pool)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                future.result() # a failed stage stops the pipeline, its fingerprint is not saved
+                status[name] = 'ran'
+                state[name] = fingerprints[name]
+                _save_state(state, state_path)
+            start_ready(pool)
+    return status
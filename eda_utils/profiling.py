@@ -0,0 +1,318 @@
+"""
+Incremental column profiling.
+
+Instead of re-running the whole profile_report() every time a dataset changes, the statistics of every column are
+kept as mergeable states (moments, quantile sketch, distinct count sketch, category counts, see sketches.py) and
+persisted as json next to the report. On the next run of profile_csv:
+- rows appended to the csv are read from the byte offset where the previous run stopped and folded into the states
+- new columns, and columns whose values changed, are profiled from scratch, the other columns are kept as they are
+- columns which are not in the file anymore are dropped
+
+Usage:
+    state = profile_csv('case_study7_fitbit/FitBit data.csv', state_path='case_study7_fitbit/profile_report.state.json')
+    state.summary() # one row of statistics per column, like DataFrame.describe().T
+    state.to_html('case_study7_fitbit/profile_summary.html') """
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+from eda_utils.chunked_reader import DEFAULT_CHUNKSIZE, read_csv_chunks, read_csv_header, read_tail_bytes
+from eda_utils.sketches import DistinctSketch, MomentState, QuantileSketch
+
+STATE_VERSION = 1
+TAIL_BYTES = 4096 # bytes before the last read offset used to check that the file was only appended to
+
+
+# method to hash a column into an order independent fingerprint (sum of the row hashes modulo 2**64)
+def _fingerprint(values):
+    if len(values) == 0:
+        return 0
+    return int(pd.util.hash_array(np.asarray(values)).sum(dtype='uint64'))
+
+
+def _combine_fingerprints(a, b):
+    return (a + b) % 2 ** 64
+
+
+class NumericColumnState:
+    kind = 'numeric'
+
+    def __init__(self):
+        self.n_missing = 0
+        self.n_infinite = 0
+        self.n_zeros = 0
+        self.fingerprint = 0
+        self.moments = MomentState()
+        self.quantiles = QuantileSketch()
+        self.distinct = DistinctSketch()
+
+    @staticmethod
+    def normalize(series):
+        return pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+    def update(self, series):
+        values = self.normalize(series)
+        self.fingerprint = _combine_fingerprints(self.fingerprint, _fingerprint(values))
+        missing = np.isnan(values)
+        infinite = np.isinf(values)
+        self.n_missing += int(missing.sum())
+        self.n_infinite += int(infinite.sum())
+        values = values[~(missing | infinite)]
+        self.n_zeros += int((values == 0).sum())
+        self.moments.update(values)
+        self.quantiles.update(values)
+        self.distinct.update(values)
+        return self
+
+    def merge(self, other):
+        self.n_missing += other.n_missing
+        self.n_infinite += other.n_infinite
+        self.n_zeros += other.n_zeros
+        self.fingerprint = _combine_fingerprints(self.fingerprint, other.fingerprint)
+        self.moments.merge(other.moments)
+        self.quantiles.merge(other.quantiles)
+        self.distinct.merge(other.distinct)
+        return self
+
+    def summary(self):
+        n = self.moments.n
+        q25, q50, q75 = self.quantiles.quantile([0.25, 0.5, 0.75]) if n else (np.nan,) * 3
+        return {'kind': self.kind, 'count': n, 'missing': self.n_missing, 'distinct': self.distinct.count(),
+                'mean': self.moments.mean if n else np.nan, 'std': self.moments.std,
+                'min': self.moments.min if n else np.nan, '25%': q25, '50%': q50, '75%': q75,
+                'max': self.moments.max if n else np.nan, 'skew': self.moments.skewness,
+                'kurtosis': self.moments.kurtosis, 'zeros': self.n_zeros, 'infinite': self.n_infinite}
+
+    def to_dict(self):
+        return {'kind': self.kind, 'n_missing': self.n_missing, 'n_infinite': self.n_infinite,
+                'n_zeros': self.n_zeros, 'fingerprint': str(self.fingerprint), 'moments': self.moments.to_dict(),
+                'quantiles': self.quantiles.to_dict(), 'distinct': self.distinct.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls()
+        state.n_missing = d['n_missing']
+        state.n_infinite = d['n_infinite']
+        state.n_zeros = d['n_zeros']
+        state.fingerprint = int(d['fingerprint'])
+        state.moments = MomentState.from_dict(d['moments'])
+        state.quantiles = QuantileSketch.from_dict(d['quantiles'])
+        state.distinct = DistinctSketch.from_dict(d['distinct'])
+        return state
+
+
+class CategoricalColumnState:
+    kind = 'categorical'
+
+    def __init__(self):
+        self.n_missing = 0
+        self.fingerprint = 0
+        self.counts = {} # category -> number of rows
+
+    @staticmethod
+    def normalize(series):
+        return series.astype('object').map(str).where(series.notnull(), None)
+
+    def update(self, series):
+        values = self.normalize(series)
+        self.fingerprint = _combine_fingerprints(self.fingerprint, _fingerprint(values.fillna('\0nan').to_numpy()))
+        self.n_missing += int(values.isnull().sum())
+        for category, count in values.value_counts(dropna=True).items():
+            self.counts[category] = self.counts.get(category, 0) + int(count)
+        return self
+
+    def merge(self, other):
+        self.n_missing += other.n_missing
+        self.fingerprint = _combine_fingerprints(self.fingerprint, other.fingerprint)
+        for category, count in other.counts.items():
+            self.counts[category] = self.counts.get(category, 0) + count
+        return self
+
+    def summary(self):
+        top = max(self.counts, key=self.counts.get) if self.counts else None
+        return {'kind': self.kind, 'count': sum(self.counts.values()), 'missing': self.n_missing,
+                'distinct': len(self.counts), 'top': top, 'freq': self.counts.get(top, np.nan)}
+
+    def to_dict(self):
+        return {'kind': self.kind, 'n_missing': self.n_missing, 'fingerprint': str(self.fingerprint),
+                'counts': self.counts}
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls()
+        state.n_missing = d['n_missing']
+        state.fingerprint = int(d['fingerprint'])
+        state.counts = dict(d['counts'])
+        return state
+
+
+COLUMN_STATES = {cls.kind: cls for cls in (NumericColumnState, CategoricalColumnState)}
+
+
+# method to pick the kind of state of a column from its dtype
+def column_state_for(series):
+    if is_numeric_dtype(series) and not is_bool_dtype(series):
+        return NumericColumnState()
+    return CategoricalColumnState()
+
+
+class ProfileState:
+
+    def __init__(self):
+        self.n_rows = 0
+        self.columns = {} # column name -> NumericColumnState / CategoricalColumnState
+        self.source = {} # where the rows come from, used to detect appended rows
+
+    # method to fold a chunk of rows into the states of the given columns (all the columns of the chunk by default)
+    def update(self, chunk, columns=None):
+        for column in (chunk.columns if columns is None else columns):
+            if column not in self.columns:
+                self.columns[column] = column_state_for(chunk[column])
+            self.columns[column].update(chunk[column])
+        return self
+
+    # method to merge the states of another profile (e.g. computed by another worker on other rows)
+    def merge(self, other):
+        self.n_rows += other.n_rows
+        for column, state in other.columns.items():
+            if column in self.columns:
+                self.columns[column].merge(state)
+            else:
+                self.columns[column] = state
+        return self
+
+    # method to return one row of statistics per column
+    def summary(self):
+        summary = pd.DataFrame.from_dict({column: state.summary() for column, state in self.columns.items()},
+                                         orient='index')
+        summary['missing %'] = summary['missing'] / self.n_rows * 100 if self.n_rows else np.nan
+        return summary
+
+    def to_html(self, path):
+        self.summary().to_html(path)
+
+    def to_dict(self):
+        return {'version': STATE_VERSION, 'n_rows': self.n_rows, 'source': self.source,
+                'columns': {column: state.to_dict() for column, state in self.columns.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        if d.get('version') != STATE_VERSION:
+            raise ValueError('unsupported profile state version: {}'.format(d.get('version')))
+        state = cls()
+        state.n_rows = d['n_rows']
+        state.source = d['source']
+        state.columns = {column: COLUMN_STATES[s['kind']].from_dict(s) for column, s in d['columns'].items()}
+        return state
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path) # never leave a half written state behind
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+# method to profile a DataFrame which is already in memory
+def profile_frame(df):
+    state = ProfileState()
+    state.n_rows = len(df)
+    return state.update(df)
+
+
+def _tail_hash(path, offset):
+    return hashlib.sha1(read_tail_bytes(path, offset, TAIL_BYTES)).hexdigest()
+
+
+# method to check that the csv still starts with exactly the rows profiled last time
+def _only_appended(path, header, source):
+    return (source.get('path') == os.path.abspath(path)
+            and source.get('header') == header
+            and os.path.getsize(path) >= source.get('offset', np.inf)
+            and _tail_hash(path, source['offset']) == source.get('tail'))
+
+
+# method to fingerprint the given columns over the first n_rows rows of the csv
+def _fingerprint_rows(path, state, columns, n_rows, chunksize, read_kwargs):
+    fingerprints = dict.fromkeys(columns, 0)
+    seen = 0
+    for chunk in read_csv_chunks(path, chunksize=chunksize, usecols=columns, **read_kwargs):
+        chunk = chunk.iloc[:max(0, n_rows - seen)]
+        seen += len(chunk)
+        for column in columns:
+            values = state.columns[column].normalize(chunk[column])
+            if isinstance(values, pd.Series):
+                values = values.fillna('\0nan').to_numpy()
+            fingerprints[column] = _combine_fingerprints(fingerprints[column], _fingerprint(values))
+        if seen >= n_rows:
+            break
+    return fingerprints, seen
+
+
+# method to profile a csv file, reusing the states persisted by a previous run whenever possible
+# - state_path: json file where the states are persisted, nothing is persisted when None
+# - recompute: columns to profile from scratch even if they look unchanged
+# - read_kwargs: passed to pandas.read_csv
+def profile_csv(path, state_path=None, chunksize=DEFAULT_CHUNKSIZE, recompute=(), **read_kwargs):
+    header = read_csv_header(path, **read_kwargs)
+    previous = ProfileState.load(state_path) if state_path and os.path.exists(state_path) else None
+    position = {}
+
+    if previous is not None and _only_appended(path, header, previous.source):
+        # fast path: the old rows are untouched, only the appended rows (and the forced columns) are read
+        state = previous
+        stale = [column for column in header if column in recompute or column not in state.columns]
+        kept = [column for column in header if column not in stale]
+        for column in stale:
+            state.columns.pop(column, None)
+        if stale:
+            fresh = ProfileState()
+            for chunk in read_csv_chunks(path, chunksize=chunksize, usecols=stale, **read_kwargs):
+                fresh.update(chunk)
+            state.columns.update(fresh.columns)
+        for chunk in read_csv_chunks(path, chunksize=chunksize, offset=state.source['offset'], usecols=kept or None,
+                                     position=position, **read_kwargs):
+            state.n_rows += len(chunk)
+            state.update(chunk, kept)
+    elif previous is not None:
+        # the file was rewritten (e.g. columns added or edited): keep the states of the columns whose values
+        # over the previously profiled rows did not change, and fold in the rows after them
+        state = previous
+        kept = [column for column in header if column in state.columns and column not in recompute]
+        fingerprints, seen = _fingerprint_rows(path, state, kept, state.n_rows, chunksize, read_kwargs)
+        if seen < state.n_rows:
+            kept = [] # rows were removed, nothing can be reused
+        kept = [column for column in kept if fingerprints[column] == state.columns[column].fingerprint]
+        state.columns = {column: state.columns[column] for column in kept}
+        stale = [column for column in header if column not in kept]
+        old_rows = state.n_rows if kept else 0
+        n_rows = 0
+        for chunk in read_csv_chunks(path, chunksize=chunksize, position=position, **read_kwargs):
+            new_rows = chunk.iloc[max(0, old_rows - n_rows):]
+            n_rows += len(chunk)
+            state.update(chunk, stale)
+            state.update(new_rows, kept)
+        state.n_rows = n_rows
+    else:
+        state = ProfileState()
+        for chunk in read_csv_chunks(path, chunksize=chunksize, position=position, **read_kwargs):
+            state.n_rows += len(chunk)
+            state.update(chunk)
+
+    if position:
+        state.source = {'path': os.path.abspath(path), 'header': header, 'offset': position['offset'],
+                        'tail': _tail_hash(path, position['offset'])}
+    state.columns = {column: state.columns[column] for column in header if column in state.columns}
+
+    if state_path:
+        state.save(state_path)
+    return state
@@ -0,0 +1,172 @@
+"""
+Rank correlations (Spearman and Kendall tau-b) for all the pairs of columns.
+
+DataFrame.corr(method='kendall' / 'spearman') sorts and ranks both columns again for every pair. Here:
+- every column is ranked once
+- Spearman is the Pearson correlation of the ranks, so it goes through the matrix product path of correlation.py
+  (pairs of columns with missing values are ranked again on their complete rows, to match DataFrame.corr exactly)
+- Kendall tau-b uses Knight's algorithm for every pair: sort the rows by (x, y), then count the discordant pairs as
+  the number of swaps of a merge sort of y. The merge sort is done level by level with numpy: at each level the
+  blocks are already sorted runs, a stable sort merges them in linear time and the swaps are the displacements of
+  the elements of the right blocks. O(n log n) per pair instead of O(n^2).
+- the pairs are spread over a process pool (n_jobs), the workers read the ranked matrix from one shared memory block
+  instead of receiving a copy of it
+
+Usage:
+    kendall_corr(df) # same as df.corr(method='kendall') on the numeric columns
+    kendall_corr(df, n_jobs=8)
+    spearman_corr(df) # same as df.corr(method='spearman') """
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from eda_utils.correlation import numeric_matrix, pearson_corr
+
+MISSING_RANK = -1
+
+
+# method to turn every column into dense integer ranks (0 for the smallest value, equal values share a rank),
+# missing values become MISSING_RANK
+def dense_ranks(values):
+    ranks = np.full(values.shape, MISSING_RANK, dtype='int64')
+    for j in range(values.shape[1]):
+        column = values[:, j]
+        valid = ~np.isnan(column)
+        ranks[valid, j] = np.unique(column[valid], return_inverse=True)[1]
+    return ranks
+
+
+# method to return the number of pairs of rows tied together, given the number of rows sharing each value
+def _tied_pairs(counts):
+    counts = counts.astype('int64')
+    return int((counts * (counts - 1) // 2).sum())
+
+
+# method to count the discordant pairs (inversions) of y, bottom-up merge sort done level by level
+def count_swaps(y):
+    n = y.size
+    if n < 2:
+        return 0
+    shift = int(y.max()).bit_length()
+    mask = (1 << shift) - 1
+    position = np.arange(n, dtype='int64')
+    values = y.astype('int64', copy=True)
+    swaps = 0
+    level = 0
+    while (1 << level) < n:
+        # blocks of 2**level sorted values, merged two by two: the key puts every pair of blocks in its own range
+        keys = ((position >> (level + 1)) << shift) | values
+        order = np.argsort(keys, kind='stable') # the blocks are sorted runs: this is a linear merge
+        is_right = (position >> level) & 1
+        # an element of a right block moves left by the number of elements of its left block greater than itself
+        swaps += int(position @ is_right - position @ is_right[order])
+        values = keys[order] & mask
+        level += 1
+    return swaps
+
+
+# method to compute Kendall tau-b of two columns of dense ranks (no missing value) with Knight's algorithm
+def kendall_tau_b(x, y):
+    n = x.size
+    if n < 2:
+        return np.nan
+    span = int(y.max()) + 1
+    keys = np.sort(x * span + y) # rows sorted by x, then by y inside the ties of x
+    n0 = n * (n - 1) // 2
+    n1 = _tied_pairs(np.bincount(x))
+    n2 = _tied_pairs(np.bincount(y))
+    runs = np.diff(np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1, [n]]))
+    n3 = _tied_pairs(runs) # rows tied on both x and y
+    denominator = (n0 - n1) * (n0 - n2)
+    if denominator == 0:
+        return np.nan
+    swaps = count_swaps(keys % span)
+    return (n0 - n1 - n2 + n3 - 2 * swaps) / np.sqrt(float(denominator))
+
+
+# method to compute Kendall tau-b of two columns of the rank matrix over their complete rows
+def _kendall_pair(ranks, i, j, min_periods):
+    x, y = ranks[:, i], ranks[:, j]
+    valid = (x != MISSING_RANK) & (y != MISSING_RANK)
+    if valid.sum() < max(min_periods, 2):
+        return np.nan
+    if not valid.all():
+        x, y = x[valid], y[valid]
+    return kendall_tau_b(x, y)
+
+
+# the rank matrix of a worker process, attached to the shared memory block once per process
+_shared = {}
+
+
+def _attach(name, shape):
+    memory = shared_memory.SharedMemory(name=name)
+    _shared['memory'] = memory # keep a reference, the array is a view on the buffer
+    _shared['ranks'] = np.ndarray(shape, dtype='int64', buffer=memory.buf)
+
+
+def _kendall_pairs(pairs, min_periods):
+    ranks = _shared['ranks']
+    return [(i, j, _kendall_pair(ranks, i, j, min_periods)) for i, j in pairs]
+
+
+def _split(items, n_parts):
+    size = max(1, -(-len(items) // n_parts))
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+# method to compute the Kendall tau-b correlation matrix of the numeric columns of a DataFrame (or of a 2D array)
+# - n_jobs: number of worker processes, 1 to stay in the current process, None for all the cpus
+# - min_periods: minimum number of pairwise complete rows to have a result, like DataFrame.corr
+def kendall_corr(data, n_jobs=1, min_periods=1):
+    values, columns = numeric_matrix(data)
+    n_cols = values.shape[1]
+    ranks = dense_ranks(values)
+    pairs = [(i, j) for i in range(n_cols) for j in range(i + 1, n_cols)]
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(1, len(pairs)))
+
+    if n_jobs == 1:
+        results = [(i, j, _kendall_pair(ranks, i, j, min_periods)) for i, j in pairs]
+    else:
+        memory = shared_memory.SharedMemory(create=True, size=max(1, ranks.nbytes))
+        try:
+            np.ndarray(ranks.shape, dtype='int64', buffer=memory.buf)[:] = ranks
+            with ProcessPoolExecutor(n_jobs, initializer=_attach, initargs=(memory.name, ranks.shape)) as pool:
+                # a few tasks per worker balances the load without sending one message per pair
+                futures = [pool.submit(_kendall_pairs, part, min_periods) for part in _split(pairs, n_jobs * 4)]
+                results = [result for future in futures for result in future.result()]
+        finally:
+            memory.close()
+            memory.unlink()
+
+    result = np.eye(n_cols) # same as pandas: the diagonal is 1, even for a constant column
+    for i, j, tau in results:
+        result[i, j] = result[j, i] = tau
+    return pd.DataFrame(result, index=columns, columns=columns)
+
+
+# method to compute the Spearman correlation matrix of the numeric columns of a DataFrame (or of a 2D array)
+# - dtype, chunksize: passed to pearson_corr for the complete columns
+def spearman_corr(data, min_periods=1, dtype='float64', chunksize=None):
+    values, columns = numeric_matrix(data)
+    ranks = pd.DataFrame(values).rank(method='average').to_numpy()
+    result = pearson_corr(ranks, dtype=dtype, chunksize=chunksize, min_periods=min_periods).to_numpy(copy=True)
+
+    # ranks of the columns with missing values only hold on their own rows: rank such pairs again on their common rows
+    incomplete = np.flatnonzero(np.isnan(values).any(axis=0))
+    for i in incomplete:
+        for j in range(values.shape[1]):
+            if j == i or (j in incomplete and j < i):
+                continue
+            valid = ~np.isnan(values[:, i]) & ~np.isnan(values[:, j])
+            if valid.sum() < max(min_periods, 2):
+                rho = np.nan
+            else:
+                pair = pd.DataFrame(values[valid][:, [i, j]]).rank(method='average').to_numpy()
+                rho = pearson_corr(pair).iloc[0, 1]
+            result[i, j] = result[j, i] = rho
+    return pd.DataFrame(result, index=columns, columns=columns)
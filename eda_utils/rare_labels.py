@@ -0,0 +1,102 @@
+"""
+Rare label encoding on integer codes.
+
+2_feature_engineering.py groups the rare labels of every categorical feature with a groupby().count() followed by
+np.where(dataset[feature].isin(frequent), ...), i.e. string comparisons over every row, one feature at a time.
+RareLabelEncoder instead:
+- factorizes every column once into integer codes (NaN -> -1)
+- counts all the labels of all the columns with a single np.bincount, the codes of column j being shifted by the
+  number of labels of the columns before it
+- builds one small lookup array (label code -> new code, the rare labels all pointing to the rare code) and remaps
+  every column with lookup[codes], no string is compared or copied
+
+The output columns are categoricals (codes + the list of kept labels) by default, or plain labels with
+output='object' (same values as the np.where of the script).
+
+Usage:
+    encoder = RareLabelEncoder(threshold=0.01, rare_label='Rare_var')
+    dataset[categorical_features] = encoder.fit_transform(dataset[categorical_features], output='object')
+    encoder.transform(test[categorical_features]) # labels unseen or rare in the training data become rare """
+
+import numpy as np
+import pandas as pd
+
+
+class RareLabelEncoder:
+
+    # threshold: labels present in this fraction of the rows or less are rare
+    # missing: 'rare' to put the missing values in the rare label (like the script), 'keep' to keep them missing
+    def __init__(self, threshold=0.01, rare_label='Rare', missing='rare'):
+        if missing not in ('rare', 'keep'):
+            raise ValueError("missing must be 'rare' or 'keep', got {!r}".format(missing))
+        self.threshold = threshold
+        self.rare_label = rare_label
+        self.missing = missing
+        self.frequent_labels = None # column -> list of the labels kept, in order of first appearance
+
+    # method to factorize all the columns and count the labels of all of them with one bincount
+    @staticmethod
+    def _factorize(frame):
+        codes, uniques = [], []
+        for column in frame.columns:
+            column_codes, column_uniques = pd.factorize(frame[column])
+            codes.append(column_codes)
+            uniques.append(column_uniques)
+        sizes = np.array([len(u) for u in uniques], dtype='int64')
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        return np.column_stack(codes) if codes else np.empty((len(frame), 0), 'int64'), uniques, sizes, offsets
+
+    # method to map factorized codes to (new codes, kept labels), the new code of the rare label being len(kept)
+    def _remap(self, codes, uniques, sizes, offsets, counts, n_rows):
+        n_rows = max(n_rows, 1)
+        frequent = counts / n_rows > self.threshold
+        # new code of every label: its rank among the kept labels of its column, or the rare code
+        column_of_label = np.repeat(np.arange(len(sizes)), sizes)
+        n_kept = np.bincount(column_of_label, weights=frequent, minlength=len(sizes)).astype('int64')
+        first_rank = np.concatenate([[0], np.cumsum(n_kept)[:-1]]).astype('int64')
+        rank = np.cumsum(frequent) - 1
+        lookup = np.where(frequent, rank - first_rank[column_of_label], n_kept[column_of_label]).astype('int64')
+
+        valid = codes >= 0
+        new_codes = np.where(valid, lookup[np.where(valid, codes + offsets, 0)], -1)
+        rare_missing = n_kept if self.missing == 'rare' else np.full(len(sizes), -1)
+        new_codes = np.where(valid, new_codes, rare_missing)
+        kept = [list(u[frequent[o:o + s]]) for u, o, s in zip(uniques, offsets, sizes)]
+        return new_codes, kept
+
+    # method to build the output frame from the new codes
+    def _output(self, frame, new_codes, kept, output):
+        result = {}
+        for j, column in enumerate(frame.columns):
+            categories = kept[j] + [self.rare_label]
+            result[column] = pd.Categorical.from_codes(new_codes[:, j], categories=pd.Index(categories, dtype='object'))
+            if output == 'object':
+                result[column] = np.asarray(result[column], dtype='object')
+        return pd.DataFrame(result, index=frame.index)
+
+    def fit(self, frame):
+        self.fit_transform(frame)
+        return self
+
+    # method to learn the frequent labels and encode the same data in one pass
+    # - output: 'category' (default) or 'object'
+    def fit_transform(self, frame, output='category'):
+        codes, uniques, sizes, offsets = self._factorize(frame)
+        valid = codes >= 0
+        counts = np.bincount((codes + offsets)[valid], minlength=int(sizes.sum()))
+        new_codes, kept = self._remap(codes, uniques, sizes, offsets, counts, len(frame))
+        self.frequent_labels = dict(zip(frame.columns, kept))
+        return self._output(frame, new_codes, kept, output)
+
+    # method to encode new data with the labels learnt by fit, labels not kept during fit are rare
+    def transform(self, frame, output='category'):
+        if self.frequent_labels is None:
+            raise ValueError('RareLabelEncoder is not fitted yet, call fit first')
+        codes = []
+        for column in frame.columns:
+            kept = self.frequent_labels[column]
+            column_codes = pd.Categorical(frame[column], categories=pd.Index(kept, dtype='object')).codes.astype('int64')
+            rare = len(kept) if self.missing == 'rare' else np.where(frame[column].isnull(), -1, len(kept))
+            codes.append(np.where(column_codes < 0, rare, column_codes))
+        new_codes = np.column_stack(codes) if codes else np.empty((len(frame), 0), 'int64')
+        return self._output(frame, new_codes, [self.frequent_labels[c] for c in frame.columns], output)
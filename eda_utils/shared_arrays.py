@@ -0,0 +1,51 @@
+"""
+Numpy arrays shared with the worker processes of a ProcessPoolExecutor.
+
+Sending a matrix to every task pickles and copies it once per task. share() copies the arrays once into shared
+memory blocks, the workers attach to them once (initializer=attach) and read them without any copy.
+
+Usage:
+    with share({'X': X, 'y': y}) as spec:
+        with ProcessPoolExecutor(n_jobs, initializer=attach, initargs=(spec,)) as pool:
+            pool.map(task, ...) # task reads shared('X') and shared('y') """
+
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# arrays of the current worker process: name -> (shared memory block, array)
+_attached = {}
+
+
+# context manager copying the arrays into shared memory, gives the spec to pass to attach,
+# the blocks are released at the end
+@contextmanager
+def share(arrays):
+    blocks, spec = [], {}
+    try:
+        for name, values in arrays.items():
+            values = np.asarray(values)
+            memory = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+            blocks.append(memory)
+            np.ndarray(values.shape, dtype=values.dtype, buffer=memory.buf)[...] = values
+            spec[name] = (memory.name, values.shape, values.dtype.str)
+        yield spec
+    finally:
+        for memory in blocks:
+            memory.close()
+            memory.unlink()
+
+
+# method to attach the arrays of a spec in a worker process (initializer of the pool)
+def attach(spec):
+    for name, (memory_name, shape, dtype) in spec.items():
+        memory = shared_memory.SharedMemory(name=memory_name)
+        array = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+        array.flags.writeable = False
+        _attached[name] = (memory, array) # keep a reference to the block, the array is a view on its buffer
+
+
+# method to return an array attached by attach
+def shared(name):
+    return _attached[name][1]
@@ -0,0 +1,262 @@
+"""
+Mergeable statistic states.
+
+Every state here can be:
+- updated with a new batch of values (a chunk of a column)
+- merged with another state of the same kind (chunks read by another worker, rows appended later)
+- saved to / loaded from a plain dict so that it can be persisted as json
+
+States:
+- MomentState: count, sum, min, max and the central moments up to the 4th order (mean, variance, skewness, kurtosis)
+- QuantileSketch: log-bucketed histogram with a bounded relative error, gives quantiles and histograms
+- DistinctSketch: HyperLogLog estimate of the number of distinct values """
+
+import base64
+
+import numpy as np
+import pandas as pd
+
+
+class MomentState:
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0 # sums of the powers of the deviations from the mean
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    # method to fold a batch of (non missing) values into the state
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        if values.size == 0:
+            return self
+        batch = MomentState()
+        batch.n = values.size
+        batch.mean = values.mean()
+        dev = values - batch.mean
+        dev2 = dev * dev
+        batch.m2 = dev2.sum()
+        batch.m3 = (dev2 * dev).sum()
+        batch.m4 = (dev2 * dev2).sum()
+        batch.min = values.min()
+        batch.max = values.max()
+        return self.merge(batch)
+
+    # method to merge another state into this one (pairwise update formulas for the central moments)
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+        n_a, n_b = self.n, other.n
+        n = n_a + n_b
+        delta = other.mean - self.mean
+        delta_n = delta / n
+        m2 = self.m2 + other.m2 + delta * delta_n * n_a * n_b
+        m3 = (self.m3 + other.m3
+              + delta * delta_n * delta_n * n_a * n_b * (n_a - n_b)
+              + 3.0 * delta_n * (n_a * other.m2 - n_b * self.m2))
+        m4 = (self.m4 + other.m4
+              + delta * delta_n ** 3 * n_a * n_b * (n_a * n_a - n_a * n_b + n_b * n_b)
+              + 6.0 * delta_n * delta_n * (n_a * n_a * other.m2 + n_b * n_b * self.m2)
+              + 4.0 * delta_n * (n_a * other.m3 - n_b * self.m3))
+        self.n = n
+        self.mean = self.mean + delta_n * n_b
+        self.m2, self.m3, self.m4 = m2, m3, m4
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def sum(self):
+        return self.mean * self.n
+
+    # sample variance, same convention as pandas (ddof=1)
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    # sample skewness, same (bias corrected) estimator as pandas
+    @property
+    def skewness(self):
+        n = self.n
+        if n < 3 or self.m2 == 0:
+            return np.nan
+        g1 = np.sqrt(n) * self.m3 / self.m2 ** 1.5
+        return g1 * np.sqrt(n * (n - 1)) / (n - 2)
+
+    # sample excess kurtosis, same (bias corrected) estimator as pandas
+    @property
+    def kurtosis(self):
+        n = self.n
+        if n < 4 or self.m2 == 0:
+            return np.nan
+        g2 = n * self.m4 / (self.m2 * self.m2) - 3.0
+        return (n - 1) / ((n - 2) * (n - 3)) * ((n + 1) * g2 + 6.0)
+
+    def to_dict(self):
+        return {'n': int(self.n), 'mean': float(self.mean), 'm2': float(self.m2), 'm3': float(self.m3),
+                'm4': float(self.m4), 'min': float(self.min), 'max': float(self.max)}
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls()
+        state.__dict__.update(d)
+        return state
+
+
+class QuantileSketch:
+
+    # relative_accuracy: any quantile returned is within this relative error of an actual value of the data
+    def __init__(self, relative_accuracy=0.01, min_value=1e-9):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value # absolute values below this are counted as zeros
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.positive = {} # bucket key -> count
+        self.negative = {}
+        self.zeros = 0
+
+    @property
+    def n(self):
+        return self.zeros + sum(self.positive.values()) + sum(self.negative.values())
+
+    def _keys(self, values):
+        return np.ceil(np.log(values) / self._log_gamma).astype('int64')
+
+    @staticmethod
+    def _add_counts(buckets, keys):
+        keys, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            buckets[key] = buckets.get(key, 0) + count
+
+    # method to fold a batch of (non missing) values into the sketch
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        if values.size == 0:
+            return self
+        magnitude = np.abs(values)
+        small = magnitude < self.min_value
+        self.zeros += int(small.sum())
+        self._add_counts(self.positive, self._keys(values[(values > 0) & ~small]))
+        self._add_counts(self.negative, self._keys(-values[(values < 0) & ~small]))
+        return self
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError('cannot merge quantile sketches with different relative accuracies')
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        self.zeros += other.zeros
+        return self
+
+    # method to return the sketch as sorted arrays of bucket values and counts
+    def buckets(self):
+        neg_keys = np.array(sorted(self.negative, reverse=True), dtype='int64')
+        pos_keys = np.array(sorted(self.positive), dtype='int64')
+        values = np.concatenate([
+            -2 * self.gamma ** neg_keys.astype('float64') / (self.gamma + 1),
+            np.zeros(1 if self.zeros else 0),
+            2 * self.gamma ** pos_keys.astype('float64') / (self.gamma + 1),
+        ])
+        counts = np.concatenate([
+            np.array([self.negative[k] for k in neg_keys.tolist()], dtype='int64'),
+            np.array([self.zeros] if self.zeros else [], dtype='int64'),
+            np.array([self.positive[k] for k in pos_keys.tolist()], dtype='int64'),
+        ])
+        return values, counts
+
+    # method to return one quantile (q in [0, 1]) or an array of quantiles
+    def quantile(self, q):
+        values, counts = self.buckets()
+        q = np.asarray(q, dtype='float64')
+        if counts.size == 0:
+            return np.full(q.shape, np.nan) if q.ndim else np.nan
+        rank = q * (counts.sum() - 1)
+        idx = np.searchsorted(np.cumsum(counts), rank, side='right')
+        result = values[np.minimum(idx, values.size - 1)]
+        return result if q.ndim else float(result)
+
+    # method to return an approximate histogram (counts per bin) of the values seen by the sketch
+    def histogram(self, bins=10, range=None):
+        values, counts = self.buckets()
+        return np.histogram(values, bins=bins, range=range, weights=counts)
+
+    def to_dict(self):
+        return {'relative_accuracy': self.relative_accuracy, 'min_value': self.min_value, 'zeros': int(self.zeros),
+                'positive': {str(k): int(v) for k, v in self.positive.items()},
+                'negative': {str(k): int(v) for k, v in self.negative.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d['relative_accuracy'], d['min_value'])
+        sketch.zeros = d['zeros']
+        sketch.positive = {int(k): v for k, v in d['positive'].items()}
+        sketch.negative = {int(k): v for k, v in d['negative'].items()}
+        return sketch
+
+
+# method to count the leading zero bits of an array of uint64 (binary search over the bit positions)
+def _leading_zeros(w):
+    w = w.astype('uint64')
+    zeros = np.zeros(w.shape, dtype='uint8')
+    for shift in (32, 16, 8, 4, 2, 1):
+        empty = (w >> np.uint64(64 - shift)) == 0
+        zeros[empty] += shift
+        w = np.where(empty, w << np.uint64(shift), w)
+    zeros[w == 0] = 64
+    return zeros
+
+
+class DistinctSketch:
+
+    # precision: 2**precision registers, the standard error of the estimate is about 1.04 / sqrt(2**precision)
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype='uint8')
+
+    # method to fold a batch of values (any dtype) into the sketch
+    def update(self, values):
+        values = np.asarray(values)
+        if values.size == 0:
+            return self
+        hashes = pd.util.hash_array(values)
+        p = np.uint64(self.precision)
+        index = (hashes >> np.uint64(64 - self.precision)).astype('int64')
+        rank = np.minimum(_leading_zeros(hashes << p) + 1, 64 - self.precision + 1).astype('uint8')
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('cannot merge distinct sketches with different precisions')
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    # estimated number of distinct values
+    def count(self):
+        m = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype('float64'))
+        empty = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and empty:
+            estimate = m * np.log(m / empty) # small range correction (linear counting)
+        return int(round(estimate))
+
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': base64.b64encode(self.registers.tobytes()).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d['precision'])
+        sketch.registers = np.frombuffer(base64.b64decode(d['registers']), dtype='uint8').copy()
+        return sketch
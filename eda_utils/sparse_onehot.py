@@ -0,0 +1,133 @@
+"""
+One-hot encoding into scipy.sparse CSR matrices, with a vocabulary learnt once and saved as json.
+
+black_friday.py one-hot encodes City_Category with pd.get_dummies and concatenates the dense result, the car price
+notebook does the same for every object column. For high cardinality columns (Product_ID, zomato locations or
+cuisines) the dense dummies are almost all zeros and do not fit in memory. SparseOneHotEncoder:
+- learns the categories of every column once (fit), sorted like pd.get_dummies; the vocabulary is saved to / loaded
+  from json so that new data is encoded with the same columns
+- encodes every column into codes with one lookup (pd.Categorical on the vocabulary) and builds the CSR matrix
+  directly from them: every row has one non zero value per column, so the column indices are the codes shifted by
+  the number of categories of the columns before, and no coordinate list is sorted
+- unknown categories (and missing values) get an all zero row for their column (handle_unknown='ignore'), or raise
+  (handle_unknown='error')
+- drop_first drops the first category of every column like pd.get_dummies(drop_first=True)
+- passthrough numeric columns can be put in front of the one-hot columns, in the same sparse matrix, which then goes
+  to StandardScaler(with_mean=False), MaxAbsScaler or a linear model without ever being dense
+
+Usage:
+    encoder = SparseOneHotEncoder(handle_unknown='ignore').fit(train[['Product_ID', 'City_Category']])
+    X_train = encoder.transform(train[['Product_ID', 'City_Category']], passthrough=train[['Age', 'Occupation']])
+    encoder.feature_names(passthrough=['Age', 'Occupation']) # names of the columns of X_train
+    encoder.save('onehot_vocabulary.json')
+    SparseOneHotEncoder.load('onehot_vocabulary.json').transform(test[['Product_ID', 'City_Category']]) """
+
+import json
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class SparseOneHotEncoder:
+
+    # drop_first: drop the first category of every column (like pd.get_dummies(drop_first=True))
+    # handle_unknown: 'ignore' (all zero row for the column) or 'error' for the categories not seen by fit
+    # dtype: dtype of the values of the matrix
+    def __init__(self, drop_first=False, handle_unknown='ignore', dtype='float64'):
+        if handle_unknown not in ('ignore', 'error'):
+            raise ValueError("handle_unknown must be 'ignore' or 'error', got {!r}".format(handle_unknown))
+        self.drop_first = drop_first
+        self.handle_unknown = handle_unknown
+        self.dtype = dtype
+        self.vocabulary = None # column -> list of its categories, sorted
+
+    def fit(self, frame):
+        self.vocabulary = {}
+        for column in frame.columns:
+            values = frame[column]
+            # the categories seen in the rows only: a categorical may declare more (e.g. the test ids of concat_frames)
+            categories = values.cat.remove_unused_categories().cat.categories \
+                if isinstance(values.dtype, pd.CategoricalDtype) else pd.Index(values.dropna().unique())
+            self.vocabulary[column] = [c.item() if isinstance(c, np.generic) else c
+                                       for c in categories.sort_values()]
+        return self
+
+    # method to return the number of output columns of every encoded column
+    def _widths(self):
+        return np.array([len(categories) - int(self.drop_first and len(categories) > 0)
+                         for categories in self.vocabulary.values()], dtype='int64')
+
+    # method to encode the columns into a CSR matrix, passthrough: numeric columns put in front of the one-hot columns
+    def transform(self, frame, passthrough=None):
+        if self.vocabulary is None:
+            raise ValueError('SparseOneHotEncoder is not fitted yet, call fit first')
+        missing = [column for column in self.vocabulary if column not in frame.columns]
+        if missing:
+            raise KeyError('columns {} were fitted but are not in the frame'.format(missing))
+        n_rows = len(frame)
+        widths = self._widths()
+        offsets = np.concatenate([[0], np.cumsum(widths)[:-1]]).astype('int64')
+        codes = np.empty((n_rows, len(self.vocabulary)), dtype='int64')
+        for j, (column, categories) in enumerate(self.vocabulary.items()):
+            column_codes = pd.Categorical(frame[column], categories=categories).codes.astype('int64')
+            if self.handle_unknown == 'error':
+                unknown = (column_codes < 0) & frame[column].notna().to_numpy()
+                if unknown.any():
+                    raise ValueError('unknown categories in {!r}: {}'.format(
+                        column, list(pd.unique(frame[column].to_numpy()[unknown])[:5])))
+            if self.drop_first:
+                column_codes -= 1 # the first category becomes -1, like a missing value
+            codes[:, j] = np.where(column_codes >= 0, column_codes + offsets[j], -1)
+
+        # CSR built row by row: the valid codes of a row, in column order, are already its sorted column indices
+        valid = codes >= 0
+        indptr = np.concatenate([[0], np.cumsum(valid.sum(axis=1))]).astype('int64')
+        one_hot = sparse.csr_matrix((np.ones(int(indptr[-1]), dtype=self.dtype), codes[valid], indptr),
+                                    shape=(n_rows, int(widths.sum())))
+        if passthrough is None:
+            return one_hot
+        numeric = sparse.csr_matrix(np.asarray(passthrough, dtype=self.dtype).reshape(n_rows, -1))
+        return sparse.hstack([numeric, one_hot], format='csr')
+
+    def fit_transform(self, frame, passthrough=None):
+        return self.fit(frame).transform(frame, passthrough)
+
+    # method to return the names of the output columns: <column>_<category> like pd.get_dummies, or the category
+    # alone with prefix=False; the passthrough columns come first
+    def feature_names(self, prefix=True, passthrough=()):
+        names = list(passthrough)
+        for column, categories in self.vocabulary.items():
+            kept = categories[1:] if self.drop_first else categories
+            names += ['{}_{}'.format(column, c) if prefix else c for c in kept]
+        return names
+
+    # method to return the encoded columns as a DataFrame, for the code written for the frames of pd.get_dummies
+    # - sparse: columns of pd.SparseDtype, else dense columns (for a few columns, as some DataFrame methods do not
+    #   support frames mixing sparse and dense columns)
+    def transform_frame(self, frame, prefix=True, sparse=True):
+        if not sparse:
+            return pd.DataFrame(self.transform(frame).toarray(), index=frame.index, columns=self.feature_names(prefix))
+        matrix = self.transform(frame).tocsc()
+        # one SparseArray per column (fill value 0), DataFrame.sparse.from_spmatrix fills with NaN in recent pandas
+        columns = [pd.arrays.SparseArray.from_spmatrix(matrix[:, [j]]) for j in range(matrix.shape[1])]
+        return pd.DataFrame(dict(zip(self.feature_names(prefix), columns)), index=frame.index)
+
+    def to_dict(self):
+        return {'drop_first': self.drop_first, 'handle_unknown': self.handle_unknown, 'dtype': self.dtype,
+                'vocabulary': self.vocabulary}
+
+    @classmethod
+    def from_dict(cls, d):
+        encoder = cls(drop_first=d['drop_first'], handle_unknown=d['handle_unknown'], dtype=d['dtype'])
+        encoder.vocabulary = dict(d['vocabulary'])
+        return encoder
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
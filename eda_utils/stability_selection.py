@@ -0,0 +1,134 @@
+"""
+Stability selection (Meinshausen and Buhlmann) with randomized Lasso fits run in parallel.
+
+A single Lasso fit decides which features survive, a different sample of rows could keep different ones.
+StabilitySelector fits many randomized Lassos, each one on a random half of the rows and with every feature scaled
+by a random weight in [weakness, 1], over a grid of alphas, and keeps the features selected in at least `threshold`
+of the fits for some alpha.
+- the fits are independent: they are spread over a process pool (n_jobs), the workers read X and y from one shared
+  memory copy (see shared_arrays.py) and send back small count matrices (alphas x features)
+- every fit is a warm started, screened path of lasso_path.py
+- the counts are added up as the batches come back (iter_fit yields after each batch), so the selection frequencies
+  can be looked at before all the fits are done
+- the random numbers of every fit come from its own seed, the result does not depend on n_jobs
+
+Usage:
+    selector = StabilitySelector(n_resamples=200, n_jobs=None).fit(X_train, y_train)
+    selector.stability_scores_ # highest selection frequency of every feature over the alphas
+    selector.selected_features() # features with a score of at least threshold
+
+    for partial in StabilitySelector(n_resamples=1000).iter_fit(X_train, y_train):
+        print(partial.n_fits_, list(partial.selected_features())) """
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from eda_utils.lasso_path import alpha_grid, gram_stats, screened_path
+from eda_utils.shared_arrays import attach, share, shared
+
+
+# method to return the number of times every feature is selected at every alpha, over the fits of some seeds
+def _count_selections(X, y, seeds, alphas, sample_fraction, weakness):
+    counts = np.zeros((len(alphas), X.shape[1]), dtype='int64')
+    n_sample = max(2, int(sample_fraction * len(y)))
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        rows = np.sort(rng.choice(len(y), n_sample, replace=False))
+        weights = rng.uniform(weakness, 1.0, X.shape[1])
+        _, _, Xc, yc, gram, xy = gram_stats(X[rows] * weights, y[rows])
+        coefs, _ = screened_path(Xc, yc, gram, xy, alphas)
+        counts += coefs != 0
+    return counts
+
+
+def _count_selections_shared(seeds, alphas, sample_fraction, weakness):
+    return _count_selections(shared('X'), shared('y'), seeds, alphas, sample_fraction, weakness)
+
+
+class StabilitySelector:
+
+    # n_resamples: number of randomized Lasso fits
+    # sample_fraction: fraction of the rows of every fit
+    # weakness: the features are scaled by a random weight in [weakness, 1] (1: no randomization of the penalty)
+    # alphas: grid of alphas, else n_alphas from the largest useful alpha down to eps times it
+    # threshold: minimum selection frequency of a selected feature
+    # n_jobs: number of worker processes, 1 to stay in the current process, None for all the cpus
+    # batch_size: number of fits per task, the frequencies are updated after each batch
+    def __init__(self, n_resamples=100, sample_fraction=0.5, weakness=0.5, alphas=None, n_alphas=10, eps=0.05,
+                 threshold=0.6, n_jobs=1, batch_size=10, random_state=0):
+        if not 0 < weakness <= 1:
+            raise ValueError('weakness must be in (0, 1], got {!r}'.format(weakness))
+        self.n_resamples = n_resamples
+        self.sample_fraction = sample_fraction
+        self.weakness = weakness
+        self.alphas = alphas
+        self.n_alphas = n_alphas
+        self.eps = eps
+        self.threshold = threshold
+        self.n_jobs = n_jobs
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.alphas_ = None
+        self.counts_ = None # alphas x features, number of fits which selected the feature
+        self.n_fits_ = 0
+
+    @property
+    def frequencies_(self):
+        return self.counts_ / max(self.n_fits_, 1)
+
+    @property
+    def stability_scores_(self):
+        return self.frequencies_.max(axis=0).sort_values(ascending=False)
+
+    # method to return the features selected in at least threshold of the fits for some alpha
+    def selected_features(self, threshold=None):
+        threshold = self.threshold if threshold is None else threshold
+        scores = self.frequencies_.max(axis=0)
+        return scores.index[scores.to_numpy() >= threshold]
+
+    def fit(self, X, y):
+        for _ in self.iter_fit(X, y):
+            pass
+        return self
+
+    # generator running the fits, yields the selector each time a batch of fits has been added to the counts
+    def iter_fit(self, X, y):
+        columns = X.columns if isinstance(X, pd.DataFrame) else pd.RangeIndex(np.shape(X)[1])
+        X = np.asarray(X, dtype='float64')
+        y = np.asarray(y, dtype='float64').ravel()
+        if self.alphas is not None:
+            alphas = np.sort(np.asarray(self.alphas, dtype='float64'))[::-1]
+        else:
+            alphas = alpha_grid(gram_stats(X, y)[5], n_alphas=self.n_alphas, eps=self.eps)
+        self.alphas_ = alphas
+        self.counts_ = pd.DataFrame(0, index=pd.Index(alphas, name='alpha'), columns=columns)
+        self.n_fits_ = 0
+
+        seeds = np.random.SeedSequence(self.random_state).spawn(self.n_resamples)
+        batches = [seeds[start:start + self.batch_size] for start in range(0, len(seeds), self.batch_size)]
+        args = (alphas, self.sample_fraction, self.weakness)
+        n_jobs = min(self.n_jobs or os.cpu_count() or 1, max(1, len(batches)))
+        if n_jobs == 1:
+            for batch in batches:
+                self._add(_count_selections(X, y, batch, *args), len(batch))
+                yield self
+            return
+        with share({'X': X, 'y': y}) as spec:
+            pool = ProcessPoolExecutor(n_jobs, initializer=attach, initargs=(spec,))
+            try:
+                running = {pool.submit(_count_selections_shared, batch, *args): len(batch) for batch in batches}
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._add(future.result(), running.pop(future))
+                    yield self
+            finally:
+                # the consumer may stop iterating early: the fits not started yet are cancelled, not waited for
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def _add(self, counts, n_fits):
+        self.counts_ += counts
+        self.n_fits_ += n_fits
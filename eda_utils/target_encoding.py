@@ -0,0 +1,140 @@
+"""
+Target encoding of many categorical columns at once.
+
+2_feature_engineering.py maps the labels of each categorical feature to integers ordered by
+groupby([feature])['SalePrice'].mean().sort_values(), one feature at a time and on the full data, so the encoding of
+a row has seen its own target (leakage). TargetEncoder:
+- factorizes every column once, the codes of column j being shifted by the number of labels of the columns before it
+- gets the target sum and the row count of every label of every column with two np.bincount calls
+- encodes with kind='ordered' (rank of the label by target mean, like the script), 'mean' (target mean of the label)
+  or 'smoothed' (mean pulled towards the global mean: (sum + smoothing * global_mean) / (count + smoothing))
+- with n_folds, fit_transform is out of fold: the rows of fold k are encoded with the statistics of the other folds.
+  Only for 'mean' and 'smoothed': every fold would rank the labels its own way with 'ordered' (the same rank meaning
+  a different label from one fold to the next), so 'ordered' is always ranked on all the rows. The statistics of all
+  the folds come out of a single bincount (fold id x label), the statistics without fold k are the totals minus
+  fold k, and the folds are encoded in parallel (threads sharing the code matrix)
+
+Labels never seen during fit are encoded as the global mean ('mean', 'smoothed') or as the rank the global mean
+would have ('ordered'). Missing values are a label of their own.
+
+Usage:
+    encoder = TargetEncoder(kind='ordered')
+    dataset[categorical_features] = encoder.fit_transform(dataset[categorical_features], dataset['SalePrice'])
+
+    encoder = TargetEncoder(kind='smoothed', n_folds=5, n_jobs=5) # leak free encoding of the training data
+    train_encoded = encoder.fit_transform(X_train[categorical_features], y_train)
+    test_encoded = encoder.transform(X_test[categorical_features]) # statistics of the whole training data """
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+KINDS = ('ordered', 'mean', 'smoothed')
+
+
+class TargetEncoder:
+
+    def __init__(self, kind='mean', smoothing=10.0, n_folds=None, n_jobs=1, random_state=0):
+        if kind not in KINDS:
+            raise ValueError('kind must be one of {}, got {!r}'.format(KINDS, kind))
+        if n_folds and kind == 'ordered':
+            raise ValueError("n_folds is not supported with kind='ordered', the ranks of the folds are not comparable")
+        self.kind = kind
+        self.smoothing = smoothing
+        self.n_folds = n_folds
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.mapping = None # column -> pandas Series, label -> encoded value (statistics of all the training rows)
+        self.defaults = None # column -> encoded value of the unseen labels
+
+    # method to factorize all the columns, codes shifted so that every label of every column has its own code
+    @staticmethod
+    def _factorize(frame):
+        codes, uniques = [], []
+        for column in frame.columns:
+            column_codes, column_uniques = pd.factorize(frame[column], use_na_sentinel=False)
+            codes.append(column_codes)
+            uniques.append(column_uniques)
+        sizes = np.array([len(u) for u in uniques], dtype='int64')
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype('int64')
+        codes = np.column_stack(codes) + offsets if codes else np.empty((len(frame), 0), 'int64')
+        return codes, uniques, sizes, offsets
+
+    # method to turn the target sums and counts of every label into encoded values, plus the value of unseen labels
+    def _encode(self, sums, counts, sizes, offsets, global_mean):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.kind == 'smoothed':
+                values = (sums + self.smoothing * global_mean) / (counts + self.smoothing)
+            else:
+                values = np.where(counts > 0, sums / counts, global_mean)
+        defaults = np.full(len(sizes), global_mean)
+        if self.kind == 'ordered':
+            values = values.copy()
+            for offset, size, j in zip(offsets, sizes, range(len(sizes))):
+                means = values[offset:offset + size]
+                order = np.argsort(means, kind='stable')
+                defaults[j] = np.searchsorted(means[order], global_mean)
+                means[order] = np.arange(size)
+        return values, defaults
+
+    # method to learn the encoding of every label from all the rows, returns the intermediate arrays for fit_transform
+    def _fit(self, frame, y):
+        codes, uniques, sizes, offsets = self._factorize(frame)
+        y = np.asarray(y, dtype='float64')
+        n_labels = int(sizes.sum())
+        weights = np.broadcast_to(y[:, None], codes.shape)
+        sums = np.bincount(codes.ravel(), weights=weights.ravel(), minlength=n_labels)
+        counts = np.bincount(codes.ravel(), minlength=n_labels).astype('float64')
+        values, defaults = self._encode(sums, counts, sizes, offsets, y.mean())
+        self.mapping = {column: pd.Series(values[o:o + s], index=u)
+                        for column, u, o, s in zip(frame.columns, uniques, offsets, sizes)}
+        self.defaults = dict(zip(frame.columns, defaults))
+        return codes, sizes, offsets, y, sums, counts, values
+
+    def fit(self, frame, y):
+        self._fit(frame, y)
+        return self
+
+    # method to encode new data with the statistics of all the training rows
+    def transform(self, frame):
+        if self.mapping is None:
+            raise ValueError('TargetEncoder is not fitted yet, call fit first')
+        result = {}
+        for column in frame.columns:
+            mapping = self.mapping[column]
+            codes = pd.Index(mapping.index).get_indexer(frame[column])
+            lookup = np.append(mapping.to_numpy(), self.defaults[column])
+            result[column] = lookup[codes] # code -1 (unseen label) takes the last value
+        return self._as_frame(result, frame.index)
+
+    def _as_frame(self, result, index):
+        frame = pd.DataFrame(result, index=index)
+        return frame.astype('int64') if self.kind == 'ordered' else frame
+
+    # method to fit and encode the training data, out of fold when n_folds is set ('mean' and 'smoothed')
+    def fit_transform(self, frame, y):
+        codes, sizes, offsets, y, sums, counts, values = self._fit(frame, y)
+        if not self.n_folds:
+            return self._as_frame({c: values[codes[:, j]] for j, c in enumerate(frame.columns)}, frame.index)
+
+        n_rows, n_labels = len(y), int(sizes.sum())
+        fold = np.random.default_rng(self.random_state).permutation(n_rows) % self.n_folds
+        # statistics of every (fold, label) with one bincount each
+        fold_codes = (fold[:, None] * n_labels + codes).ravel()
+        weights = np.broadcast_to(y[:, None], codes.shape).ravel()
+        fold_sums = np.bincount(fold_codes, weights=weights, minlength=self.n_folds * n_labels).reshape(self.n_folds, -1)
+        fold_counts = np.bincount(fold_codes, minlength=self.n_folds * n_labels).reshape(self.n_folds, -1)
+        fold_rows = np.bincount(fold, minlength=self.n_folds)
+        fold_y = np.bincount(fold, weights=y, minlength=self.n_folds)
+        encoded = np.empty(codes.shape, dtype='float64')
+
+        def encode_fold(k):
+            rows = np.flatnonzero(fold == k)
+            other_mean = (y.sum() - fold_y[k]) / max(n_rows - fold_rows[k], 1)
+            fold_values, _ = self._encode(sums - fold_sums[k], counts - fold_counts[k], sizes, offsets, other_mean)
+            encoded[rows] = fold_values[codes[rows]]
+
+        with ThreadPoolExecutor(max(1, self.n_jobs or 1)) as pool:
+            list(pool.map(encode_fold, range(self.n_folds)))
+        return self._as_frame(dict(zip(frame.columns, encoded.T)), frame.index)
@@ -0,0 +1,192 @@
+"""
+Time ordered cross validation (expanding window or rolling origin), folds fitted in parallel on memory mapped data.
+
+cross_val_score(forest_reg, train, train, cv=4) of bikes.py cuts the rows into 4 blocks without looking at the
+datetime column: the model is scored on hours which come before some of its training hours, and every fold slices
+the frame again. TimeSeriesCV keys the folds on the datetime column:
+- the rows are sorted by datetime once, the test blocks are the last n_splits blocks of the timeline (test_size rows,
+  or a duration like '7D'), never cutting through rows with the same datetime
+- expanding: a fold trains on all the rows before its test block; rolling: on the last train_size rows (or duration)
+  before it. gap leaves out a duration between the end of the training rows and the test block
+- prepare writes the sorted features and target once as .npy files: every training and test set is then a
+  contiguous slice of them, the workers memory map the files (np.load(mmap_mode='r')) and slice them without any
+  copy, for every fold and every estimator cross validated
+- the folds are fitted in parallel by a process pool, one row of results per fold
+
+Usage:
+    cv = TimeSeriesCV(n_splits=4, scheme='expanding', gap='1D')
+    cv.folds(train['datetime']) # first / last datetime and number of rows of every training and test set
+    with cv.prepare(train[features], train['count'], train['datetime']):
+        cv.cross_validate(RandomForestRegressor(), metrics={'rmsle': mean_squared_log_error}, n_jobs=None)
+    cross_val_score(model, X, y, cv=cv.split(train['datetime'])) # the same folds for sklearn """
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+SCHEMES = ('expanding', 'rolling')
+
+# memory mapped sorted data of the current worker process: name -> array
+_opened = {}
+
+
+# method to memory map the .npy files of prepare in a worker process (initializer of the pool)
+def _open(paths):
+    for name, path in paths.items():
+        _opened[name] = np.load(path, mmap_mode='r')
+
+
+# method to fit a copy of the estimator on one fold and score it on the test block
+def _fit_fold(estimator, bounds, metrics):
+    X, y = _opened['X'], _opened['y']
+    train_start, train_end, test_start, test_end = bounds
+    start = time.perf_counter()
+    model = clone(estimator).fit(X[train_start:train_end], y[train_start:train_end])
+    row = {'fit_time': time.perf_counter() - start}
+    X_test, y_test = X[test_start:test_end], y[test_start:test_end]
+    if metrics is None:
+        row['score'] = model.score(X_test, y_test)
+    else:
+        y_pred = model.predict(X_test)
+        for metric, score in metrics.items():
+            row[metric] = score(y_test, y_pred)
+    return row
+
+
+class TimeSeriesCV:
+
+    # n_splits: number of test blocks, at the end of the timeline
+    # scheme: 'expanding' (train on all the earlier rows) or 'rolling' (train on the last train_size earlier rows)
+    # test_size / train_size: number of rows or duration ('7D', pd.Timedelta), by default the rows are cut into
+    #   n_splits + 1 blocks and a rolling fold trains on one block
+    # gap: duration left out between the training rows and the test block (None for no gap)
+    def __init__(self, n_splits=4, scheme='expanding', test_size=None, train_size=None, gap=None):
+        if scheme not in SCHEMES:
+            raise ValueError('scheme must be one of {}, got {!r}'.format(SCHEMES, scheme))
+        self.n_splits = n_splits
+        self.scheme = scheme
+        self.test_size = test_size
+        self.train_size = train_size
+        self.gap = pd.Timedelta(gap) if gap is not None else pd.Timedelta(0)
+        self.paths_ = None
+        self.bounds_ = None
+        self.datetimes_ = None
+        self._directory = None
+
+    @staticmethod
+    def _is_duration(size):
+        return isinstance(size, (str, pd.Timedelta, np.timedelta64))
+
+    # method to return the permutation sorting the rows by datetime and the sorted datetimes (int64 nanoseconds)
+    @staticmethod
+    def _sort(datetimes):
+        values = pd.to_datetime(pd.Series(datetimes)).to_numpy(dtype='datetime64[ns]').view('int64')
+        order = np.argsort(values, kind='stable')
+        return order, values[order]
+
+    # method to return (train_start, train_end, test_start, test_end) of every fold, positions in the sorted rows
+    def _bounds(self, times):
+        n_rows = len(times)
+        first = lambda value: int(np.searchsorted(times, value, side='left')) # first row at or after a datetime
+        if self._is_duration(self.test_size):
+            duration = pd.Timedelta(self.test_size).value
+            ends = [times[-1] + 1 - (self.n_splits - 1 - k) * duration for k in range(self.n_splits)]
+            test_bounds = [(first(end - duration), first(end)) for end in ends]
+        else:
+            size = self.test_size or n_rows // (self.n_splits + 1)
+            starts = [n_rows - (self.n_splits - k) * size for k in range(self.n_splits + 1)]
+            # a block starts with the first row of its datetime, rows with the same datetime stay together
+            starts = [first(times[max(s, 0)]) if s < n_rows else n_rows for s in starts]
+            test_bounds = list(zip(starts[:-1], starts[1:]))
+
+        bounds = []
+        for test_start, test_end in test_bounds:
+            if test_start >= test_end:
+                continue
+            train_end = first(times[test_start] - self.gap.value)
+            if self.scheme == 'expanding':
+                train_start = 0
+            elif self._is_duration(self.train_size):
+                train_start = first(times[max(train_end - 1, 0)] + 1 - pd.Timedelta(self.train_size).value)
+            else:
+                train_start = max(0, train_end - (self.train_size or n_rows // (self.n_splits + 1)))
+            if train_start < train_end:
+                bounds.append((train_start, train_end, test_start, test_end))
+        if not bounds:
+            raise ValueError('no fold has both training and test rows, check n_splits / test_size / gap')
+        return bounds
+
+    # method to return the first / last datetime and the number of rows of every training and test set
+    def folds(self, datetimes):
+        _, times = self._sort(datetimes)
+        rows = []
+        for train_start, train_end, test_start, test_end in self._bounds(times):
+            rows.append({'train_from': times[train_start], 'train_to': times[train_end - 1],
+                         'n_train': train_end - train_start, 'test_from': times[test_start],
+                         'test_to': times[test_end - 1], 'n_test': test_end - test_start})
+        folds = pd.DataFrame(rows).rename_axis('fold')
+        for column in ('train_from', 'train_to', 'test_from', 'test_to'):
+            folds[column] = pd.to_datetime(folds[column])
+        return folds
+
+    # method to return the (train rows, test rows) of every fold, positions in the original order, like the splits
+    # of sklearn's cv objects
+    def split(self, datetimes):
+        order, times = self._sort(datetimes)
+        return [(np.sort(order[train_start:train_end]), np.sort(order[test_start:test_end]))
+                for train_start, train_end, test_start, test_end in self._bounds(times)]
+
+    # method to write the features and the target sorted by datetime as .npy files (in a temporary directory removed
+    # by close when path is None), they are memory mapped by every fold of cross_validate
+    def prepare(self, X, y, datetimes, path=None):
+        self.close()
+        order, times = self._sort(datetimes)
+        if path is None:
+            path = self._directory = tempfile.mkdtemp(prefix='time_cv_')
+        os.makedirs(path, exist_ok=True)
+        self.paths_ = {'X': os.path.join(path, 'X.npy'), 'y': os.path.join(path, 'y.npy')}
+        np.save(self.paths_['X'], np.asarray(X, dtype='float64')[order])
+        np.save(self.paths_['y'], np.asarray(y, dtype='float64').ravel()[order])
+        self.bounds_ = self._bounds(times)
+        self.datetimes_ = times
+        return self
+
+    # method to cross validate an estimator on the prepared data, one row per fold
+    # - metrics: metric name -> function(y_true, y_pred), None for estimator.score
+    # - n_jobs: number of worker processes, 1 to stay in the current process, None for all the cpus
+    def cross_validate(self, estimator, metrics=None, n_jobs=None):
+        if self.paths_ is None:
+            raise ValueError('TimeSeriesCV is not prepared yet, call prepare first')
+        n_jobs = min(n_jobs or os.cpu_count() or 1, len(self.bounds_))
+        if n_jobs == 1:
+            _open(self.paths_)
+            rows = [_fit_fold(estimator, bounds, metrics) for bounds in self.bounds_]
+        else:
+            with ProcessPoolExecutor(n_jobs, initializer=_open, initargs=(self.paths_,)) as pool:
+                rows = list(pool.map(_fit_fold, [estimator] * len(self.bounds_), self.bounds_,
+                                     [metrics] * len(self.bounds_)))
+        times = self.datetimes_
+        results = pd.DataFrame(rows).rename_axis('fold')
+        results.insert(0, 'test_from', pd.to_datetime([times[b[2]] for b in self.bounds_]))
+        results.insert(1, 'n_train', [b[1] - b[0] for b in self.bounds_])
+        return results
+
+    # method to remove the temporary directory of prepare
+    def close(self):
+        _opened.clear()
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+        self.paths_ = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()